@@ -3,15 +3,18 @@ Baganetic Flask Application
 A comprehensive web application for exploring Bagan's ancient pagodas with pathfinding
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, redirect
 from flask_cors import CORS
 from typing import List, Dict, Any
 import os
 import json
 import math
+import time
 from datetime import datetime
 import hashlib
 import secrets
+import threading
+from urllib.parse import urlencode
 
 # Optional: MongoDB (preferred source of truth)
 try:
@@ -33,7 +36,8 @@ CORS(app)
 # Frontend is served by Node.js on port 3000
 
 # Import pathfinder (use the improved implementation only)
-from improved_pathfinder import ImprovedPagodaPathFinder
+from improved_pathfinder import ImprovedPagodaPathFinder, TRAVEL_PROFILES, DEFAULT_TRAVEL_MODE, route_refinements
+from road_routing import road_router
 
 def _load_pagodas_from_mongo() -> List[Dict[str, Any]]:
     """Preferred: load pagoda documents from MongoDB."""
@@ -141,17 +145,67 @@ def load_pagoda_data() -> List[Dict[str, Any]]:
     # 2) Fallback to JS file
     return _load_pagodas_from_js()
 
-def _build_graph():
+# Pathfinder of the current dataset version, reused across requests so its
+# path and heuristic caches stay warm
+_pathfinder_lock = threading.Lock()
+_pathfinders: Dict[str, ImprovedPagodaPathFinder] = {}
+
+# Pagodas are reloaded per request to reflect DB updates; the pathfinder is
+# only rebuilt when they change
+def _fresh_graph():
     data = load_pagoda_data()
-    # Use improved pathfinder for better route optimization
-    improved_pf = ImprovedPagodaPathFinder(data)
+    version = _dataset_version(data)
+    with _pathfinder_lock:
+        improved_pf = _pathfinders.get(version)
+        if improved_pf is None:
+            # Use improved pathfinder for better route optimization
+            improved_pf = ImprovedPagodaPathFinder(data)
+            _pathfinders.clear()
+            _pathfinders[version] = improved_pf
+        else:
+            improved_pf.geometry_store.refresh()
     # Expose the internal graph for endpoints that list pagodas
-    graph = improved_pf.graph
-    return data, graph, improved_pf
+    return data, improved_pf.graph, improved_pf
 
-# Lazy in-memory cache (rebuilt per request to reflect DB updates)
-def _fresh_graph():
-    return _build_graph()
+# How long browsers and proxies may reuse a route response
+ROUTE_RESPONSE_MAX_AGE = int(os.getenv("ROUTE_RESPONSE_MAX_AGE_S", "3600"))
+# ...and one whose geometry was (partly) interpolated while routing was degraded
+ROUTE_FALLBACK_MAX_AGE = int(os.getenv("ROUTE_FALLBACK_MAX_AGE_S", "60"))
+
+def _cacheable_json(body: Dict[str, Any], max_age: int = ROUTE_RESPONSE_MAX_AGE, version: str = None):
+    """JSON response with a content ETag and public Cache-Control.
+
+    Only for GET responses: route responses are deterministic for a given
+    URL, so the ETag lets clients and proxies revalidate with If-None-Match
+    (304 on GET/HEAD).
+    A dataset version, when given, prefixes the ETag.
+    """
+    response = jsonify(body)
+    etag = hashlib.sha256(response.get_data()).hexdigest()[:32]
+    response.set_etag(f"{version}-{etag}" if version else etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+def _pagoda_id(pagoda: Dict[str, Any]) -> str:
+    """Canonical pagoda id, as listed by /api/pagodas"""
+    return str(pagoda.get('id') or pagoda.get('_id') or pagoda.get('name'))
+
+def _dataset_version(data: List[Dict[str, Any]]) -> str:
+    """Short hash of the routing-relevant pagoda fields (ids, names, coordinates)"""
+    rows = []
+    for pagoda in data:
+        loc = pagoda.get('location', {})
+        coords = loc.get('coordinates', loc)
+        rows.append([_pagoda_id(pagoda), pagoda.get('name'), coords.get('lat'), coords.get('lng')])
+    rows.sort(key=lambda row: row[0])
+    return hashlib.sha256(json.dumps(rows, separators=(',', ':')).encode('utf-8')).hexdigest()[:12]
+
+def _uncacheable_json(body: Dict[str, Any], status: int = 200):
+    response = jsonify(body)
+    response.status_code = status
+    response.cache_control.no_store = True
+    return response
 
 # Frontend routes are handled by Node.js server
 # Flask only provides API endpoints for pathfinding
@@ -164,7 +218,8 @@ def health_check():
         'status': 'healthy', 
         'service': 'Flask A* Pathfinding API',
         'fallback_mode': fallback_mode,
-        'mongodb_available': not fallback_mode
+        'mongodb_available': not fallback_mode,
+        'routing_backends': road_router.health()
     })
 
 @app.route('/api/pagodas')
@@ -213,17 +268,19 @@ def get_pagoda(pagoda_id):
 def get_pathfinder_pagodas():
     """Get pagodas for pathfinder"""
     try:
-        _data, graph, _pf = _fresh_graph()
+        data_list, graph, _pf = _fresh_graph()
+        ids = {pagoda.get('name'): _pagoda_id(pagoda) for pagoda in data_list}
         pagodas = []
         for name, data in graph.items():
             pagodas.append({
+                'id': ids.get(name, name),
                 'name': name,
                 'location': {
                     'lat': data['location']['lat'],
                     'lng': data['location']['lng']
                 }
             })
-        return jsonify({'success': True, 'data': pagodas})
+        return jsonify({'success': True, 'data': pagodas, 'datasetVersion': _dataset_version(data_list)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -234,19 +291,29 @@ def find_path():
         data = request.get_json()
         start = data.get('start')
         end = data.get('end')
+        mode = data.get('mode') or DEFAULT_TRAVEL_MODE
         
         if not start or not end:
             return jsonify({'success': False, 'error': 'Start and end pagodas are required'}), 400
         
+        if not isinstance(start, str) or not isinstance(end, str):
+            return jsonify({'success': False, 'error': 'Invalid pagoda name'}), 400
+        
         if start == end:
             return jsonify({'success': False, 'error': 'Start and end pagodas must be different'}), 400
         
+        if not isinstance(mode, str) or mode not in TRAVEL_PROFILES:
+            return jsonify({'success': False, 'error': 'Invalid travel mode'}), 400
+        
         _data, graph, pf = _fresh_graph()
         if start not in graph or end not in graph:
             return jsonify({'success': False, 'error': 'Invalid pagoda name'}), 400
         
+        if data.get('progressive') or request.args.get('progressive') == '1':
+            return _find_path_progressive(pf, start, end, mode)
+        
         # Use enhanced pathfinding with real road coordinates
-        enhanced_path = pf.get_enhanced_path_with_road_coordinates(start, end)
+        enhanced_path = pf.get_enhanced_path_with_road_coordinates(start, end, mode)
         
         if not enhanced_path:
             return jsonify({'success': False, 'error': 'No path found between the selected pagodas'}), 404
@@ -254,20 +321,199 @@ def find_path():
         # Find nearby pagodas along the path
         nearby_pagodas = pf.find_nearby_pagodas(enhanced_path['path'], 1.0)
         
+        return jsonify({
+            'success': True,
+            'data': _path_payload(enhanced_path, nearby_pagodas)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Redirects to the canonical route URL depend on the dataset version
+ROUTE_REDIRECT_MAX_AGE = 60
+
+@app.route('/api/pathfinder/route')
+def get_route():
+    """Cacheable route lookup by canonical pagoda ids.
+
+    GET /api/pathfinder/route?from=<id>&to=<id>&mode=<mode>&v=<datasetVersion>
+    Requests missing the current dataset version, or with other parameters
+    or ordering, are redirected to the canonical URL so that HTTP caches
+    keep one entry per route and dataset version.
+    """
+    try:
+        from_id = request.args.get('from', '').strip().lower()
+        to_id = request.args.get('to', '').strip().lower()
+        mode = request.args.get('mode') or DEFAULT_TRAVEL_MODE
+        
+        if not from_id or not to_id:
+            return jsonify({'success': False, 'error': 'from and to pagoda ids are required'}), 400
+        
+        if from_id == to_id:
+            return jsonify({'success': False, 'error': 'Start and end pagodas must be different'}), 400
+        
+        if mode not in TRAVEL_PROFILES:
+            return jsonify({'success': False, 'error': 'Invalid travel mode'}), 400
+        
+        data, graph, pf = _fresh_graph()
+        names = {_pagoda_id(pagoda).lower(): pagoda.get('name') for pagoda in data}
+        start, end = names.get(from_id), names.get(to_id)
+        if start not in graph or end not in graph:
+            return jsonify({'success': False, 'error': 'Invalid pagoda id'}), 400
+        
+        version = _dataset_version(data)
+        canonical_query = urlencode([('from', from_id), ('to', to_id), ('mode', mode), ('v', version)])
+        if request.query_string.decode('utf-8') != canonical_query:
+            response = redirect(f"{request.path}?{canonical_query}", code=302)
+            response.cache_control.public = True
+            response.cache_control.max_age = ROUTE_REDIRECT_MAX_AGE
+            return response
+        
+        enhanced_path = pf.get_enhanced_path_with_road_coordinates(start, end, mode)
+        if not enhanced_path:
+            return jsonify({'success': False, 'error': 'No path found between the selected pagodas'}), 404
+        
+        payload = _path_payload(enhanced_path, pf.find_nearby_pagodas(enhanced_path['path'], 1.0))
+        payload.update({'from': from_id, 'to': to_id, 'datasetVersion': version})
+        max_age = ROUTE_RESPONSE_MAX_AGE if enhanced_path['refined'] else ROUTE_FALLBACK_MAX_AGE
+        response = _cacheable_json({'success': True, 'data': payload}, max_age, version)
+        response.headers['X-Dataset-Version'] = version
+        return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def _path_payload(enhanced_path: Dict[str, Any], nearby_pagodas: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """find-path response data for an enhanced path"""
+    payload = {
+        'path': enhanced_path['path'],
+        'distance': round(enhanced_path['distance'], 2),
+        'distanceKm': round(enhanced_path['distanceKm'], 2),
+        'coordinates': enhanced_path['coordinates'],
+        'durationMinutes': round(enhanced_path['durationMinutes']),
+        'mode': enhanced_path['mode'],
+        'pathLength': enhanced_path['pathLength']
+    }
+    if nearby_pagodas is not None:
+        payload['nearbyPagodas'] = nearby_pagodas
+    return payload
+
+def _find_path_progressive(pf: ImprovedPagodaPathFinder, start: str, end: str, mode: str):
+    """
+    Progressive find-path: answer at once with geometry that needs no
+    network and compute the road geometry in the background. The client
+    fetches it from geometryUrl (polling) or geometryStreamUrl (SSE).
+    """
+    quick_path = pf.get_quick_path(start, end, mode)
+    if not quick_path:
+        return jsonify({'success': False, 'error': 'No path found between the selected pagodas'}), 404
+    
+    payload = _path_payload(quick_path, pf.find_nearby_pagodas(quick_path['path'], 1.0))
+    if quick_path['refined']:
+        # Stored or offline road geometry already covers the route
+        payload['geometryStatus'] = 'complete'
+    else:
+        token = route_refinements.submit(lambda: pf.get_enhanced_path_with_road_coordinates(start, end, mode))
+        payload.update({
+            'geometryStatus': 'pending',
+            'routeToken': token,
+            'geometryUrl': f"/api/pathfinder/route-geometry/{token}",
+            'geometryStreamUrl': f"/api/pathfinder/route-geometry/{token}/stream"
+        })
+        # Tokens are per request
+        return _uncacheable_json({'success': True, 'data': payload})
+    return jsonify({'success': True, 'data': payload})
+
+def _refinement_payload(job: Dict[str, Any]) -> Dict[str, Any]:
+    payload = {'status': job['status']}
+    if job['result']:
+        payload['data'] = _path_payload(job['result'])
+    return payload
+
+@app.route('/api/pathfinder/route-geometry/<token>')
+def get_route_geometry(token):
+    """Poll for the road geometry of a progressive find-path response"""
+    wait = min(request.args.get('wait', 0.0, type=float), 30.0)
+    job = route_refinements.wait(token, wait) if wait > 0 else route_refinements.get(token)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired route token'}), 404
+    
+    body = {'success': True}
+    body.update(_refinement_payload(job))
+    if job['status'] == 'pending':
+        return _uncacheable_json(body, 202)
+    return jsonify(body)
+
+@app.route('/api/pathfinder/route-geometry/<token>/stream')
+def stream_route_geometry(token):
+    """Server-sent events: 'pending' keep-alives, then one 'geometry' event"""
+    if route_refinements.get(token) is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired route token'}), 404
+    
+    def events():
+        deadline = time.monotonic() + 60
+        while True:
+            job = route_refinements.wait(token, 5.0)
+            if job is None:
+                yield "event: expired\ndata: {}\n\n"
+                return
+            if job['status'] != 'pending':
+                yield f"event: geometry\ndata: {json.dumps(_refinement_payload(job))}\n\n"
+                return
+            if time.monotonic() >= deadline:
+                yield "event: timeout\ndata: {}\n\n"
+                return
+            yield "event: pending\ndata: {}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/pathfinder/tour', methods=['POST'])
+def find_tour():
+    """Find a path visiting several pagodas in order"""
+    try:
+        data = request.get_json()
+        stops = data.get('stops') or []
+        mode = data.get('mode') or DEFAULT_TRAVEL_MODE
+        
+        if not isinstance(stops, list) or not all(isinstance(stop, str) for stop in stops):
+            return jsonify({'success': False, 'error': 'Stops must be a list of pagoda names'}), 400
+        
+        if len(stops) < 2:
+            return jsonify({'success': False, 'error': 'At least two stops are required'}), 400
+        
+        if not isinstance(mode, str) or mode not in TRAVEL_PROFILES:
+            return jsonify({'success': False, 'error': 'Invalid travel mode'}), 400
+        
+        _data, graph, pf = _fresh_graph()
+        if any(stop not in graph for stop in stops):
+            return jsonify({'success': False, 'error': 'Invalid pagoda name'}), 400
+        
+        tour = pf.find_tour_path(stops, mode)
+        if not tour:
+            return jsonify({'success': False, 'error': 'No path found between the selected pagodas'}), 404
+        
+        distance = pf.calculate_path_distance(tour, mode)
         return jsonify({
             'success': True,
             'data': {
-                'path': enhanced_path['path'],
-                'distance': round(enhanced_path['distance'], 2),
-                'distanceKm': round(enhanced_path['distanceKm'], 2),
-                'nearbyPagodas': nearby_pagodas,
-                'coordinates': enhanced_path['coordinates'],
-                'pathLength': enhanced_path['pathLength']
+                'path': tour,
+                'distanceKm': round(distance, 2),
+                'durationMinutes': round(pf.estimate_travel_minutes(distance, mode)),
+                'mode': mode,
+                'pathLength': len(tour)
             }
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/pathfinder/modes')
+def get_travel_modes():
+    """Get available travel modes"""
+    modes = [
+        {'id': mode, 'label': profile['label'], 'speedKmh': profile['speed_kmh']}
+        for mode, profile in TRAVEL_PROFILES.items()
+    ]
+    return jsonify({'success': True, 'data': modes, 'default': DEFAULT_TRAVEL_MODE})
+
 @app.route('/api/pathfinder/nearby/<pagoda_name>')
 def get_nearby_pagodas(pagoda_name):
     """Get nearby pagodas"""
@@ -0,0 +1,314 @@
+"""
+Async road routing for asyncio (ASGI) servers.
+
+AsyncRoadRouter mirrors RoadRouter's get_road_route,
+get_multi_waypoint_route and create_realistic_road_path, but talks to the
+HTTP routing backends through one pooled aiohttp session, so hundreds of
+route requests can be in flight on a single event loop without a worker
+thread each. Backend selection, latency stats, circuit breakers and the
+route geometry cache are shared with the wrapped RoadRouter.
+
+Requires aiohttp (pip install aiohttp).
+
+Usage:
+    async with AsyncRoadRouter() as router:
+        path = await router.create_realistic_road_path(pagodas)
+"""
+
+import os
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional, Any
+
+from road_routing import (
+    road_router, RoadRouter, RoutingBackend, OSRMBackend, GraphHopperBackend,
+    CircuitOpenError, ROUTER_MAX_RETRIES, ROUTER_BACKOFF_BASE, RETRYABLE_STATUS_CODES,
+    SEGMENT_FETCH_DEADLINE
+)
+
+try:
+    import aiohttp
+except Exception:  # pragma: no cover
+    aiohttp = None
+
+# Connections kept open by the shared session, across all backends
+ASYNC_ROUTER_POOL_SIZE = int(os.getenv("ASYNC_ROUTER_POOL_SIZE", "100"))
+
+# Threads for blocking route cache (SQLite) reads and writes
+ASYNC_ROUTER_CACHE_WORKERS = 2
+
+
+class AsyncRoadRouter:
+    """
+    Non-blocking counterpart of RoadRouter. The aiohttp session is created
+    on first use and bound to the running event loop; call close() (or use
+    the router as an async context manager) on shutdown.
+    """
+
+    def __init__(self, router: Optional[RoadRouter] = None,
+                 pool_size: int = ASYNC_ROUTER_POOL_SIZE):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for AsyncRoadRouter (pip install aiohttp)")
+        self.router = router if router is not None else road_router
+        self.pool_size = pool_size
+        self.session = None
+        # Identical concurrent route requests share one computation
+        self._in_flight = {}
+        # Strong references to background tasks (cache refreshes, late segments)
+        self._background = set()
+        # Cache I/O gets its own threads so it never queues behind backend calls
+        self.cache_executor = ThreadPoolExecutor(max_workers=ASYNC_ROUTER_CACHE_WORKERS,
+                                                 thread_name_prefix="async-route-cache")
+
+    async def __aenter__(self) -> 'AsyncRoadRouter':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def _spawn(self, coroutine) -> 'asyncio.Task':
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _run_blocking(self, fn, *args) -> Any:
+        """Run a blocking backend call (offline graph search) off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.router.backend_executor, fn, *args)
+
+    async def _run_cache_io(self, fn, *args) -> Any:
+        """Run a blocking route cache call off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cache_executor, fn, *args)
+
+    @staticmethod
+    def _query_items(params: Dict) -> List[Tuple[str, str]]:
+        """aiohttp takes repeated query keys (GraphHopper 'point') as pairs"""
+        items = []
+        for key, value in params.items():
+            for item in (value if isinstance(value, list) else [value]):
+                items.append((key, item))
+        return items
+
+    async def _request_json(self, backend: str, url: str, params: Dict, timeout: float) -> Dict:
+        """
+        Async RoadRouter._request_json: same breaker, retry and backoff rules,
+        over the shared aiohttp session
+        """
+        breaker = self.router.breakers[backend]
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"{backend} circuit is open")
+
+        session = self._get_session()
+        for attempt in range(ROUTER_MAX_RETRIES + 1):
+            retryable = False
+            try:
+                async with session.get(url, params=self._query_items(params),
+                                       timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    retryable = response.status in RETRYABLE_STATUS_CODES
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+                breaker.record_success()
+                return data
+            except asyncio.TimeoutError:
+                breaker.record_failure()
+                raise
+            except aiohttp.ClientResponseError:
+                if not retryable:
+                    # Other 4xx (e.g. OSRM NoRoute): the backend is healthy
+                    breaker.record_success()
+                    raise
+                if attempt == ROUTER_MAX_RETRIES:
+                    breaker.record_failure()
+                    raise
+            except aiohttp.ClientConnectionError:
+                if attempt == ROUTER_MAX_RETRIES:
+                    breaker.record_failure()
+                    raise
+            except aiohttp.ClientError:
+                breaker.record_failure()
+                raise
+            except ValueError:
+                # Not JSON: a broken backend rather than a bad request
+                breaker.record_failure()
+                raise
+
+            await asyncio.sleep(random.uniform(0, ROUTER_BACKOFF_BASE * (2 ** attempt)))
+
+    async def _fetch_osrm_route(self, backend: OSRMBackend,
+                                coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        try:
+            url, params, timeout = self.router._osrm_route_request(backend, coordinates)
+            data = await self._request_json(backend.name, url, params, timeout)
+            return self.router._parse_osrm_route(backend, data)
+        except CircuitOpenError:
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"OSRM ({backend.name}) request failed: {e!r}")
+            return None
+        except Exception as e:
+            print(f"Error getting road route: {e}")
+            return None
+
+    async def _fetch_graphhopper_route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        if not self.router.graphhopper_api_key:
+            return None
+
+        try:
+            data = await self._request_json('graphhopper', self.router.graphhopper_url,
+                                            self.router._graphhopper_params(coordinates), timeout=10)
+            return self.router._parse_graphhopper_route(data)
+        except CircuitOpenError:
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"GraphHopper request failed: {e!r}")
+            return None
+        except Exception as e:
+            print(f"Error getting GraphHopper route: {e}")
+            return None
+
+    async def _backend_route(self, backend: RoutingBackend,
+                             coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        if isinstance(backend, OSRMBackend):
+            return await self._fetch_osrm_route(backend, coordinates)
+        if isinstance(backend, GraphHopperBackend):
+            return await self._fetch_graphhopper_route(coordinates)
+        # Offline backends are CPU-bound
+        return await self._run_blocking(backend.route, coordinates)
+
+    async def _call_backend(self, backend: RoutingBackend,
+                            coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """Run one backend, recording its latency and outcome"""
+        started = time.monotonic()
+        try:
+            result = await self._backend_route(backend, coordinates)
+        except Exception as e:
+            print(f"Routing backend {backend.name} failed: {e}")
+            result = None
+        self.router.stats[backend.name].record(time.monotonic() - started, bool(result))
+        return result
+
+    async def _route_via_backends(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """Async RoadRouter._route_via_backends: fastest backend first, hedged past its p95"""
+        remaining = self.router._ranked_backends()
+        if not remaining:
+            return None
+
+        current = remaining.pop(0)
+        in_flight = {asyncio.ensure_future(self._call_backend(current, coordinates))}
+        while in_flight:
+            delay = self.router.stats[current.name].hedge_delay() if self.router.hedging and remaining else None
+            done, in_flight = await asyncio.wait(in_flight, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result:
+                    # Losing hedges finish in the background and still record their stats
+                    for pending in in_flight:
+                        self._background.add(pending)
+                        pending.add_done_callback(self._background.discard)
+                    return result
+
+            if remaining and (not done or not in_flight):
+                current = remaining.pop(0)
+                in_flight.add(asyncio.ensure_future(self._call_backend(current, coordinates)))
+
+        return None
+
+    async def _cached_route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """Geometry cache lookup with stale-while-revalidate; concurrent misses are coalesced"""
+        cache = self.router.cache
+        key = cache.make_key('road', coordinates)
+
+        cached, stale = await self._run_cache_io(cache.get, key)
+        if cached is not None:
+            if stale and await self._run_cache_io(cache.claim_refresh, key):
+                self._spawn(self._fetch_and_store(key, coordinates))
+            return self.router._unpack_coordinates(cached)
+
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = self._spawn(self._fetch_and_store(key, coordinates))
+            self._in_flight[key] = flight
+            flight.add_done_callback(lambda _task: self._in_flight.pop(key, None))
+        # Shielded so one cancelled caller does not cancel the others
+        points = await asyncio.shield(flight)
+        return self.router._unpack_coordinates(points) if points else None
+
+    async def _fetch_and_store(self, key: str, coordinates: List[Tuple[float, float]]) -> Optional[List[List[float]]]:
+        points = self.router._pack_result(await self._route_via_backends(coordinates))
+        if points:
+            await self._run_cache_io(self.router.cache.set, key, points)
+        return points
+
+    async def get_road_route(self, start_lat: float, start_lng: float,
+                             end_lat: float, end_lng: float) -> Optional[List[Dict]]:
+        """
+        Get road-based route between two points
+        """
+        return await self._cached_route([(start_lat, start_lng), (end_lat, end_lng)])
+
+    async def get_multi_waypoint_route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """
+        Get road-based route through multiple waypoints
+        """
+        if len(coordinates) < 2:
+            return None
+
+        return await self._cached_route(coordinates)
+
+    async def create_realistic_road_path(self, pagoda_coordinates: List[Dict]) -> List[Dict]:
+        """
+        Create a realistic road-based path through multiple pagodas
+        """
+        if len(pagoda_coordinates) < 2:
+            return pagoda_coordinates
+
+        coordinates = [(coord['lat'], coord['lng']) for coord in pagoda_coordinates]
+        road_coordinates = await self.get_multi_waypoint_route(coordinates)
+
+        if road_coordinates:
+            return self.router._label_pagodas(road_coordinates, pagoda_coordinates)
+        else:
+            # Fallback to individual segments
+            return await self._create_segmented_road_path(pagoda_coordinates)
+
+    async def _create_segmented_road_path(self, pagoda_coordinates: List[Dict],
+                                          deadline: float = SEGMENT_FETCH_DEADLINE) -> List[Dict]:
+        """
+        Fetch every leg concurrently; legs not back before the deadline are
+        interpolated and keep running in the background to fill the cache
+        """
+        tasks = [
+            self._spawn(self.get_road_route(
+                pagoda_coordinates[i]['lat'], pagoda_coordinates[i]['lng'],
+                pagoda_coordinates[i + 1]['lat'], pagoda_coordinates[i + 1]['lng']
+            ))
+            for i in range(len(pagoda_coordinates) - 1)
+        ]
+        done, _pending = await asyncio.wait(tasks, timeout=deadline)
+
+        segments = []
+        for i, task in enumerate(tasks):
+            road_segment = None
+            if task in done:
+                try:
+                    road_segment = task.result()
+                except Exception as e:
+                    print(f"Road segment {i + 1} failed: {e}")
+            segments.append(road_segment)
+
+        return self.router._join_segments(pagoda_coordinates, segments)
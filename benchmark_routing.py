@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Routing benchmark against the local mock OSRM server.
+
+Starts mock_osrm_server on a free port, points the road router at it and
+measures end-to-end /api/pathfinder/find-path latency under each failure
+profile. The route cache starts empty for every request, so each one
+exercises the routing backends.
+
+Usage:
+    python benchmark_routing.py
+    python benchmark_routing.py --profiles healthy flaky --requests 50
+"""
+
+import os
+import sys
+import time
+import socket
+import random
+import argparse
+import tempfile
+import threading
+from typing import List, Dict
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_profile(client, injector, pagoda_names: List[str], profile: str,
+                requests: int, rng: random.Random) -> Dict:
+    """Time find-path requests with the mock router in one failure profile"""
+    from road_routing import road_router, CircuitBreaker, BackendStats
+
+    injector.set_profile(profile)
+    road_router.breakers = {name: CircuitBreaker(name) for name in road_router.breakers}
+    road_router.stats = {name: BackendStats() for name in road_router.stats}
+
+    latencies, failures = [], 0
+    for _ in range(requests):
+        start, end = rng.sample(pagoda_names, 2)
+        road_router.cache.clear()
+        started = time.perf_counter()
+        response = client.post('/api/pathfinder/find-path', json={'start': start, 'end': end})
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            failures += 1
+
+    backend = road_router.health()['osrm-local']
+    return {
+        'profile': profile,
+        'requests': requests,
+        'failed': failures,
+        'mean_ms': sum(latencies) / len(latencies),
+        'p50_ms': _percentile(latencies, 0.5),
+        'p95_ms': _percentile(latencies, 0.95),
+        'max_ms': max(latencies),
+        'backend_error_rate': backend['error_rate'],
+        'circuit': backend['circuit']['state']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark find-path latency against a mock OSRM server")
+    parser.add_argument('--profiles', nargs='+',
+                        help="Failure profiles to run (default: all of mock_osrm_server.FAILURE_PROFILES)")
+    parser.add_argument('--requests', type=int, default=20, help="find-path requests per profile")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--with-road-graph', action='store_true',
+                        help="Keep the offline road graph and edge geometry enabled")
+    args = parser.parse_args()
+
+    # The router reads its configuration at import time, so nothing that
+    # imports road_routing may be loaded before this point
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix="baganetic-bench-")
+    os.environ['OSRM_URL'] = f"http://127.0.0.1:{port}"
+    os.environ['OSRM_PUBLIC_URL'] = ""
+    os.environ['ROUTE_CACHE_PATH'] = os.path.join(workdir, "route_cache.sqlite3")
+    os.environ.setdefault('FALLBACK_MODE', "true")
+    if not args.with_road_graph:
+        os.environ['ROAD_GRAPH_PATH'] = os.path.join(workdir, "missing_road_graph.bin")
+        os.environ['EDGE_GEOMETRY_PATH'] = os.path.join(workdir, "missing_edge_geometry.json.gz")
+
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from app import app, load_pagoda_data
+    from mock_osrm_server import create_mock_osrm_app, FAILURE_PROFILES
+
+    profiles = args.profiles or list(FAILURE_PROFILES)
+    unknown = [p for p in profiles if p not in FAILURE_PROFILES]
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(unknown)} (choose from {', '.join(FAILURE_PROFILES)})")
+
+    pagoda_data = load_pagoda_data()
+    mock_app = create_mock_osrm_app(pagoda_data, seed=args.seed)
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', port, mock_app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    pagoda_names = sorted({p['name'] for p in pagoda_data})
+    rng = random.Random(args.seed)
+    client = app.test_client()
+
+    print(f"Mock OSRM on {os.environ['OSRM_URL']}, {args.requests} find-path requests per profile\n")
+    print(f"{'profile':<10} {'failed':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9} {'osrm err':>9}  circuit")
+    try:
+        for profile in profiles:
+            result = run_profile(client, mock_app.config['INJECTOR'], pagoda_names, profile, args.requests, rng)
+            print(f"{result['profile']:<10} {result['failed']:>6} {result['mean_ms']:>7.1f}ms "
+                  f"{result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms {result['max_ms']:>7.1f}ms "
+                  f"{result['backend_error_rate']:>9.2f}  {result['circuit']}")
+            sys.stdout.flush()
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,63 +3,48 @@ Baganetic AI Chatbot Backend
 A powerful conversational AI assistant for Bagan pagoda exploration
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import json
 import re
 import random
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
-import difflib
 import math
 import os
 import sys
 from collections import defaultdict
 import time
+import hashlib
+import argparse
 from functools import lru_cache
 
-# Enhanced ML/NLP for Advanced NLU
+from keyword_matcher import KeywordMatcher, RegexTrigger
+from message_features import MessageFeatures
+from name_index import AliasTrie, SubstringIndex, FuzzyIndex, CloseMatchIndex, name_words
+from session_store import SessionStore, create_session_store
+from streaming_metrics import MessageStats, counter_lines, gauge_lines
+from response_cache import TTLCache, MISSING, render_parts
+
+# Intent models are trained with scikit-learn at build time and compiled to
+# numpy arrays, so serving needs neither scikit-learn nor a training run
 try:
-    from sklearn.pipeline import Pipeline
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.linear_model import LogisticRegression
-    from sklearn.ensemble import RandomForestClassifier
-    from sklearn.naive_bayes import MultinomialNB
-    import nltk
-    from nltk.tokenize import word_tokenize, sent_tokenize
-    from nltk.corpus import stopwords
-    from nltk.stem import WordNetLemmatizer
-    from nltk.chunk import ne_chunk
-    from nltk.tag import pos_tag
-    import spacy
+    import joblib
+    from intent_models import IntentEnsemble
 except Exception as e:
     print(f"Warning: Some NLP libraries not available: {e}")
-    Pipeline = None
-    TfidfVectorizer = None
-    LogisticRegression = None
-    RandomForestClassifier = None
-    MultinomialNB = None
-    nltk = None
-    spacy = None
-
-# Download required NLTK data
-try:
-    if nltk:
-        nltk.download('punkt', quiet=True)
-        nltk.download('stopwords', quiet=True)
-        nltk.download('wordnet', quiet=True)
-        nltk.download('averaged_perceptron_tagger', quiet=True)
-        nltk.download('maxent_ne_chunker', quiet=True)
-        nltk.download('words', quiet=True)
-except Exception:
-    pass
+    joblib = None
+    IntentEnsemble = None
+
+# NLTK is imported on first use; its corpora are downloaded by setup.py,
+# never at import time
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import existing pathfinder modules
 try:
-    from improved_pathfinder import ImprovedPagodaPathFinder
+    from improved_pathfinder import ImprovedPagodaPathFinder, TRAVEL_PROFILES, DEFAULT_TRAVEL_MODE
     # Create a simple graph function for compatibility
     def create_pagoda_graph(pagoda_data):
         return None  # Not needed for ImprovedPagodaPathFinder
@@ -68,6 +53,159 @@ except ImportError:
     print("Warning: Pathfinder modules not found. Some features may be limited.")
     PagodaPathFinder = None
     ImprovedPagodaPathFinder = None
+    DEFAULT_TRAVEL_MODE = 'walking'
+    TRAVEL_PROFILES = {'walking': {'label': 'Walking', 'speed_kmh': 4.5}}
+
+# Phrases that select a travel profile in route requests (checked in order)
+TRAVEL_MODE_PATTERNS = [
+    ('ebike', re.compile(r'\b(?:by |on an? |with an? )?e-?bikes?\b')),
+    ('bicycle', re.compile(r'\b(?:by |on an? |with an? )?(?:bicycles?|bikes?|cycling)\b')),
+    ('horse_cart', re.compile(r'\b(?:by |on an? |in an? |with an? )?(?:horse ?carts?|carts?|horse)\b')),
+    ('car', re.compile(r'\b(?:by |in an? |with an? )?(?:cars?|taxis?|driving)\b')),
+    ('walking', re.compile(r'\b(?:by |on )?(?:foot|walking|walk)\b')),
+]
+
+# Labelled examples for the intent classifiers
+INTENT_TRAINING_DATA = [
+    # Greeting patterns
+    ("hi", 'greeting'), ("hello", 'greeting'), ("hey there", 'greeting'), 
+    ("good morning", 'greeting'), ("good afternoon", 'greeting'), ("good evening", 'greeting'),
+    ("start", 'greeting'), ("begin", 'greeting'), ("help me", 'general_help'),
+    
+    # Pagoda information requests
+    ("tell me about ananda", 'pagoda_info'), ("information about shwezigon", 'pagoda_info'), 
+    ("details about dhammayangyi", 'pagoda_info'), ("what is ananda temple", 'pagoda_info'),
+    ("show me ananda", 'pagoda_info'), ("find ananda temple", 'pagoda_info'),
+    ("ananda temple", 'pagoda_info'), ("shwezigon pagoda", 'pagoda_info'),
+    
+    # Pathfinding and navigation
+    ("route from ananda to shwezigon", 'pathfinding'), ("how to get to gawdawpalin", 'pathfinding'), 
+    ("directions between temples", 'pathfinding'), ("navigate to ananda", 'pathfinding'),
+    ("shortest path to shwezigon", 'pathfinding'), ("best route to dhammayangyi", 'pathfinding'),
+    ("go from ananda to gawdawpalin", 'pathfinding'), ("travel between temples", 'pathfinding'),
+    
+    # Recommendations and suggestions
+    ("recommend must see pagodas", 'recommendations'), ("what are the best temples", 'recommendations'),
+    ("suggest pagodas to visit", 'recommendations'), ("what should i see", 'recommendations'),
+    ("must visit pagodas", 'recommendations'), ("popular temples", 'recommendations'),
+    ("best pagodas in bagan", 'recommendations'), ("famous temples", 'recommendations'),
+    
+    # Nearby search
+    ("nearby pagodas around ananda", 'nearby'), ("what's close to shwezigon", 'nearby'),
+    ("pagodas near dhammayangyi", 'nearby'), ("find pagodas near me", 'nearby'),
+    ("surrounding temples", 'nearby'), ("close to ananda", 'nearby'),
+    
+    # History and culture
+    ("history of dhammayangyi", 'history_culture'), ("when was sulamani built", 'history_culture'), 
+    ("cultural significance of bagan", 'history_culture'), ("ancient history", 'history_culture'),
+    ("pagan dynasty", 'history_culture'), ("buddhist architecture", 'history_culture'),
+    ("religious significance", 'history_culture'), ("cultural heritage", 'history_culture'),
+    
+    # Practical information
+    ("entrance fee for ananda", 'practical_info'), ("opening hours shwezigon", 'practical_info'), 
+    ("how long to visit sulamani", 'practical_info'), ("visiting hours", 'practical_info'),
+    ("ticket prices", 'practical_info'), ("accessibility", 'practical_info'),
+    ("what to bring", 'practical_info'), ("visiting tips", 'practical_info'),
+    
+    # General help
+    ("what can you do", 'general_help'), ("commands", 'general_help'), ("help", 'general_help'),
+    ("what do you know", 'general_help'), ("capabilities", 'general_help'),
+    
+    # Itinerary planning
+    ("plan a day trip", 'itinerary'), ("create an itinerary", 'itinerary'), 
+    ("day trip to bagan", 'itinerary'), ("what should i see in bagan", 'itinerary'),
+    ("plan my visit", 'itinerary'), ("tour planning", 'itinerary'),
+]
+
+# Trained intent models, built by setup.py or `python chatbot_backend.py --build-model`
+INTENT_MODEL_PATH = os.getenv("CHATBOT_MODEL_PATH", "assets/data/chatbot_intent_models.joblib")
+INTENT_MODEL_FORMAT = 3
+
+# Upper bound on messages per /api/chatbot/analyze request
+BATCH_MAX_MESSAGES = int(os.getenv("CHATBOT_BATCH_MAX_MESSAGES", "5000"))
+
+
+def intent_model_version() -> str:
+    """Artifact version: format and training data must both match"""
+    digest = hashlib.sha256(json.dumps(INTENT_TRAINING_DATA).encode('utf-8')).hexdigest()[:12]
+    return f"{INTENT_MODEL_FORMAT}-{digest}"
+
+
+def train_intent_models() -> Optional[Tuple[Any, Dict[str, Any]]]:
+    """
+    Train multiple classifiers for robust intent detection on one shared
+    TF-IDF vectorizer. Returns (vectorizer, {name: classifier})
+    """
+    try:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.naive_bayes import MultinomialNB
+    except Exception as e:
+        print(f"Warning: scikit-learn not available, intent models disabled: {e}")
+        return None
+
+    texts = [t for t, y in INTENT_TRAINING_DATA]
+    labels = [y for t, y in INTENT_TRAINING_DATA]
+
+    try:
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=1, max_features=1000)
+        X = vectorizer.fit_transform(texts)
+        classifiers = {
+            'logistic_regression': LogisticRegression(max_iter=1000, random_state=42),
+            'random_forest': RandomForestClassifier(n_estimators=100, random_state=42),
+            'naive_bayes': MultinomialNB()
+        }
+        for classifier in classifiers.values():
+            classifier.fit(X, labels)
+    except Exception as e:
+        print(f"Error training classifiers: {e}")
+        return None
+
+    return vectorizer, classifiers
+
+
+def build_intent_models(path: str = INTENT_MODEL_PATH) -> Optional['IntentEnsemble']:
+    """Train the intent models, compile them and persist them as a versioned joblib artifact"""
+    if IntentEnsemble is None:
+        return None
+    trained = train_intent_models()
+    if trained is None:
+        return None
+    try:
+        compiled = IntentEnsemble.compile(*trained)
+    except Exception as e:
+        print(f"Error compiling classifiers: {e}")
+        return None
+
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump({'version': intent_model_version(), 'models': compiled}, tmp_path, compress=3)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Warning: Could not save intent models to {path}: {e}")
+    return IntentEnsemble.from_dict(compiled)
+
+
+def load_intent_models(path: str = INTENT_MODEL_PATH) -> Optional['IntentEnsemble']:
+    """Load persisted intent models; None if missing, unreadable or built for other data"""
+    if IntentEnsemble is None or not os.path.exists(path):
+        return None
+    try:
+        artifact = joblib.load(path)
+    except Exception as e:
+        print(f"Warning: Could not load intent models from {path}: {e}")
+        return None
+    if not isinstance(artifact, dict) or artifact.get('version') != intent_model_version():
+        return None
+    try:
+        return IntentEnsemble.from_dict(artifact['models'])
+    except Exception as e:
+        print(f"Warning: Could not load intent models from {path}: {e}")
+        return None
 
 app = Flask(__name__)
 CORS(app)
@@ -78,11 +216,16 @@ FALLBACK_MODE = os.getenv("FALLBACK_MODE", "false").lower() == "true"
 class ContextAnalyzer:
     """Advanced context analysis for better conversation understanding"""
     
+    # Common pagoda names to look for
+    COMMON_PAGODAS = ['ananda', 'shwezigon', 'dhammayangyi', 'gawdawpalin', 'sulamani', 'htilominlo']
+
     def __init__(self):
         self.context_window = 5  # Number of previous messages to consider
         self.topic_weights = defaultdict(float)
+        self.matcher = KeywordMatcher(self.COMMON_PAGODAS)
         
-    def analyze_context(self, conversation_history: List[Dict], current_message: str) -> Dict[str, Any]:
+    def analyze_context(self, conversation_history: List[Dict], current_message: str,
+                        features: Optional[MessageFeatures] = None) -> Dict[str, Any]:
         """Analyze conversation context to improve understanding"""
         context = {
             'current_topic': None,
@@ -99,7 +242,11 @@ class ContextAnalyzer:
         for msg in conversation_history[-self.context_window:]:
             if msg.get('type') == 'user':
                 # Simple entity extraction for pagodas
-                mentioned = self._extract_pagoda_mentions(msg.get('message', ''))
+                text = msg.get('message', '')
+                if features is not None and text == features.text:
+                    mentioned = [p for p in self.COMMON_PAGODAS if p in features.hits]
+                else:
+                    mentioned = self._extract_pagoda_mentions(text)
                 context['mentioned_pagodas'].extend(mentioned)
         
         # Determine conversation flow
@@ -115,16 +262,8 @@ class ContextAnalyzer:
     def _extract_pagoda_mentions(self, text: str) -> List[str]:
         """Extract potential pagoda mentions from text"""
         # This is a simplified version - in production, use NER
-        pagoda_names = []
-        text_lower = text.lower()
-        
-        # Common pagoda names to look for
-        common_pagodas = ['ananda', 'shwezigon', 'dhammayangyi', 'gawdawpalin', 'sulamani', 'htilominlo']
-        for pagoda in common_pagodas:
-            if pagoda in text_lower:
-                pagoda_names.append(pagoda)
-                
-        return pagoda_names
+        found = self.matcher.found(text.lower())
+        return [pagoda for pagoda in self.COMMON_PAGODAS if pagoda in found]
 
 class SentimentAnalyzer:
     """Advanced sentiment analysis for better user experience"""
@@ -132,13 +271,14 @@ class SentimentAnalyzer:
     def __init__(self):
         self.positive_words = {'good', 'great', 'amazing', 'wonderful', 'excellent', 'fantastic', 'love', 'like', 'enjoy'}
         self.negative_words = {'bad', 'terrible', 'awful', 'hate', 'dislike', 'disappointed', 'frustrated', 'confused'}
+        self.matcher = KeywordMatcher(self.positive_words | self.negative_words)
         
-    def analyze_sentiment(self, text: str) -> Dict[str, Any]:
+    def analyze_sentiment(self, text: str, features: Optional[MessageFeatures] = None) -> Dict[str, Any]:
         """Analyze sentiment of user message"""
-        text_lower = text.lower()
+        found = features.hits if features is not None else self.matcher.found(text.lower())
         
-        positive_score = sum(1 for word in self.positive_words if word in text_lower)
-        negative_score = sum(1 for word in self.negative_words if word in text_lower)
+        positive_score = len(found & self.positive_words)
+        negative_score = len(found & self.negative_words)
         
         if positive_score > negative_score:
             sentiment = 'positive'
@@ -165,6 +305,21 @@ class EntityExtractor:
         self.pagoda_names = self._build_pagoda_name_map()
         self.pagoda_name_map = self.pagoda_names  # Alias for compatibility
         
+        # Indexes built once: id -> pagoda, alias word trie, and names for substring lookups
+        self.pagoda_by_id: Dict[str, Dict] = {}
+        exact_names: Dict[str, Dict] = {}
+        for pagoda in self.pagoda_data:
+            self.pagoda_by_id.setdefault(pagoda.get('id', '').lower(), pagoda)
+            for key in ('name', 'shortName', 'id'):
+                exact_names.setdefault(pagoda.get(key, '').lower(), pagoda)
+        self.exact_names = exact_names
+        self.alias_trie = AliasTrie()
+        for alias, pagoda_id in self.pagoda_name_map.items():
+            self.alias_trie.add(alias, pagoda_id)
+        self.name_index = SubstringIndex(
+            (pagoda.get(key, '').lower(), pagoda) for pagoda in self.pagoda_data for key in ('name', 'shortName')
+        )
+        
     def _build_pagoda_name_map(self) -> Dict[str, str]:
         """Build a map of pagoda names and variations"""
         name_map = {}
@@ -183,9 +338,9 @@ class EntityExtractor:
             
         return name_map
     
-    def extract_pagodas(self, text: str) -> List[Dict[str, Any]]:
+    def extract_pagodas(self, text: str, features: Optional[MessageFeatures] = None) -> List[Dict[str, Any]]:
         """Extract pagoda entities from text"""
-        text_lower = text.lower()
+        text_lower = features.lower if features is not None else text.lower()
         found_pagodas = []
         
         # Handle "about [pagoda]" pattern specifically
@@ -200,16 +355,18 @@ class EntityExtractor:
                 })
                 return found_pagodas
         
-        # Regular entity extraction
-        for name, pagoda_id in self.pagoda_name_map.items():
-            if name in text_lower:
-                pagoda = next((p for p in self.pagoda_data if p['id'] == pagoda_id), None)
-                if pagoda:
-                    found_pagodas.append({
-                        'pagoda': pagoda,
-                        'name': name,
-                        'confidence': 0.9 if name == pagoda.get('name', '').lower() else 0.7
-                    })
+        # Regular entity extraction: longest alias match at each word, each pagoda once
+        words = features.words if features is not None else name_words(text_lower)
+        seen = set()
+        for _start, _end, name, pagoda_id in self.alias_trie.scan(words):
+            pagoda = self.pagoda_by_id.get(pagoda_id.lower())
+            if pagoda and pagoda_id not in seen:
+                seen.add(pagoda_id)
+                found_pagodas.append({
+                    'pagoda': pagoda,
+                    'name': name,
+                    'confidence': 0.9 if name == " ".join(name_words(pagoda.get('name', ''))) else 0.7
+                })
         
         return found_pagodas
     
@@ -222,29 +379,16 @@ class EntityExtractor:
         
         # Try alias map first (fastest)
         if name_lower in self.pagoda_name_map:
-            pagoda_id = self.pagoda_name_map[name_lower]
-            for pagoda in self.pagoda_data:
-                if pagoda.get('id', '').lower() == pagoda_id:
-                    return pagoda
+            pagoda = self.pagoda_by_id.get(self.pagoda_name_map[name_lower].lower())
+            if pagoda:
+                return pagoda
         
         # Direct exact matches
-        for pagoda in self.pagoda_data:
-            pagoda_name = pagoda.get('name', '').lower()
-            short_name = pagoda.get('shortName', '').lower()
-            pagoda_id = pagoda.get('id', '').lower()
-            
-            if name_lower in [pagoda_name, short_name, pagoda_id]:
-                return pagoda
+        if name_lower in self.exact_names:
+            return self.exact_names[name_lower]
         
         # Partial matches (substring)
-        for pagoda in self.pagoda_data:
-            pagoda_name = pagoda.get('name', '').lower()
-            short_name = pagoda.get('shortName', '').lower()
-            
-            if name_lower in pagoda_name or name_lower in short_name:
-                return pagoda
-        
-        return None
+        return self.name_index.first(name_lower)
     
     def detect_language(self, text: str) -> str:
         """Detect the language of the input text"""
@@ -295,51 +439,12 @@ class EntityExtractor:
 class ConversationLearning:
     """Advanced conversation learning that adapts to user preferences"""
     
-    def __init__(self):
-        self.user_patterns = defaultdict(list)
-        self.preference_weights = defaultdict(float)
+    def __init__(self, sessions: Optional[SessionStore] = None):
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.user_patterns = self.sessions.section('learned_patterns', list)
+        self.preference_weights = self.sessions.section('preference_weights', dict)
         self.learning_rate = 0.1
-        
-    def learn_from_interaction(self, user_id: str, message: str, response: str, user_satisfaction: float = 0.5):
-        """Learn from user interactions to improve future responses"""
-        # Extract topics from message
-        topics = self._extract_topics(message)
-        
-        # Update user preferences based on interaction
-        for topic in topics:
-            if user_satisfaction > 0.7:  # Positive feedback
-                self.preference_weights[f"{user_id}:{topic}"] += self.learning_rate
-            elif user_satisfaction < 0.3:  # Negative feedback
-                self.preference_weights[f"{user_id}:{topic}"] -= self.learning_rate * 0.5
-        
-        # Store interaction pattern
-        self.user_patterns[user_id].append({
-            'message': message,
-            'topics': topics,
-            'satisfaction': user_satisfaction,
-            'timestamp': datetime.now()
-        })
-        
-        # Keep only recent patterns (last 50 interactions)
-        if len(self.user_patterns[user_id]) > 50:
-            self.user_patterns[user_id] = self.user_patterns[user_id][-50:]
-    
-    def get_user_preferences(self, user_id: str) -> Dict[str, float]:
-        """Get learned user preferences"""
-        preferences = {}
-        for key, weight in self.preference_weights.items():
-            if key.startswith(f"{user_id}:"):
-                topic = key.split(":", 1)[1]
-                preferences[topic] = weight
-        return preferences
-    
-    def _extract_topics(self, text: str) -> List[str]:
-        """Extract topics from text"""
-        topics = []
-        text_lower = text.lower()
-        
-        # Define topic keywords
-        topic_keywords = {
+        self.topic_keywords = {
             'history': ['history', 'historical', 'ancient', 'old', 'built', 'constructed', 'dynasty', 'king'],
             'architecture': ['architecture', 'design', 'structure', 'style', 'building', 'construction'],
             'religion': ['buddhist', 'buddhism', 'religious', 'temple', 'pagoda', 'spiritual'],
@@ -347,19 +452,52 @@ class ConversationLearning:
             'travel': ['visit', 'travel', 'tour', 'trip', 'journey', 'explore', 'discover'],
             'practical': ['entrance', 'fee', 'ticket', 'hours', 'time', 'access', 'location']
         }
+        self.matcher = KeywordMatcher(k for keywords in self.topic_keywords.values() for k in keywords)
         
-        for topic, keywords in topic_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                topics.append(topic)
-        
-        return topics
+    def learn_from_interaction(self, user_id: str, message: str, response: str, user_satisfaction: float = 0.5,
+                               features: Optional[MessageFeatures] = None):
+        """Learn from user interactions to improve future responses"""
+        # Extract topics from message
+        topics = self._extract_topics(message, features)
+        
+        with self.sessions.session(user_id):
+            # Update user preferences based on interaction
+            weights = self.preference_weights[user_id]
+            for topic in topics:
+                if user_satisfaction > 0.7:  # Positive feedback
+                    weights[topic] = weights.get(topic, 0.0) + self.learning_rate
+                elif user_satisfaction < 0.3:  # Negative feedback
+                    weights[topic] = weights.get(topic, 0.0) - self.learning_rate * 0.5
+            
+            # Store interaction pattern
+            self.user_patterns[user_id].append({
+                'message': message,
+                'topics': topics,
+                'satisfaction': user_satisfaction,
+                'timestamp': datetime.now()
+            })
+            
+            # Keep only recent patterns (last 50 interactions)
+            if len(self.user_patterns[user_id]) > 50:
+                self.user_patterns[user_id] = self.user_patterns[user_id][-50:]
+    
+    def get_user_preferences(self, user_id: str) -> Dict[str, float]:
+        """Get learned user preferences"""
+        return dict(self.preference_weights.get(user_id, {}))
+    
+    def _extract_topics(self, text: str, features: Optional[MessageFeatures] = None) -> List[str]:
+        """Extract topics from text"""
+        found = features.hits if features is not None else self.matcher.found(text.lower())
+        return [topic for topic, keywords in self.topic_keywords.items()
+                if any(keyword in found for keyword in keywords)]
 
 class SmartRecommendationEngine:
     """Advanced recommendation engine that learns from user behavior"""
     
-    def __init__(self, pagoda_data: List[Dict]):
+    def __init__(self, pagoda_data: List[Dict], sessions: Optional[SessionStore] = None):
         self.pagoda_data = pagoda_data
-        self.user_interactions = defaultdict(list)
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.user_interactions = self.sessions.section('pagoda_interactions', list)
         self.pagoda_similarity_matrix = self._build_similarity_matrix()
         
     def _build_similarity_matrix(self) -> Dict[str, Dict[str, float]]:
@@ -417,7 +555,7 @@ class SmartRecommendationEngine:
     
     def get_smart_recommendations(self, user_id: str, limit: int = 5) -> List[Dict]:
         """Get smart recommendations based on user behavior"""
-        user_interactions = self.user_interactions[user_id]
+        user_interactions = self.user_interactions.get(user_id, [])
         
         if not user_interactions:
             # Return popular pagodas for new users
@@ -449,47 +587,50 @@ class SmartRecommendationEngine:
     
     def record_interaction(self, user_id: str, pagoda_id: str, interaction_type: str = 'view'):
         """Record user interaction with a pagoda"""
-        self.user_interactions[user_id].append({
-            'pagoda_id': pagoda_id,
-            'type': interaction_type,
-            'timestamp': datetime.now()
-        })
-        
-        # Keep only recent interactions (last 100)
-        if len(self.user_interactions[user_id]) > 100:
-            self.user_interactions[user_id] = self.user_interactions[user_id][-100:]
+        with self.sessions.session(user_id):
+            self.user_interactions[user_id].append({
+                'pagoda_id': pagoda_id,
+                'type': interaction_type,
+                'timestamp': datetime.now()
+            })
+            
+            # Keep only recent interactions (last 100)
+            if len(self.user_interactions[user_id]) > 100:
+                self.user_interactions[user_id] = self.user_interactions[user_id][-100:]
 
 class ContextualMemory:
     """Advanced contextual memory that maintains conversation context"""
     
-    def __init__(self):
-        self.conversation_contexts = defaultdict(dict)
-        self.topic_transitions = defaultdict(list)
+    def __init__(self, sessions: Optional[SessionStore] = None):
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.conversation_contexts = self.sessions.section('conversation_context', dict)
+        self.topic_transitions = self.sessions.section('topic_transitions', list)
         
     def update_context(self, user_id: str, message: str, intent: str, entities: List[str]):
         """Update conversation context"""
-        context = self.conversation_contexts[user_id]
-        
-        # Update current topic
-        context['current_topic'] = intent
-        context['last_message'] = message
-        context['last_entities'] = entities
-        context['timestamp'] = datetime.now()
-        
-        # Track topic transitions
-        if 'previous_topic' in context:
-            transition = f"{context['previous_topic']} -> {intent}"
-            self.topic_transitions[user_id].append(transition)
+        with self.sessions.session(user_id):
+            context = self.conversation_contexts[user_id]
             
-            # Keep only recent transitions
-            if len(self.topic_transitions[user_id]) > 20:
-                self.topic_transitions[user_id] = self.topic_transitions[user_id][-20:]
-        
-        context['previous_topic'] = intent
+            # Update current topic
+            context['current_topic'] = intent
+            context['last_message'] = message
+            context['last_entities'] = entities
+            context['timestamp'] = datetime.now()
+            
+            # Track topic transitions
+            if 'previous_topic' in context:
+                transition = f"{context['previous_topic']} -> {intent}"
+                self.topic_transitions[user_id].append(transition)
+                
+                # Keep only recent transitions
+                if len(self.topic_transitions[user_id]) > 20:
+                    self.topic_transitions[user_id] = self.topic_transitions[user_id][-20:]
+            
+            context['previous_topic'] = intent
     
     def get_contextual_suggestions(self, user_id: str) -> List[str]:
         """Get contextual suggestions based on conversation history"""
-        context = self.conversation_contexts[user_id]
+        context = self.conversation_contexts.get(user_id, {})
         suggestions = []
         
         current_topic = context.get('current_topic', '')
@@ -608,57 +749,56 @@ class QuestionAnalyzer:
             'why': ['why is', 'why are', 'why does', 'why should'],
             'which': ['which is', 'which are', 'which one', 'which pagoda']
         }
+        # Common pagoda names
+        self.pagoda_names = ['ananda', 'shwezigon', 'dhammayangyi', 'gawdawpalin', 'sulamani', 'htilominlo']
+        self.important_words = ['history', 'architecture', 'built', 'temple', 'pagoda', 'buddhist', 'route', 'nearby', 'recommend']
+        self.specificity_words = {
+            'high': ['specific', 'exact', 'precise', 'detailed'],
+            'low': ['general', 'overview', 'summary']
+        }
+        tables = list(self.question_patterns.values()) + list(self.specificity_words.values())
+        self.matcher = KeywordMatcher(
+            [k for table in tables for k in table] + self.pagoda_names + self.important_words
+        )
     
-    def analyze_question(self, message: str) -> Dict[str, Any]:
+    def analyze_question(self, message: str, features: Optional[MessageFeatures] = None) -> Dict[str, Any]:
         """Analyze question type and extract key information"""
-        message_lower = message.lower()
+        found = features.hits if features is not None else self.matcher.found(message.lower())
         
         question_type = 'general'
         for q_type, patterns in self.question_patterns.items():
-            if any(pattern in message_lower for pattern in patterns):
+            if any(pattern in found for pattern in patterns):
                 question_type = q_type
                 break
         
         # Extract entities and keywords
-        entities = self._extract_entities(message)
-        keywords = self._extract_keywords(message)
+        entities = self._extract_entities(message, found)
+        keywords = self._extract_keywords(message, found)
         
         return {
             'type': question_type,
             'entities': entities,
             'keywords': keywords,
-            'complexity': self._assess_complexity(message),
-            'specificity': self._assess_specificity(message)
+            'complexity': self._assess_complexity(message, features.word_count if features is not None else None),
+            'specificity': self._assess_specificity(message, found)
         }
     
-    def _extract_entities(self, text: str) -> List[str]:
+    def _extract_entities(self, text: str, found: Optional[set] = None) -> List[str]:
         """Extract entities from text"""
-        entities = []
-        text_lower = text.lower()
-        
-        # Common pagoda names
-        pagoda_names = ['ananda', 'shwezigon', 'dhammayangyi', 'gawdawpalin', 'sulamani', 'htilominlo']
-        for name in pagoda_names:
-            if name in text_lower:
-                entities.append(name)
-        
-        return entities
+        if found is None:
+            found = self.matcher.found(text.lower())
+        return [name for name in self.pagoda_names if name in found]
     
-    def _extract_keywords(self, text: str) -> List[str]:
+    def _extract_keywords(self, text: str, found: Optional[set] = None) -> List[str]:
         """Extract important keywords"""
-        keywords = []
-        text_lower = text.lower()
-        
-        important_words = ['history', 'architecture', 'built', 'temple', 'pagoda', 'buddhist', 'route', 'nearby', 'recommend']
-        for word in important_words:
-            if word in text_lower:
-                keywords.append(word)
-        
-        return keywords
+        if found is None:
+            found = self.matcher.found(text.lower())
+        return [word for word in self.important_words if word in found]
     
-    def _assess_complexity(self, text: str) -> str:
+    def _assess_complexity(self, text: str, word_count: Optional[int] = None) -> str:
         """Assess question complexity"""
-        word_count = len(text.split())
+        if word_count is None:
+            word_count = len(text.split())
         if word_count <= 5:
             return 'simple'
         elif word_count <= 15:
@@ -666,11 +806,13 @@ class QuestionAnalyzer:
         else:
             return 'complex'
     
-    def _assess_specificity(self, text: str) -> str:
+    def _assess_specificity(self, text: str, found: Optional[set] = None) -> str:
         """Assess question specificity"""
-        if any(word in text.lower() for word in ['specific', 'exact', 'precise', 'detailed']):
+        if found is None:
+            found = self.matcher.found(text.lower())
+        if any(word in found for word in self.specificity_words['high']):
             return 'high'
-        elif any(word in text.lower() for word in ['general', 'overview', 'summary']):
+        elif any(word in found for word in self.specificity_words['low']):
             return 'low'
         else:
             return 'medium'
@@ -687,24 +829,19 @@ class TopicClassifier:
             'travel': ['visit', 'travel', 'tour', 'trip', 'journey', 'explore', 'discover', 'itinerary'],
             'practical': ['entrance', 'fee', 'ticket', 'hours', 'time', 'access', 'location', 'directions']
         }
+        self.matcher = KeywordMatcher(k for keywords in self.topic_keywords.values() for k in keywords)
     
-    def classify_topic(self, text: str) -> Dict[str, float]:
+    def classify_topic(self, text: str, features: Optional[MessageFeatures] = None) -> Dict[str, float]:
         """Classify text into topics with confidence scores"""
-        text_lower = text.lower()
-        topic_scores = {}
-        
-        for topic, keywords in self.topic_keywords.items():
-            score = 0
-            for keyword in keywords:
-                if keyword in text_lower:
-                    score += 1
-            topic_scores[topic] = score / len(keywords)
-        
-        return topic_scores
+        found = features.hits if features is not None else self.matcher.found(text.lower())
+        return {
+            topic: sum(1 for keyword in keywords if keyword in found) / len(keywords)
+            for topic, keywords in self.topic_keywords.items()
+        }
     
-    def get_primary_topic(self, text: str) -> str:
+    def get_primary_topic(self, text: str, features: Optional[MessageFeatures] = None) -> str:
         """Get the primary topic of the text"""
-        topic_scores = self.classify_topic(text)
+        topic_scores = self.classify_topic(text, features)
         if topic_scores:
             return max(topic_scores.keys(), key=lambda x: topic_scores[x])
         return 'general'
@@ -733,16 +870,24 @@ class IntentRefinement:
                 r'best (.+)'
             ]
         }
+        self.triggers = RegexTrigger(
+            (intent, pattern) for intent, patterns in self.intent_patterns.items() for pattern in patterns
+        )
+        self.matcher = KeywordMatcher(self.triggers.literals)
     
-    def refine_intent(self, message: str, initial_intent: str) -> Tuple[str, float]:
+    def refine_intent(self, message: str, initial_intent: str,
+                      features: Optional[MessageFeatures] = None) -> Tuple[str, float]:
         """Refine intent classification using pattern matching"""
-        message_lower = message.lower()
+        if features is not None:
+            message_lower, found = features.lower, features.hits
+        else:
+            message_lower = message.lower()
+            found = self.matcher.found(message_lower)
         
-        # Check for specific patterns
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    return intent, 0.9
+        # Check for specific patterns, running only those whose literal prefix occurs
+        intent = self.triggers.search(message_lower, found)
+        if intent:
+            return intent, 0.9
         
         # If no specific pattern found, return original intent with lower confidence
         return initial_intent, 0.6
@@ -751,35 +896,27 @@ class BaganeticChatbot:
     """Advanced AI chatbot for Bagan pagoda exploration with enhanced NLP capabilities"""
     
     def __init__(self):
-        self.conversation_memory = {}
+        # Per-user state of the chatbot and its learning components, evicted
+        # by idle time and least recent use (see session_store.py)
+        self.sessions = create_session_store()
+        self.conversation_memory = self.sessions.section('conversation_memory')
         self.pagoda_data = self._load_pagoda_data()
         self.pathfinder = None
         self.graph = None
         self._initialize_pathfinder()
         
-        # Enhanced metrics/telemetry
+        # Enhanced metrics/telemetry; response times and sentiment are kept
+        # per intent in constant memory (see streaming_metrics.py)
         self.metrics = {
             'intent_counts': defaultdict(int),
             'fallback_counts': defaultdict(int),
-            'sentiment_scores': [],
-            'response_times': [],
             'user_satisfaction': defaultdict(int)
         }
-        
-        # Advanced NLP components
-        self.lemmatizer = WordNetLemmatizer() if nltk else None
-        self.stop_words = set(stopwords.words('english')) if nltk else set()
-        self.spacy_nlp = None
-        
-        # Initialize spaCy model
-        try:
-            if spacy:
-                self.spacy_nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("Warning: spaCy English model not found. Install with: python -m spacy download en_core_web_sm")
+        self.message_stats = MessageStats()
         
         # Alias map for robust entity resolution
         self.alias_map = self._build_alias_map(self.pagoda_data)
+        self._build_name_indexes(self.pagoda_data)
         
         # Enhanced intent classification with multiple models
         self.intent_models = self._train_ensemble_classifiers()
@@ -789,10 +926,13 @@ class BaganeticChatbot:
         self.sentiment_analyzer = SentimentAnalyzer()
         self.entity_extractor = EntityExtractor(self.pagoda_data)
         
-        # Performance optimization
-        self.response_cache = {}
+        # Performance optimization: user-independent response parts (intent
+        # classifications, pagoda descriptions, recommendations, routes) are
+        # cached under global keys; per-user decoration is applied on every reply
         self.cache_ttl = 300  # 5 minutes
+        self.static_cache_ttl = 3600  # parts that depend only on the pagoda data and models
         self.max_cache_size = 1000
+        self.response_cache = TTLCache(self.max_cache_size, self.cache_ttl)
         
         # Simplified keyword-based intent detection
         self.intent_keywords = {
@@ -807,6 +947,28 @@ class BaganeticChatbot:
             'general_help': ['help', 'what can', 'how can', 'what do', 'assist', 'commands', 'features', 'capabilities', 'options', 'show me more', 'tell me more', 'what else']
         }
         
+        # Whole messages with a fixed intent (suggestion prompts, general pagoda queries)
+        self.exact_intents = {}
+        for messages, intent, groups in [
+            (['show me more routes', 'plan another route', 'what are the best routes in bagan?'], 'recommendations', ['route suggestions']),
+            (['find pagodas near the destination', 'find pagodas near sulamani'], 'nearby', ['destination']),
+            (['show me more', 'tell me more', 'what else'], 'general_help', ['more information']),
+            (['tell me about these pagodas', 'tell me about the pagodas', 'tell me about pagodas', 'about these pagodas', 'about the pagodas', 'about pagodas'], 'recommendations', ['general pagoda information']),
+            (['show me pagodas', 'show me the pagodas', 'show me these pagodas'], 'recommendations', ['pagoda list']),
+            (['what pagodas', 'which pagodas', 'what are the pagodas', 'which are the pagodas'], 'recommendations', ['pagoda information'])
+        ]:
+            for exact in messages:
+                self.exact_intents[exact] = (intent, groups)
+        
+        # Phrases that trigger name extraction in _detect_intent
+        self.intent_phrases = [
+            'tell me about', 'information about', 'details about', 'what is', 'show me information about',
+            'find pagodas near', 'pagodas near', 'nearby pagodas around', 'what\'s near', 'near', 'around',
+            'what are the', 'must-see', 'best', 'famous', 'popular',
+            'plan a day trip', 'create an itinerary', 'day trip to bagan', 'what should i see in bagan',
+            'history of', 'when was', 'built', 'cultural significance of'
+        ]
+        
         # More natural and varied response templates
         self.response_templates = {
             'greeting': [
@@ -850,15 +1012,25 @@ class BaganeticChatbot:
         }
         
         # Advanced AI capabilities for English
-        self.conversation_learning = ConversationLearning()
-        self.smart_recommendations = SmartRecommendationEngine(self.pagoda_data)
-        self.contextual_memory = ContextualMemory()
+        self.conversation_learning = ConversationLearning(self.sessions)
+        self.smart_recommendations = SmartRecommendationEngine(self.pagoda_data, self.sessions)
+        self.contextual_memory = ContextualMemory(self.sessions)
         self.adaptive_responses = AdaptiveResponseGenerator()
         
         # Advanced NLP features
         self.question_analyzer = QuestionAnalyzer()
         self.topic_classifier = TopicClassifier()
         self.intent_refinement = IntentRefinement()
+        
+        # One automaton over every keyword and pattern table: intent keywords,
+        # _detect_intent phrases and the analyzers' tables
+        self.keyword_matcher = KeywordMatcher(
+            [k for keywords in self.intent_keywords.values() for k in keywords]
+            + self.intent_phrases
+            + [k for analyzer in (self.context_analyzer, self.sentiment_analyzer, self.question_analyzer,
+                                  self.topic_classifier, self.intent_refinement, self.conversation_learning)
+               for k in analyzer.matcher.keywords]
+        )
     
     def _normalize_text(self, text: str) -> str:
         """Normalize text for robust matching (case, spaces, hyphens)."""
@@ -893,145 +1065,119 @@ class BaganeticChatbot:
                     alias_to_id[norm] = pid
         return alias_to_id
 
-    def _train_ensemble_classifiers(self):
-        """Train multiple classifiers for robust intent detection"""
-        if not all([Pipeline, TfidfVectorizer, LogisticRegression, RandomForestClassifier, MultinomialNB]):
-            return {}
-            
-        # Enhanced training dataset with more examples
-        training_data = [
-            # Greeting patterns
-            ("hi", 'greeting'), ("hello", 'greeting'), ("hey there", 'greeting'), 
-            ("good morning", 'greeting'), ("good afternoon", 'greeting'), ("good evening", 'greeting'),
-            ("start", 'greeting'), ("begin", 'greeting'), ("help me", 'general_help'),
-            
-            # Pagoda information requests
-            ("tell me about ananda", 'pagoda_info'), ("information about shwezigon", 'pagoda_info'), 
-            ("details about dhammayangyi", 'pagoda_info'), ("what is ananda temple", 'pagoda_info'),
-            ("show me ananda", 'pagoda_info'), ("find ananda temple", 'pagoda_info'),
-            ("ananda temple", 'pagoda_info'), ("shwezigon pagoda", 'pagoda_info'),
-            
-            # Pathfinding and navigation
-            ("route from ananda to shwezigon", 'pathfinding'), ("how to get to gawdawpalin", 'pathfinding'), 
-            ("directions between temples", 'pathfinding'), ("navigate to ananda", 'pathfinding'),
-            ("shortest path to shwezigon", 'pathfinding'), ("best route to dhammayangyi", 'pathfinding'),
-            ("go from ananda to gawdawpalin", 'pathfinding'), ("travel between temples", 'pathfinding'),
-            
-            # Recommendations and suggestions
-            ("recommend must see pagodas", 'recommendations'), ("what are the best temples", 'recommendations'),
-            ("suggest pagodas to visit", 'recommendations'), ("what should i see", 'recommendations'),
-            ("must visit pagodas", 'recommendations'), ("popular temples", 'recommendations'),
-            ("best pagodas in bagan", 'recommendations'), ("famous temples", 'recommendations'),
-            
-            # Nearby search
-            ("nearby pagodas around ananda", 'nearby'), ("what's close to shwezigon", 'nearby'),
-            ("pagodas near dhammayangyi", 'nearby'), ("find pagodas near me", 'nearby'),
-            ("surrounding temples", 'nearby'), ("close to ananda", 'nearby'),
-            
-            # History and culture
-            ("history of dhammayangyi", 'history_culture'), ("when was sulamani built", 'history_culture'), 
-            ("cultural significance of bagan", 'history_culture'), ("ancient history", 'history_culture'),
-            ("pagan dynasty", 'history_culture'), ("buddhist architecture", 'history_culture'),
-            ("religious significance", 'history_culture'), ("cultural heritage", 'history_culture'),
-            
-            # Practical information
-            ("entrance fee for ananda", 'practical_info'), ("opening hours shwezigon", 'practical_info'), 
-            ("how long to visit sulamani", 'practical_info'), ("visiting hours", 'practical_info'),
-            ("ticket prices", 'practical_info'), ("accessibility", 'practical_info'),
-            ("what to bring", 'practical_info'), ("visiting tips", 'practical_info'),
-            
-            # General help
-            ("what can you do", 'general_help'), ("commands", 'general_help'), ("help", 'general_help'),
-            ("what do you know", 'general_help'), ("capabilities", 'general_help'),
-            
-            # Itinerary planning
-            ("plan a day trip", 'itinerary'), ("create an itinerary", 'itinerary'), 
-            ("day trip to bagan", 'itinerary'), ("what should i see in bagan", 'itinerary'),
-            ("plan my visit", 'itinerary'), ("tour planning", 'itinerary'),
-        ]
-
-        texts = [t for t, y in training_data]
-        labels = [y for t, y in training_data]
-        unique_labels = sorted(set(labels))
+    def _build_name_indexes(self, pagodas: List[Dict[str, Any]]):
+        """id -> pagoda, exact-name, substring and fuzzy indexes for pagoda lookups (after alias_map)"""
+        self.pagoda_by_id: Dict[str, Dict[str, Any]] = {}
+        self.exact_names: Dict[str, Dict[str, Any]] = {}
+        for p in pagodas:
+            self.pagoda_by_id.setdefault(p.get('id', '').lower(), p)
+            for key in ['name', 'shortName', 'id']:
+                self.exact_names.setdefault(p.get(key, '').lower(), p)
+        self.name_index = SubstringIndex((p.get('name', '').lower(), p) for p in pagodas)
+        self.short_name_index = SubstringIndex((p.get('shortName', '').lower(), p) for p in pagodas)
+        # Typo-tolerant lookups: names for _find_pagoda_by_name, aliases for "did you mean"
+        # (the latter with difflib's similarity, so multi-word queries still get suggestions)
+        self.fuzzy_name_index = FuzzyIndex(
+            (key, p) for p in pagodas
+            for key in {p.get('name', '').lower(), p.get('shortName', '').lower(), p.get('id', '').lower()}
+        )
+        self.close_alias_index = CloseMatchIndex(self.alias_map)
 
-        models = {}
-        
-        try:
-            # Logistic Regression
-            lr_pipeline = Pipeline([
-                ('tfidf', TfidfVectorizer(ngram_range=(1, 2), min_df=1, max_features=1000)),
-                ('clf', LogisticRegression(max_iter=1000, random_state=42))
-            ])
-            lr_pipeline.fit(texts, labels)
-            models['logistic_regression'] = lr_pipeline
-            
-            # Random Forest
-            rf_pipeline = Pipeline([
-                ('tfidf', TfidfVectorizer(ngram_range=(1, 2), min_df=1, max_features=1000)),
-                ('clf', RandomForestClassifier(n_estimators=100, random_state=42))
-            ])
-            rf_pipeline.fit(texts, labels)
-            models['random_forest'] = rf_pipeline
-            
-            # Naive Bayes
-            nb_pipeline = Pipeline([
-                ('tfidf', TfidfVectorizer(ngram_range=(1, 2), min_df=1, max_features=1000)),
-                ('clf', MultinomialNB())
-            ])
-            nb_pipeline.fit(texts, labels)
-            models['naive_bayes'] = nb_pipeline
-            
-        except Exception as e:
-            print(f"Error training classifiers: {e}")
-            
+    def _train_ensemble_classifiers(self):
+        """Load the persisted intent models, training (and saving) them if the artifact is missing or stale"""
+        models = load_intent_models()
+        if models is None:
+            print("Intent model artifact missing or stale - training now "
+                  "(run `python chatbot_backend.py --build-model` at deploy time)")
+            models = build_intent_models()
         return models
 
-    def _classify_intent_ensemble(self, message: str) -> Tuple[str, float]:
+    def extract_features(self, message: str) -> MessageFeatures:
+        """Normalized text, tokens, n-grams and keyword hits of a message, computed once for all analyzers"""
+        ngram_range = self.intent_models.tfidf.ngram_range if self.intent_models else (1, 2)
+        return MessageFeatures(message, self.keyword_matcher, ngram_range)
+
+    def _classify_intent_ensemble(self, message: str,
+                                  features: Optional[MessageFeatures] = None) -> Tuple[str, float]:
         """Classify intent using ensemble of ML models. Returns (intent, probability)."""
         if not self.intent_models:
             return 'unknown', 0.0
-            
-        predictions = {}
-        confidences = {}
-        
+
         try:
-            # Get predictions from all models
-            for model_name, model in self.intent_models.items():
-                try:
-                    intent = model.predict([message])[0]
-                    predictions[model_name] = intent
-                    
-                    # Get confidence score
-                    if hasattr(model.named_steps.get('clf'), 'predict_proba'):
-                        proba_vec = model.predict_proba([message])[0]
-                        class_labels = model.named_steps['clf'].classes_
-                        idx = list(class_labels).index(intent)
-                        confidences[model_name] = float(proba_vec[idx])
-                    else:
-                        confidences[model_name] = 0.5
-                except Exception as e:
-                    print(f"Error with {model_name}: {e}")
-                    continue
-            
-            if not predictions:
-                return 'unknown', 0.0
-            
-            # Ensemble voting with confidence weighting
-            intent_votes = defaultdict(float)
-            for model_name, intent in predictions.items():
-                confidence = confidences.get(model_name, 0.5)
-                intent_votes[intent] += confidence
-            
-            # Get the intent with highest weighted vote
-            best_intent = max(intent_votes.keys(), key=lambda x: intent_votes[x])
-            best_confidence = intent_votes[best_intent] / len(predictions)
-            
-            return best_intent, best_confidence
-            
+            # One TF-IDF transform, one predict_proba per classifier
+            if features is not None:
+                return self.intent_models.classify_terms([features.ngrams])[0]
+            return self.intent_models.classify([message])[0]
         except Exception as e:
             print(f"Error in ensemble classification: {e}")
             return 'unknown', 0.0
     
+    def _resolve_intent(self, message: str, ml_intent: str, ml_conf: float,
+                        features: Optional[MessageFeatures] = None) -> Tuple[str, Any, float, Optional[str]]:
+        """
+        Combine the ensemble prediction with rule-based detection. Returns
+        (intent, groups, confidence, fallback) where fallback names the
+        fallback counter to bump ('low_confidence_ml', 'unknown_intent') or is None.
+        Reads no conversation state, so it is safe for batch analysis.
+        """
+        if features is None:
+            features = self.extract_features(message)
+        intent, groups = self._detect_intent(message, features)
+        
+        # Intent refinement
+        refined_intent, intent_confidence = self.intent_refinement.refine_intent(message, intent, features)
+        if intent_confidence > ml_conf:
+            intent = refined_intent
+            ml_conf = intent_confidence
+
+        # Routing strategy
+        # 1) If regex found a clear intent, prefer it (deterministic)
+        # 2) Else if ML confidence high, use ML
+        # 3) Else remain unknown
+        fallback = None
+        if intent == 'unknown':
+            if ml_conf >= 0.75:
+                intent = ml_intent
+            elif ml_conf >= 0.5:
+                # Tentative: record low-confidence recommendation to clarify later
+                intent = ml_intent
+                fallback = 'low_confidence_ml'
+            else:
+                fallback = 'unknown_intent'
+
+        # Fallback: if message looks like a single word/name, try pagoda lookup directly
+        # Only trigger if no action verbs are present and it looks like a proper noun
+        if intent == 'unknown':
+            name_candidate = message.strip()
+            message_lower = features.lower
+            # Check if message contains action verbs that should not be treated as pagoda names
+            action_verbs = ['show', 'find', 'plan', 'tell', 'get', 'give', 'help', 'want', 'need', 'can', 'will', 'should', 'could', 'would', 'about', 'these', 'the', 'what', 'which', 'how', 'where', 'when', 'why']
+            has_action_verb = any(verb in message_lower for verb in action_verbs)
+            
+            # Check for common question words and general terms
+            general_terms = ['these', 'the', 'some', 'any', 'all', 'many', 'few', 'most', 'best', 'famous', 'popular', 'important', 'favorite', 'favourite']
+            has_general_term = any(term in message_lower for term in general_terms)
+            
+            # Only treat as pagoda name if:
+            # 1. No action verbs present
+            # 2. No general terms present
+            # 3. Looks like a proper noun (starts with capital letter or is title case)
+            # 4. Reasonable length
+            # 5. Matches pagoda name pattern
+            # 6. Not a common word that could be confused
+            if (not has_action_verb and 
+                not has_general_term and
+                1 <= len(name_candidate) <= 40 and 
+                re.match(r'^[A-Za-z\s\-]+$', name_candidate) and
+                (name_candidate[0].isupper() or name_candidate.istitle()) and
+                name_candidate.lower() not in ['these', 'the', 'some', 'any', 'all', 'many', 'few', 'most', 'best', 'famous', 'popular', 'important', 'favorite', 'favourite', 'pagodas', 'temples', 'sites', 'places']):
+                pagoda = self._find_pagoda_by_name(name_candidate)
+                if pagoda:
+                    intent = 'pagoda_info'
+                    groups = ('', name_candidate)
+
+        return intent, groups, ml_conf, fallback
+
     def _load_pagoda_data(self) -> List[Dict[str, Any]]:
         """Load pagoda data from the existing data source"""
         try:
@@ -1135,33 +1281,22 @@ class BaganeticChatbot:
         except Exception as e:
             print(f"Error initializing pathfinder: {e}")
     
-    def _detect_intent(self, message: str) -> Tuple[str, List[str]]:
+    def _detect_intent(self, message: str, features: Optional[MessageFeatures] = None) -> Tuple[str, List[str]]:
         """Detect user intent from the message using improved keyword matching"""
-        message_lower = message.lower().strip()
-        
-        
-        # Special handling for suggestion prompts first
-        if message_lower in ['show me more routes', 'plan another route', 'what are the best routes in bagan?']:
-            return 'recommendations', ['route suggestions']
+        if features is None:
+            features = self.extract_features(message)
+        message_lower = features.normalized
         
-        if message_lower in ['find pagodas near the destination', 'find pagodas near sulamani']:
-            return 'nearby', ['destination']
+        # Special handling for suggestion prompts and general pagoda queries first
+        if message_lower in self.exact_intents:
+            intent, groups = self.exact_intents[message_lower]
+            return intent, list(groups)
         
-        if message_lower in ['show me more', 'tell me more', 'what else']:
-            return 'general_help', ['more information']
-        
-        # Handle general pagoda queries that shouldn't be treated as specific names
-        if message_lower in ['tell me about these pagodas', 'tell me about the pagodas', 'tell me about pagodas', 'about these pagodas', 'about the pagodas', 'about pagodas']:
-            return 'recommendations', ['general pagoda information']
-        
-        if message_lower in ['show me pagodas', 'show me the pagodas', 'show me these pagodas']:
-            return 'recommendations', ['pagoda list']
-        
-        if message_lower in ['what pagodas', 'which pagodas', 'what are the pagodas', 'which are the pagodas']:
-            return 'recommendations', ['pagoda information']
+        # Every intent keyword and trigger phrase in the message, from one pass
+        found = features.hits
         
         # Special handling for common patterns - but only for specific pagoda names
-        if any(word in message_lower for word in ['tell me about', 'information about', 'details about']):
+        if any(word in found for word in ['tell me about', 'information about', 'details about']):
             # Extract pagoda name after "about" - but only for specific pagoda names
             parts = message_lower.split('about')
             if len(parts) > 1:
@@ -1170,7 +1305,7 @@ class BaganeticChatbot:
                 if pagoda_name and pagoda_name not in ['these pagodas', 'the pagodas', 'pagodas', 'these', 'the']:
                     return 'pagoda_info', [pagoda_name]
         
-        if 'what is' in message_lower:
+        if 'what is' in found:
             # Extract pagoda name after "what is"
             parts = message_lower.split('what is')
             if len(parts) > 1:
@@ -1178,7 +1313,7 @@ class BaganeticChatbot:
                 if pagoda_name:
                     return 'pagoda_info', [pagoda_name]
         
-        if 'show me information about' in message_lower:
+        if 'show me information about' in found:
             # Extract pagoda name after "show me information about"
             parts = message_lower.split('show me information about')
             if len(parts) > 1:
@@ -1187,10 +1322,10 @@ class BaganeticChatbot:
                     return 'pagoda_info', [pagoda_name]
         
         # Nearby search patterns
-        if any(pattern in message_lower for pattern in ['find pagodas near', 'pagodas near', 'nearby pagodas around', 'what\'s near']):
+        if any(pattern in found for pattern in ['find pagodas near', 'pagodas near', 'nearby pagodas around', 'what\'s near']):
             # Extract pagoda name after "near" or "around"
             for keyword in ['near', 'around']:
-                if keyword in message_lower:
+                if keyword in found:
                     parts = message_lower.split(keyword)
                     if len(parts) > 1:
                         pagoda_name = parts[1].strip()
@@ -1198,21 +1333,21 @@ class BaganeticChatbot:
                             return 'nearby', [pagoda_name]
         
         # Handle "nearby pagodas around X" pattern specifically
-        if 'nearby pagodas around' in message_lower:
+        if 'nearby pagodas around' in found:
             parts = message_lower.split('nearby pagodas around')
             if len(parts) > 1:
                 pagoda_name = parts[1].strip()
                 if pagoda_name:
                     return 'nearby', [pagoda_name]
         
-        if 'what are the' in message_lower and any(word in message_lower for word in ['must-see', 'best', 'famous', 'popular']):
+        if 'what are the' in found and any(word in found for word in ['must-see', 'best', 'famous', 'popular']):
             return 'recommendations', ['must-see pagodas']
         
         # Itinerary planning
-        if any(phrase in message_lower for phrase in ['plan a day trip', 'create an itinerary', 'day trip to bagan', 'what should i see in bagan']):
+        if any(phrase in found for phrase in ['plan a day trip', 'create an itinerary', 'day trip to bagan', 'what should i see in bagan']):
             return 'itinerary', ['day trip']
         
-        if 'history of' in message_lower:
+        if 'history of' in found:
             # Extract pagoda name after "history of"
             parts = message_lower.split('history of')
             if len(parts) > 1:
@@ -1220,7 +1355,7 @@ class BaganeticChatbot:
                 if pagoda_name:
                     return 'history_culture', [pagoda_name]
         
-        if 'when was' in message_lower and 'built' in message_lower:
+        if 'when was' in found and 'built' in found:
             # Extract pagoda name between "when was" and "built"
             parts = message_lower.split('when was')
             if len(parts) > 1:
@@ -1228,7 +1363,7 @@ class BaganeticChatbot:
                 if middle_part:
                     return 'history_culture', [middle_part]
         
-        if 'cultural significance of' in message_lower:
+        if 'cultural significance of' in found:
             # Extract pagoda name after "cultural significance of"
             parts = message_lower.split('cultural significance of')
             if len(parts) > 1:
@@ -1242,7 +1377,7 @@ class BaganeticChatbot:
             score = 0
             matched_keywords = []
             for keyword in keywords:
-                if keyword in message_lower:
+                if keyword in found:
                     # Give higher score to multi-word keywords
                     word_count = len(keyword.split())
                     if word_count > 1:
@@ -1282,57 +1417,31 @@ class BaganeticChatbot:
         # Try alias map first (fastest)
         alias_norm = self._normalize_text(name)
         if alias_norm in self.alias_map:
-            pid = self.alias_map[alias_norm]
-            for pagoda in self.pagoda_data:
-                if pagoda.get('id', '').lower() == pid:
-                    return pagoda
-        
-        # Direct exact matches
-        for pagoda in self.pagoda_data:
-            pagoda_name = pagoda.get('name', '').lower()
-            short_name = pagoda.get('shortName', '').lower()
-            pagoda_id = pagoda.get('id', '').lower()
-            
-            if name_lower in [pagoda_name, short_name, pagoda_id]:
+            pagoda = self.pagoda_by_id.get(self.alias_map[alias_norm].lower())
+            if pagoda:
                 return pagoda
         
-        # Partial matches (substring)
-        partial_matches = []
-        for pagoda in self.pagoda_data:
-            pagoda_name = pagoda.get('name', '').lower()
-            short_name = pagoda.get('shortName', '').lower()
-            
-            if name_lower in pagoda_name or name_lower in short_name:
-                # Score based on match position and length
-                score = 0.8 if name_lower in pagoda_name else 0.7
-                partial_matches.append((score, pagoda))
+        # Direct exact matches
+        if name_lower in self.exact_names:
+            return self.exact_names[name_lower]
         
-        if partial_matches:
-            partial_matches.sort(key=lambda x: x[0], reverse=True)
-            return partial_matches[0][1]
+        # Partial matches (substring): full names rank above short names
+        pagoda = self.name_index.first(name_lower) or self.short_name_index.first(name_lower)
+        if pagoda:
+            return pagoda
         
         # Fuzzy matching for typos and variations (more conservative)
-        fuzzy_candidates = []
-        for pagoda in self.pagoda_data:
-            pagoda_name = pagoda.get('name', '').lower()
-            short_name = pagoda.get('shortName', '').lower()
-            pagoda_id = pagoda.get('id', '').lower()
-            
-            # Calculate similarity scores
-            name_score = difflib.SequenceMatcher(None, name_lower, pagoda_name).ratio()
-            short_score = difflib.SequenceMatcher(None, name_lower, short_name).ratio()
-            id_score = difflib.SequenceMatcher(None, name_lower, pagoda_id).ratio()
-            
-            max_score = max(name_score, short_score, id_score)
-            # Higher threshold to avoid false positives
-            if max_score >= 0.8:
-                fuzzy_candidates.append((max_score, pagoda))
+        fuzzy_candidates = {}
+        for score, _key, pagoda in self.fuzzy_name_index.search(name_lower, 0.8):
+            # Best score per pagoda across its name, short name and id
+            if id(pagoda) not in fuzzy_candidates:
+                fuzzy_candidates[id(pagoda)] = (score, pagoda)
         
         if fuzzy_candidates:
-            fuzzy_candidates.sort(key=lambda x: x[0], reverse=True)
+            ranked = sorted(fuzzy_candidates.values(), key=lambda x: x[0], reverse=True)
             # Only return if the best match is significantly better than others
-            if len(fuzzy_candidates) == 1 or fuzzy_candidates[0][0] - fuzzy_candidates[1][0] > 0.1:
-                return fuzzy_candidates[0][1]
+            if len(ranked) == 1 or ranked[0][0] - ranked[1][0] > 0.1:
+                return ranked[0][1]
 
         return None
 
@@ -1340,15 +1449,14 @@ class BaganeticChatbot:
         """Suggest similar pagoda names for clarification prompts."""
         candidates = []
         q = self._normalize_text(query)
-        keys = list(self.alias_map.keys())
         try:
-            # Use difflib on alias keys for better coverage
-            matches = difflib.get_close_matches(q, keys, n=limit, cutoff=0.6)
-            for m in matches:
-                pid = self.alias_map[m]
-                p = next((x for x in self.pagoda_data if x.get('id') == pid), None)
+            # difflib's close matches on alias keys for better coverage
+            for alias in self.close_alias_index.get_close_matches(q, limit, 0.6):
+                p = self.pagoda_by_id.get(self.alias_map[alias].lower())
                 if p:
-                    candidates.append(p.get('name') or p.get('shortName') or p.get('id'))
+                    name = p.get('name') or p.get('shortName') or p.get('id')
+                    if name not in candidates:
+                        candidates.append(name)
         except Exception:
             pass
         return candidates
@@ -1395,6 +1503,11 @@ class BaganeticChatbot:
     
     def _get_pagoda_info_response(self, pagoda: Dict[str, Any]) -> str:
         """Generate detailed information response for a pagoda"""
+        return render_parts(self.response_cache.get_or_set(
+            ('pagoda_info', pagoda['id']), lambda: self._build_pagoda_info_parts(pagoda), self.static_cache_ttl))
+    
+    def _build_pagoda_info_parts(self, pagoda: Dict[str, Any]) -> List[Any]:
+        """Response parts describing a pagoda; phrasings are chosen in render_parts"""
         pagoda_name = pagoda.get('name', 'Unknown Pagoda')
         
         # More natural opening phrases
@@ -1405,11 +1518,11 @@ class BaganeticChatbot:
             f"**{pagoda_name}** has such an amazing story!",
             f"**{pagoda_name}** is absolutely worth learning about!"
         ]
-        response = random.choice(openings) + "\n\n"
+        parts = [openings, "\n\n"]
         
         # Basic info
         if pagoda.get('description', {}).get('short'):
-            response += f"{pagoda['description']['short']}\n\n"
+            parts.append(f"{pagoda['description']['short']}\n\n")
         
         # History with more natural language
         if pagoda.get('history'):
@@ -1420,14 +1533,14 @@ class BaganeticChatbot:
                 "**This pagoda has an amazing history:**",
                 "**Let me share the historical story:**"
             ]
-            response += random.choice(history_intros) + "\n"
+            parts += [history_intros, "\n"]
             if history.get('built'):
-                response += f"- Built: {history['built']}\n"
+                parts.append(f"- Built: {history['built']}\n")
             if history.get('dynasty'):
-                response += f"- Dynasty: {history['dynasty']}\n"
+                parts.append(f"- Dynasty: {history['dynasty']}\n")
             if history.get('king'):
-                response += f"- King: {history['king']}\n"
-            response += "\n"
+                parts.append(f"- King: {history['king']}\n")
+            parts.append("\n")
         
         # Architecture with varied language
         if pagoda.get('architecture'):
@@ -1438,14 +1551,14 @@ class BaganeticChatbot:
                 "**The design features are remarkable:**",
                 "**The structural details are fascinating:**"
             ]
-            response += random.choice(arch_intros) + "\n"
+            parts += [arch_intros, "\n"]
             if arch.get('style'):
-                response += f"- Style: {arch['style']}\n"
+                parts.append(f"- Style: {arch['style']}\n")
             if arch.get('height'):
-                response += f"- Height: {arch['height']}\n"
+                parts.append(f"- Height: {arch['height']}\n")
             if arch.get('structure'):
-                response += f"- Structure: {arch['structure']}\n"
-            response += "\n"
+                parts.append(f"- Structure: {arch['structure']}\n")
+            parts.append("\n")
         
         # Religious significance with natural language
         if pagoda.get('religious'):
@@ -1456,12 +1569,12 @@ class BaganeticChatbot:
                 "**From a religious perspective:**",
                 "**The sacred aspects are fascinating:**"
             ]
-            response += random.choice(rel_intros) + "\n"
+            parts += [rel_intros, "\n"]
             if rel.get('significance'):
-                response += f"- {rel['significance']}\n"
+                parts.append(f"- {rel['significance']}\n")
             if rel.get('buddha_statues'):
-                response += f"- Buddha Statues: {rel['buddha_statues']}\n"
-            response += "\n"
+                parts.append(f"- Buddha Statues: {rel['buddha_statues']}\n")
+            parts.append("\n")
         
         # Visiting info with helpful tone
         if pagoda.get('visiting'):
@@ -1472,18 +1585,42 @@ class BaganeticChatbot:
                 "**Visiting details:**",
                 "**Practical information for visitors:**"
             ]
-            response += random.choice(visit_intros) + "\n"
+            parts += [visit_intros, "\n"]
             if visit.get('entrance_fee'):
-                response += f"- Entrance Fee: {visit['entrance_fee']}\n"
+                parts.append(f"- Entrance Fee: {visit['entrance_fee']}\n")
             if visit.get('opening_hours'):
-                response += f"- Opening Hours: {visit['opening_hours']}\n"
+                parts.append(f"- Opening Hours: {visit['opening_hours']}\n")
             if visit.get('duration'):
-                response += f"- Recommended Duration: {visit['duration']}\n"
+                parts.append(f"- Recommended Duration: {visit['duration']}\n")
         
-        return response
+        return parts
     
-    def _get_route_response(self, start_name: str, end_name: str) -> str:
+    def _detect_travel_mode(self, text: str) -> Tuple[str, str]:
+        """Detect a travel mode phrase; returns the mode and the text without it"""
+        for mode, pattern in TRAVEL_MODE_PATTERNS:
+            if mode in TRAVEL_PROFILES and pattern.search(text):
+                return mode, pattern.sub(' ', text).strip()
+        return DEFAULT_TRAVEL_MODE, text
+    
+    def _estimate_travel_minutes(self, distance: float, mode: str = DEFAULT_TRAVEL_MODE) -> float:
+        """Estimate travel time in minutes for a distance and travel mode"""
+        profile = TRAVEL_PROFILES.get(mode, TRAVEL_PROFILES[DEFAULT_TRAVEL_MODE])
+        return distance * 60.0 / profile['speed_kmh']
+    
+    def _get_route_response(self, start_name: str, end_name: str, mode: str = DEFAULT_TRAVEL_MODE) -> str:
         """Generate route planning response"""
+        key = ('route', start_name, end_name, mode)
+        response = self.response_cache.get(key)
+        if response is MISSING:
+            response, from_pathfinder = self._build_route_response(start_name, end_name, mode)
+            # Fallback replies are not cached, so the pathfinder is retried next time
+            if from_pathfinder:
+                self.response_cache.set(key, response)
+        return response
+    
+    def _build_route_response(self, start_name: str, end_name: str,
+                              mode: str = DEFAULT_TRAVEL_MODE) -> Tuple[str, bool]:
+        """The route reply, and whether it was built from a pathfinder route"""
         # Find start and end pagodas
         start_pagoda = self._find_pagoda_by_name(start_name)
         end_pagoda = self._find_pagoda_by_name(end_name)
@@ -1491,19 +1628,19 @@ class BaganeticChatbot:
         if not start_pagoda:
             suggestions = self._suggest_similar_pagodas(start_name, limit=3)
             if suggestions:
-                return f"I couldn't find '{start_name}'. Did you mean:\n\n" + "\n".join(f"- {s}" for s in suggestions)
+                return f"I couldn't find '{start_name}'. Did you mean:\n\n" + "\n".join(f"- {s}" for s in suggestions), False
             else:
-                return f"I couldn't find a pagoda named '{start_name}'. Please check the spelling."
+                return f"I couldn't find a pagoda named '{start_name}'. Please check the spelling.", False
         
         if not end_pagoda:
             suggestions = self._suggest_similar_pagodas(end_name, limit=3)
             if suggestions:
-                return f"I couldn't find '{end_name}'. Did you mean:\n\n" + "\n".join(f"- {s}" for s in suggestions)
+                return f"I couldn't find '{end_name}'. Did you mean:\n\n" + "\n".join(f"- {s}" for s in suggestions), False
             else:
-                return f"I couldn't find a pagoda named '{end_name}'. Please check the spelling."
+                return f"I couldn't find a pagoda named '{end_name}'. Please check the spelling.", False
         
         if start_pagoda['id'] == end_pagoda['id']:
-            return f"You're already at {start_pagoda['name']}! No route needed."
+            return f"You're already at {start_pagoda['name']}! No route needed.", False
         
         # Calculate distance
         distance = self._calculate_distance(start_pagoda, end_pagoda)
@@ -1512,11 +1649,13 @@ class BaganeticChatbot:
         if self.pathfinder:
             try:
                 # Use the pathfinder to get the route
-                route = self.pathfinder.find_path_astar(start_pagoda['name'], end_pagoda['name'])
+                route = self.pathfinder.find_path_astar(start_pagoda['name'], end_pagoda['name'], mode)
                 if route and len(route) > 1:
+                    distance = self.pathfinder.calculate_path_distance(route, mode)
+                    minutes = self.pathfinder.estimate_travel_minutes(distance, mode)
                     response = f"**Route from {start_pagoda['name']} to {end_pagoda['name']}:**\n\n"
                     response += f"**Distance:** {distance:.2f} km\n"
-                    response += f"**Estimated Time:** {distance * 2:.0f} minutes (walking)\n\n"
+                    response += f"**Estimated Time:** {minutes:.0f} minutes ({TRAVEL_PROFILES[mode]['label'].lower()})\n\n"
                     response += "**Route:**\n"
                     
                     for i, pagoda_name in enumerate(route):
@@ -1532,14 +1671,15 @@ class BaganeticChatbot:
                     response += f"- Bring water and sun protection\n"
                     response += f"- Check opening hours before visiting\n"
                     
-                    return response
+                    return response, True
             except Exception as e:
                 print(f"Pathfinder error: {e}")
         
         # Fallback: Simple distance-based response
         response = f"**Route from {start_pagoda['name']} to {end_pagoda['name']}:**\n\n"
+        profile = TRAVEL_PROFILES.get(mode, TRAVEL_PROFILES[DEFAULT_TRAVEL_MODE])
         response += f"**Distance:** {distance:.2f} km\n"
-        response += f"**Estimated Time:** {distance * 2:.0f} minutes (walking)\n\n"
+        response += f"**Estimated Time:** {self._estimate_travel_minutes(distance, mode):.0f} minutes ({profile['label'].lower()})\n\n"
         response += f"**Directions:**\n"
         response += f"1. Start at {start_pagoda['name']}\n"
         response += f"2. Head towards {end_pagoda['name']}\n"
@@ -1549,10 +1689,15 @@ class BaganeticChatbot:
         response += f"- Bring water and sun protection\n"
         response += f"- Check opening hours before visiting\n"
         
-        return response
+        return response, False
     
     def _get_recommendations_response(self, context: str = "") -> str:
         """Generate recommendations based on context"""
+        return render_parts(self.response_cache.get_or_set(
+            ('recommendations',), self._build_recommendation_parts, self.static_cache_ttl))
+    
+    def _build_recommendation_parts(self) -> List[Any]:
+        """Response parts recommending the featured pagodas; phrasings are chosen in render_parts"""
         featured_pagodas = [p for p in self.pagoda_data if p.get('featured', False)]
         
         if not featured_pagodas:
@@ -1567,15 +1712,15 @@ class BaganeticChatbot:
             "**These are Bagan's most spectacular sites:**",
             "**You absolutely must visit these pagodas:**"
         ]
-        response = random.choice(openings) + "\n\n"
+        parts = [openings, "\n\n"]
         
         for i, pagoda in enumerate(featured_pagodas[:5], 1):
-            response += f"{i}. **{pagoda.get('name', 'Unknown')}**\n"
+            parts.append(f"{i}. **{pagoda.get('name', 'Unknown')}**\n")
             if pagoda.get('description', {}).get('short'):
-                response += f"   {pagoda['description']['short']}\n"
+                parts.append(f"   {pagoda['description']['short']}\n")
             if pagoda.get('history', {}).get('built'):
-                response += f"   Built: {pagoda['history']['built']}\n"
-            response += "\n"
+                parts.append(f"   Built: {pagoda['history']['built']}\n")
+            parts.append("\n")
         
         # More natural tips
         tip_intros = [
@@ -1584,16 +1729,20 @@ class BaganeticChatbot:
             "**Some insider advice for your journey:**",
             "**Tips to help you make the most of your visit:**"
         ]
-        response += random.choice(tip_intros) + "\n"
-        response += "- Visit during sunrise or sunset for the best views\n"
-        response += "- Wear comfortable shoes for walking\n"
-        response += "- Bring water and sun protection\n"
-        response += "- Respect the religious sites and dress modestly\n"
+        parts += [tip_intros, "\n"]
+        parts.append("- Visit during sunrise or sunset for the best views\n")
+        parts.append("- Wear comfortable shoes for walking\n")
+        parts.append("- Bring water and sun protection\n")
+        parts.append("- Respect the religious sites and dress modestly\n")
         
-        return response
+        return parts
     
     def _get_nearby_pagodas_response(self, pagoda_name: str, radius: float = 1.0) -> str:
         """Find and return nearby pagodas"""
+        return self.response_cache.get_or_set(
+            ('nearby', pagoda_name, radius), lambda: self._build_nearby_pagodas_response(pagoda_name, radius))
+    
+    def _build_nearby_pagodas_response(self, pagoda_name: str, radius: float = 1.0) -> str:
         center_pagoda = self._find_pagoda_by_name(pagoda_name)
         
         if not center_pagoda:
@@ -1625,6 +1774,9 @@ class BaganeticChatbot:
     
     def _get_itinerary_response(self, context: str = "") -> str:
         """Generate itinerary planning response"""
+        return self.response_cache.get_or_set(('itinerary',), self._build_itinerary_response, self.static_cache_ttl)
+    
+    def _build_itinerary_response(self) -> str:
         featured_pagodas = [p for p in self.pagoda_data if p.get('featured', False)]
         
         if not featured_pagodas:
@@ -1720,39 +1872,6 @@ class BaganeticChatbot:
         else:
             return 'beginner'
     
-    def _get_cached_response(self, message: str, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get cached response if available and not expired"""
-        cache_key = f"{user_id}:{message.lower().strip()}"
-        current_time = time.time()
-        
-        if cache_key in self.response_cache:
-            cached_data = self.response_cache[cache_key]
-            if current_time - cached_data['timestamp'] < self.cache_ttl:
-                return cached_data['response']
-            else:
-                # Remove expired cache entry
-                del self.response_cache[cache_key]
-        
-        return None
-    
-    def _cache_response(self, message: str, user_id: str, response: Dict[str, Any]):
-        """Cache response for future use"""
-        cache_key = f"{user_id}:{message.lower().strip()}"
-        current_time = time.time()
-        
-        # Clean up old cache entries if cache is too large
-        if len(self.response_cache) >= self.max_cache_size:
-            # Remove oldest entries
-            oldest_keys = sorted(self.response_cache.keys(), 
-                               key=lambda k: self.response_cache[k]['timestamp'])[:self.max_cache_size//2]
-            for key in oldest_keys:
-                del self.response_cache[key]
-        
-        self.response_cache[cache_key] = {
-            'response': response,
-            'timestamp': current_time
-        }
-    
     def _generate_contextual_suggestions(self, user_id: str, current_pagoda: Dict[str, Any]) -> List[str]:
         """Generate contextual suggestions based on conversation history and current pagoda"""
         suggestions = []
@@ -1779,16 +1898,59 @@ class BaganeticChatbot:
         # Limit to 4 suggestions
         return suggestions[:4]
     
+    def analyze_messages(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """
+        Intent, pagoda entities and topic for a batch of messages, e.g. for
+        offline analytics of logged conversations. The intent ensemble runs
+        once over the whole batch; no conversation memory, cache or metrics
+        are touched and no response is generated.
+        """
+        features = [self.extract_features(message) for message in messages]
+        try:
+            ml_results = self.intent_models.classify_terms([f.ngrams for f in features]) if self.intent_models else None
+        except Exception as e:
+            print(f"Error in ensemble classification: {e}")
+            ml_results = None
+        if ml_results is None:
+            ml_results = [('unknown', 0.0)] * len(messages)
+
+        results = []
+        for message, message_features, (ml_intent, ml_conf) in zip(messages, features, ml_results):
+            intent, groups, confidence, _fallback = self._resolve_intent(message, ml_intent, ml_conf, message_features)
+            topic_scores = self.topic_classifier.classify_topic(message, message_features)
+            results.append({
+                'message': message,
+                'intent': intent,
+                'confidence': round(confidence, 4),
+                'ml_intent': ml_intent,
+                'ml_confidence': round(ml_conf, 4),
+                'entities': [
+                    {
+                        'id': entity['pagoda'].get('id'),
+                        'name': entity['pagoda'].get('name'),
+                        'matched': entity['name'],
+                        'confidence': entity['confidence']
+                    }
+                    for entity in self.entity_extractor.extract_pagodas(message, message_features)
+                ],
+                'topic': max(topic_scores, key=topic_scores.get) if topic_scores else 'general',
+                'topic_scores': topic_scores
+            })
+        return results
+
     def process_message(self, message: str, user_id: str = "default") -> Dict[str, Any]:
         """Process user message and generate response with advanced NLP capabilities"""
+        started = time.perf_counter()
+        # One session per message: the user's state is loaded once and saved after the reply
+        with self.sessions.session(user_id):
+            result = self._process_message(message, user_id)
+        self.message_stats.observe(result.get('intent', 'unknown'), time.perf_counter() - started,
+                                   result.get('sentiment'))
+        return result
+
+    def _process_message(self, message: str, user_id: str) -> Dict[str, Any]:
         start_time = datetime.now()
         
-        # Check cache first for simple queries
-        cached_response = self._get_cached_response(message, user_id)
-        if cached_response:
-            print(f"[chatbot] Cache hit for user {user_id}")
-            return cached_response
-        
         # Initialize conversation memory for user
         if user_id not in self.conversation_memory:
             self.conversation_memory[user_id] = {
@@ -1811,87 +1973,49 @@ class BaganeticChatbot:
             'type': 'user'
         })
         
+        # Normalized text, tokens and keyword hits, shared by every analyzer below
+        features = self.extract_features(message)
+        
         # Advanced context analysis
         context = self.context_analyzer.analyze_context(
             self.conversation_memory[user_id]['history'], 
-            message
+            message,
+            features
         )
         
         # Sentiment analysis
-        sentiment = self.sentiment_analyzer.analyze_sentiment(message)
+        sentiment = self.sentiment_analyzer.analyze_sentiment(message, features)
         self.conversation_memory[user_id]['sentiment_history'].append(sentiment)
         
+        # Keep only recent sentiments (last 50 messages)
+        if len(self.conversation_memory[user_id]['sentiment_history']) > 50:
+            self.conversation_memory[user_id]['sentiment_history'] = self.conversation_memory[user_id]['sentiment_history'][-50:]
+        
         # Language detection (simplified for English focus)
         detected_language = 'english'  # Focus on English as requested
         
         # Entity extraction
-        extracted_pagodas = self.entity_extractor.extract_pagodas(message)
+        extracted_pagodas = self.entity_extractor.extract_pagodas(message, features)
         
         # Advanced question analysis
-        question_analysis = self.question_analyzer.analyze_question(message)
+        question_analysis = self.question_analyzer.analyze_question(message, features)
         
         # Topic classification
-        primary_topic = self.topic_classifier.get_primary_topic(message)
-        
-        # Enhanced intent detection (Hybrid: Ensemble ML + regex fallback)
-        ml_intent, ml_conf = self._classify_intent_ensemble(message)
-        intent, groups = self._detect_intent(message)
-        
-        # Intent refinement
-        refined_intent, intent_confidence = self.intent_refinement.refine_intent(message, intent)
-        if intent_confidence > ml_conf:
-            intent = refined_intent
-            ml_conf = intent_confidence
-
-        # Routing strategy
-        # 1) If regex found a clear intent, prefer it (deterministic)
-        # 2) Else if ML confidence high, use ML
-        # 3) Else remain unknown
-        low_confidence_ml = False
-        if intent == 'unknown':
-            if ml_conf >= 0.75:
-                intent = ml_intent
-            elif ml_conf >= 0.5:
-                # Tentative: record low-confidence recommendation to clarify later
-                intent = ml_intent
-                self.metrics['fallback_counts']['low_confidence_ml'] += 1
-                low_confidence_ml = True
-            else:
-                self.metrics['fallback_counts']['unknown_intent'] += 1
+        primary_topic = self.topic_classifier.get_primary_topic(message, features)
+        
+        # Enhanced intent detection (Hybrid: Ensemble ML + regex fallback),
+        # shared across users since it depends only on the message text
+        def classify():
+            ml_intent, ml_conf = self._classify_intent_ensemble(message, features)
+            return (ml_intent,) + self._resolve_intent(message, ml_intent, ml_conf, features)
+        ml_intent, intent, groups, ml_conf, fallback = self.response_cache.get_or_set(
+            ('intent', message), classify, self.static_cache_ttl)
+        low_confidence_ml = fallback == 'low_confidence_ml'
+        if fallback:
+            self.metrics['fallback_counts'][fallback] += 1
 
         self.metrics['intent_counts'][intent] += 1
 
-        # Fallback: if message looks like a single word/name, try pagoda lookup directly
-        # Only trigger if no action verbs are present and it looks like a proper noun
-        if intent == 'unknown':
-            name_candidate = message.strip()
-            message_lower = message.lower()  # Define message_lower in this scope
-            # Check if message contains action verbs that should not be treated as pagoda names
-            action_verbs = ['show', 'find', 'plan', 'tell', 'get', 'give', 'help', 'want', 'need', 'can', 'will', 'should', 'could', 'would', 'about', 'these', 'the', 'what', 'which', 'how', 'where', 'when', 'why']
-            has_action_verb = any(verb in message_lower for verb in action_verbs)
-            
-            # Check for common question words and general terms
-            general_terms = ['these', 'the', 'some', 'any', 'all', 'many', 'few', 'most', 'best', 'famous', 'popular', 'important', 'favorite', 'favourite']
-            has_general_term = any(term in message_lower for term in general_terms)
-            
-            # Only treat as pagoda name if:
-            # 1. No action verbs present
-            # 2. No general terms present
-            # 3. Looks like a proper noun (starts with capital letter or is title case)
-            # 4. Reasonable length
-            # 5. Matches pagoda name pattern
-            # 6. Not a common word that could be confused
-            if (not has_action_verb and 
-                not has_general_term and
-                1 <= len(name_candidate) <= 40 and 
-                re.match(r'^[A-Za-z\s\-]+$', name_candidate) and
-                (name_candidate[0].isupper() or name_candidate.istitle()) and
-                name_candidate.lower() not in ['these', 'the', 'some', 'any', 'all', 'many', 'few', 'most', 'best', 'famous', 'popular', 'important', 'favorite', 'favourite', 'pagodas', 'temples', 'sites', 'places']):
-                pagoda = self._find_pagoda_by_name(name_candidate)
-                if pagoda:
-                    intent = 'pagoda_info'
-                    groups = ('', name_candidate)
-        
         # Update contextual memory
         self.contextual_memory.update_context(user_id, message, intent, [p['pagoda']['name'] for p in extracted_pagodas])
         
@@ -1904,8 +2028,6 @@ class BaganeticChatbot:
         
         # Update metrics
         response_time = (datetime.now() - start_time).total_seconds()
-        self.metrics['response_times'].append(response_time)
-        self.metrics['sentiment_scores'].append(sentiment['sentiment'])
         
         try:
             if intent == 'greeting':
@@ -2014,7 +2136,7 @@ class BaganeticChatbot:
             
             elif intent == 'pathfinding':
                 # Extract route information from message
-                message_lower = message.lower()
+                message_lower = features.lower
                 
                 # Look for "from X to Y" patterns
                 if 'from' in message_lower and 'to' in message_lower:
@@ -2035,7 +2157,11 @@ class BaganeticChatbot:
                     start_name = end_name = None
                 
                 if start_name and end_name:
-                    response = self._get_route_response(start_name, end_name)
+                    mode, start_name = self._detect_travel_mode(start_name)
+                    end_mode, end_name = self._detect_travel_mode(end_name)
+                    if end_mode != DEFAULT_TRAVEL_MODE:
+                        mode = end_mode
+                    response = self._get_route_response(start_name, end_name, mode)
                     suggestions = [
                         "Find pagodas near the destination",
                         "Plan another route",
@@ -2078,7 +2204,7 @@ class BaganeticChatbot:
                     pagoda_name = groups[0].strip()
                 else:
                     # Fallback: try to extract from message
-                    message_lower = message.lower()
+                    message_lower = features.lower
                     for keyword in ['near', 'around', 'close to', 'surrounding']:
                         if keyword in message_lower:
                             parts = message_lower.split(keyword)
@@ -2110,7 +2236,7 @@ class BaganeticChatbot:
                     pagoda_name = groups[0].strip()
                 else:
                     # Try to extract from message
-                    message_lower = message.lower()
+                    message_lower = features.lower
                     for keyword in ['history', 'historical', 'culture', 'cultural', 'built', 'constructed']:
                         if keyword in message_lower:
                             # Look for pagoda name after the keyword
@@ -2191,7 +2317,7 @@ class BaganeticChatbot:
         # Since we're focusing on English, no language detection needed
         
         # Additional sentiment-aware enhancements
-        if sentiment['sentiment'] == 'negative' and 'confused' in message.lower():
+        if sentiment['sentiment'] == 'negative' and 'confused' in features.hits:
             response = "I understand this might be overwhelming! Let me help you step by step. " + response
         elif sentiment['sentiment'] == 'positive':
             response = response.replace("I can help", "I'd love to help")
@@ -2210,7 +2336,7 @@ class BaganeticChatbot:
         
         # Learn from interaction
         user_satisfaction = 0.7 if sentiment['sentiment'] == 'positive' else 0.3
-        self.conversation_learning.learn_from_interaction(user_id, message, response, user_satisfaction)
+        self.conversation_learning.learn_from_interaction(user_id, message, response, user_satisfaction, features)
         
         # Add response to history
         self.conversation_memory[user_id]['history'].append({
@@ -2245,30 +2371,59 @@ class BaganeticChatbot:
             'timestamp': datetime.now().isoformat()
         }
         
-        # Cache response for future use (only for simple queries)
-        if intent in ['greeting', 'general_help'] and len(message) < 50:
-            self._cache_response(message, user_id, final_response)
-        
         return final_response
 
 @app.route('/api/chatbot/metrics', methods=['GET'])
 def get_metrics():
-    """Return lightweight telemetry counters (for debugging/monitoring)."""
+    """
+    Telemetry in the Prometheus text format: per-intent response time
+    quantiles (p50/p95/p99), sentiment and throughput. ?format=json returns
+    the counters and a summary as JSON (for debugging).
+    """
     try:
         # Convert defaultdict to plain dict
         intent_counts = dict(chatbot.metrics.get('intent_counts', {}))
         fallback_counts = dict(chatbot.metrics.get('fallback_counts', {}))
-        return jsonify({
-            'success': True,
-            'data': {
-                'intent_counts': intent_counts,
-                'fallback_counts': fallback_counts,
-                'pagodas_loaded': len(chatbot.pagoda_data)
-            }
-        })
+        if request.args.get('format') == 'json':
+            return jsonify({
+                'success': True,
+                'data': {
+                    'intent_counts': intent_counts,
+                    'fallback_counts': fallback_counts,
+                    'messages': chatbot.message_stats.snapshot(),
+                    'pagodas_loaded': len(chatbot.pagoda_data)
+                }
+            })
+        
+        lines = chatbot.message_stats.prometheus_lines()
+        lines += counter_lines('chatbot_intent_total', "Messages classified per intent",
+                               'intent', intent_counts)
+        lines += counter_lines('chatbot_fallback_total', "Intent fallbacks per reason", 'reason', fallback_counts)
+        lines += gauge_lines('chatbot_active_sessions', "Users with a live session", len(chatbot.sessions))
+        cache = chatbot.response_cache.stats()
+        lines += gauge_lines('chatbot_response_cache_entries', "Cached response parts", cache['entries'])
+        lines += counter_lines('chatbot_response_cache_lookups_total', "Response cache lookups by result", 'result',
+                               {'hit': cache['hits'], 'miss': cache['misses']})
+        lines += gauge_lines('chatbot_pagodas_loaded', "Pagodas in the chatbot's catalogue", len(chatbot.pagoda_data))
+        return Response("\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
     except Exception as e:
         return jsonify({ 'success': False, 'error': str(e) }), 500
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Baganetic AI Chatbot server")
+    parser.add_argument('--build-model', action='store_true',
+                        help="Retrain the intent models, save them to CHATBOT_MODEL_PATH and exit")
+    return parser.parse_args()
+
+
+# Building the models needs no chatbot, which would otherwise train them first
+if __name__ == '__main__':
+    args = parse_args()
+    if args.build_model:
+        models = build_intent_models()
+        print(f"Saved {len(models or ())} intent models ({intent_model_version()}) to {INTENT_MODEL_PATH}")
+        sys.exit(0)
+
 # Initialize chatbot
 chatbot = BaganeticChatbot()
 
@@ -2300,14 +2455,49 @@ def chat():
             'error': str(e)
         }), 500
 
+@app.route('/api/chatbot/analyze', methods=['POST'])
+def analyze_batch():
+    """Stateless batch analysis: {"messages": [...]} -> intent, entities and topic per message"""
+    try:
+        data = request.get_json() or {}
+        messages = data.get('messages')
+
+        if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+            return jsonify({
+                'success': False,
+                'error': 'messages must be a list of strings'
+            }), 400
+        if len(messages) > BATCH_MAX_MESSAGES:
+            return jsonify({
+                'success': False,
+                'error': f'At most {BATCH_MAX_MESSAGES} messages per request'
+            }), 413
+
+        results = chatbot.analyze_messages([m.strip() for m in messages])
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'results': results,
+                'count': len(results)
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/chatbot/history/<user_id>', methods=['GET'])
 def get_chat_history(user_id):
     """Get chat history for a user"""
     try:
-        if user_id in chatbot.conversation_memory:
+        user_data = chatbot.conversation_memory.get(user_id)
+        if user_data:
             return jsonify({
                 'success': True,
-                'data': chatbot.conversation_memory[user_id]['history']
+                'data': user_data['history']
             })
         else:
             return jsonify({
@@ -2325,10 +2515,11 @@ def get_chat_history(user_id):
 def clear_chat_history(user_id):
     """Clear chat history for a user"""
     try:
-        if user_id in chatbot.conversation_memory:
-            chatbot.conversation_memory[user_id]['history'] = []
-            chatbot.conversation_memory[user_id]['context'] = {}
-            chatbot.conversation_memory[user_id]['last_pagoda'] = None
+        with chatbot.sessions.session(user_id):
+            if user_id in chatbot.conversation_memory:
+                chatbot.conversation_memory[user_id]['history'] = []
+                chatbot.conversation_memory[user_id]['context'] = {}
+                chatbot.conversation_memory[user_id]['last_pagoda'] = None
         
         return jsonify({
             'success': True,
@@ -2360,7 +2551,8 @@ def get_all_pagodas():
 def get_user_analytics(user_id):
     """Get user conversation analytics and insights"""
     try:
-        if user_id not in chatbot.conversation_memory:
+        user_data = chatbot.conversation_memory.get(user_id)
+        if not user_data:
             return jsonify({
                 'success': True,
                 'data': {
@@ -2371,8 +2563,6 @@ def get_user_analytics(user_id):
                 }
             })
         
-        user_data = chatbot.conversation_memory[user_id]
-        
         # Analyze conversation patterns
         message_count = len([msg for msg in user_data['history'] if msg.get('type') == 'user'])
         
@@ -2463,13 +2653,13 @@ def get_smart_recommendations(user_id):
 def get_personalized_recommendations(user_id):
     """Get personalized pagoda recommendations based on user history"""
     try:
-        if user_id not in chatbot.conversation_memory:
+        user_data = chatbot.conversation_memory.get(user_id)
+        if not user_data:
             return jsonify({
                 'success': True,
                 'data': chatbot._get_recommendations_response()
             })
         
-        user_data = chatbot.conversation_memory[user_id]
         visited_pagodas = user_data['preferences']['visited_pagodas']
         interests = user_data['preferences']['interests']
         
@@ -2522,6 +2712,7 @@ def get_personalized_recommendations(user_id):
 @app.route('/api/chatbot/advanced-features', methods=['GET'])
 def get_advanced_features():
     """Get information about advanced chatbot features"""
+    response_times = chatbot.message_stats.snapshot()['overall']
     return jsonify({
         'success': True,
         'data': {
@@ -2549,7 +2740,9 @@ def get_advanced_features():
                 'cache_size': len(chatbot.response_cache),
                 'max_cache_size': chatbot.max_cache_size,
                 'cache_ttl': chatbot.cache_ttl,
-                'average_response_time': sum(chatbot.metrics['response_times'][-10:]) / len(chatbot.metrics['response_times'][-10:]) if chatbot.metrics['response_times'] else 0
+                'cache_hit_rate': chatbot.response_cache.stats()['hit_rate'],
+                'average_response_time': response_times['mean_seconds'],
+                'p95_response_time': response_times['quantiles_seconds']['0.95']
             }
         }
     })
@@ -2573,8 +2766,9 @@ def health_check():
         },
         'pagodas_loaded': len(chatbot.pagoda_data),
         'pathfinder_available': chatbot.pathfinder is not None,
-        'active_users': len(chatbot.conversation_memory),
-        'models_trained': len(chatbot.intent_models),
+        'active_users': len(chatbot.sessions),
+        'sessions': chatbot.sessions.stats(),
+        'models_trained': len(chatbot.intent_models or ()),
         'cache_entries': len(chatbot.response_cache),
         'total_messages_processed': sum(chatbot.metrics['intent_counts'].values())
     })
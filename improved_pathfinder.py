@@ -3,20 +3,289 @@ Improved Baganetic Pathfinder
 Creates a more realistic road network for Bagan pagodas
 """
 
+import os
+import sys
+import gzip
+import json
 import math
+import zlib
 import heapq
-from typing import List, Dict, Tuple, Optional
+import time
+import secrets
+import argparse
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Set, Tuple, Optional, Callable
 from road_routing import road_router
+from road_graph import RoadGraph, load_default_road_graph
+
+# Travel profiles share one graph topology. Each profile has its own average
+# speed and road factors for the straight-line distance bands
+# (<0.5 km, <1 km, <2 km, longer), from which its edge weights are derived.
+# Walkers and cyclists can use the sandy tracks between temples, while carts
+# and cars have to stay on the roads, so short hops cost them more.
+DEFAULT_TRAVEL_MODE = 'walking'
+TRAVEL_PROFILES = {
+    'walking': {'label': 'Walking', 'speed_kmh': 4.5, 'road_factors': (1.1, 1.2, 1.3, 1.4)},
+    'bicycle': {'label': 'Bicycle', 'speed_kmh': 12.0, 'road_factors': (1.15, 1.2, 1.3, 1.4)},
+    'ebike': {'label': 'E-bike', 'speed_kmh': 18.0, 'road_factors': (1.2, 1.25, 1.3, 1.35)},
+    'horse_cart': {'label': 'Horse cart', 'speed_kmh': 8.0, 'road_factors': (1.4, 1.35, 1.3, 1.3)},
+    'car': {'label': 'Car', 'speed_kmh': 25.0, 'road_factors': (1.4, 1.35, 1.3, 1.3)},
+}
+
+# Number of per-goal heuristic vectors kept for popular destinations
+HEURISTIC_CACHE_SIZE = 32
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller computes,
+    the others wait for it and share its result (or its exception)
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+        
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+        
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+
+
+# In-flight route computations shared by all pathfinder instances in the process
+route_flights = SingleFlight()
+
+# Precomputed road polylines for graph edges, written by the warm-up job
+EDGE_GEOMETRY_PATH = os.getenv("EDGE_GEOMETRY_PATH", "assets/data/edge_geometry.json.gz")
+EDGE_GEOMETRY_VERSION = 1
+
+
+class EdgeGeometryStore:
+    """
+    Road polylines between pairs of connected pagodas, stored once per
+    undirected edge and kept as gzipped JSON on disk. The file is reloaded
+    when the warm-up job rewrites it.
+    """
+    
+    def __init__(self, path: str = EDGE_GEOMETRY_PATH):
+        self.path = path
+        self.edges = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(a: str, b: str) -> Tuple[str, bool]:
+        """Canonical edge key and whether (a, b) runs against it"""
+        return (f"{a}|{b}", False) if a <= b else (f"{b}|{a}", True)
+    
+    def refresh(self):
+        """Reload the store if the file changed on disk"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            try:
+                with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == EDGE_GEOMETRY_VERSION:
+                    self.edges = data.get('edges', {})
+                self._mtime = mtime
+            except Exception as e:
+                print(f"Failed to load edge geometry {self.path}: {e}")
+    
+    def get(self, a: str, b: str) -> Optional[List[Dict]]:
+        """Road polyline from pagoda a to pagoda b, if precomputed"""
+        key, reverse = self._key(a, b)
+        points = self.edges.get(key)
+        if points is None:
+            return None
+        if reverse:
+            points = reversed(points)
+        return [{'lat': lat, 'lng': lng, 'name': "Road waypoint"} for lat, lng in points]
+    
+    def put(self, a: str, b: str, coordinates: List[Dict]):
+        key, reverse = self._key(a, b)
+        points = [[round(c['lat'], 6), round(c['lng'], 6)] for c in coordinates]
+        if reverse:
+            points.reverse()
+        self.edges[key] = points
+    
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({'version': EDGE_GEOMETRY_VERSION, 'edges': self.edges}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+
+edge_geometry_store = EdgeGeometryStore()
+
+# All-pairs road distance table, written by the warm-up job. Unlike the route
+# cache it never expires: the pathfinder only reads it
+ROAD_DISTANCE_PATH = os.getenv("ROAD_DISTANCE_PATH", "assets/data/road_distances.json.gz")
+ROAD_DISTANCE_VERSION = 1
+
+
+class RoadDistanceStore:
+    """
+    Road distance table (km, None for unreachable pairs) between the pagoda
+    points it was fetched for, kept as gzipped JSON on disk. A table for
+    other points (pagodas added or moved) is ignored.
+    """
+    
+    def __init__(self, path: str = ROAD_DISTANCE_PATH):
+        self.path = path
+    
+    @staticmethod
+    def _pack_points(points: List[Tuple[float, float]]) -> List[List[float]]:
+        return [[round(lat, 6), round(lng, 6)] for lat, lng in points]
+    
+    def load(self, points: List[Tuple[float, float]]) -> Optional[List[List[Optional[float]]]]:
+        """The stored table, if it was fetched for exactly these points"""
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Failed to load road distances {self.path}: {e}")
+            return None
+        if data.get('version') != ROAD_DISTANCE_VERSION or data.get('points') != self._pack_points(points):
+            return None
+        return data.get('distances')
+    
+    def save(self, points: List[Tuple[float, float]], distances: List[List[Optional[float]]]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({'version': ROAD_DISTANCE_VERSION, 'points': self._pack_points(points),
+                       'distances': distances}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+road_distance_store = RoadDistanceStore()
+
+# Progressive routes: how long a refined geometry stays fetchable by token
+ROUTE_REFINEMENT_TTL = int(os.getenv("ROUTE_REFINEMENT_TTL_S", "300"))
+ROUTE_REFINEMENT_MAX_JOBS = 1000
+ROUTE_REFINEMENT_WORKERS = 4
+
+
+class RouteRefinementStore:
+    """
+    Background computations of road-accurate route geometry, looked up by
+    an opaque token. Finished jobs are kept for ROUTE_REFINEMENT_TTL seconds.
+    """
+    
+    def __init__(self, ttl: int = ROUTE_REFINEMENT_TTL, max_jobs: int = ROUTE_REFINEMENT_MAX_JOBS,
+                 workers: int = ROUTE_REFINEMENT_WORKERS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()  # token -> {'status', 'result', 'created_at'}
+        self._changed = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="route-refine")
+    
+    def submit(self, compute: Callable[[], Optional[Dict]]) -> str:
+        """Start a computation and return its token"""
+        token = secrets.token_urlsafe(12)
+        with self._changed:
+            self._purge()
+            self.jobs[token] = {'status': 'pending', 'result': None, 'created_at': time.time()}
+        self.executor.submit(self._run, token, compute)
+        return token
+    
+    def _run(self, token: str, compute: Callable[[], Optional[Dict]]):
+        try:
+            result = compute()
+        except Exception as e:
+            print(f"Route refinement failed: {e}")
+            result = None
+        with self._changed:
+            job = self.jobs.get(token)
+            if job is not None:
+                job['status'] = 'complete' if result else 'failed'
+                job['result'] = result
+            self._changed.notify_all()
+    
+    def _purge(self):
+        """Drop expired jobs, and the oldest ones beyond max_jobs (lock held)"""
+        cutoff = time.time() - self.ttl
+        while self.jobs:
+            token, job = next(iter(self.jobs.items()))
+            if job['created_at'] >= cutoff and len(self.jobs) < self.max_jobs:
+                break
+            self.jobs.pop(token)
+    
+    def get(self, token: str) -> Optional[Dict]:
+        """Current state of a job, or None for an unknown or expired token"""
+        with self._changed:
+            job = self.jobs.get(token)
+            if job is None or job['created_at'] < time.time() - self.ttl:
+                return None
+            return dict(job)
+    
+    def wait(self, token: str, timeout: float) -> Optional[Dict]:
+        """Block until the job is no longer pending or the timeout passes"""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self.jobs.get(token, {}).get('status') != 'pending', timeout
+            )
+        return self.get(token)
+
+
+route_refinements = RouteRefinementStore()
+
 
 class ImprovedPagodaPathFinder:
     """
     Improved pathfinder with realistic road network connections
     """
     
-    def __init__(self, pagoda_data: List[Dict]):
+    def __init__(self, pagoda_data: List[Dict], road_graph: Optional[RoadGraph] = None,
+                 geometry_store: Optional[EdgeGeometryStore] = None):
         self.pagoda_data = pagoda_data
+        # Offline OSM road network, when one has been imported
+        self.road_graph = road_graph if road_graph is not None else load_default_road_graph()
+        # Warmed-up road polylines per graph edge
+        self.geometry_store = geometry_store if geometry_store is not None else edge_geometry_store
+        self.geometry_store.refresh()
+        # Real road distances between pagodas from the router's cached distance table
+        self.road_distances = self._load_road_distances()
         self.graph = self._build_realistic_graph()
-        self.path_cache = {}
+        self._build_compact_graph()
+        self.heuristic_cache = OrderedDict()
+        # The pathfinder is shared by concurrent requests
+        self._heuristic_lock = threading.Lock()
     
     def _build_realistic_graph(self):
         """
@@ -68,7 +337,8 @@ class ImprovedPagodaPathFinder:
             if pagoda in graph:
                 for connected_pagoda in connections:
                     if connected_pagoda in graph:
-                        distance = self._calculate_realistic_distance(
+                        distance = self._edge_distance(
+                            pagoda, connected_pagoda,
                             graph[pagoda]['location'],
                             graph[connected_pagoda]['location']
                         )
@@ -95,13 +365,120 @@ class ImprovedPagodaPathFinder:
             dists.sort(key=lambda x: x[0])
             for d, b in dists[:nearest_neighbors_k]:
                 if d <= nearest_max_km and b not in graph[a]['neighbors']:
-                    dist = self._calculate_realistic_distance(loc_a, graph[b]['location'])
+                    dist = self._edge_distance(a, b, loc_a, graph[b]['location'])
                     graph[a]['neighbors'][b] = dist
                     graph[b]['neighbors'][a] = dist
         
         return graph
     
-    def _calculate_realistic_distance(self, loc1: Dict, loc2: Dict) -> float:
+    def _pagoda_points(self) -> Tuple[List[str], List[Tuple[float, float]]]:
+        """Pagoda names and (lat, lng) in graph order"""
+        names, points = [], []
+        for pagoda in self.pagoda_data:
+            if pagoda['name'] in names:
+                continue
+            coords = pagoda['location']['coordinates']
+            names.append(pagoda['name'])
+            points.append((coords['lat'], coords['lng']))
+        return names, points
+    
+    def _load_road_distances(self, allow_fetch: bool = False) -> Dict[Tuple[str, str], float]:
+        """
+        Road distance table keyed by pagoda pair, from the distance store (or
+        the route cache); with allow_fetch=True it is fetched and stored again.
+        Empty when no table is available.
+        """
+        names, points = self._pagoda_points()
+        matrix = None
+        if allow_fetch:
+            try:
+                matrix = road_router.get_distance_matrix(points, allow_fetch=True)
+                if matrix:
+                    road_distance_store.save(points, matrix)
+            except Exception as e:
+                print(f"Distance matrix fetch failed: {e}")
+        if not matrix:
+            matrix = road_distance_store.load(points)
+        if not matrix:
+            try:
+                matrix = road_router.get_distance_matrix(points, allow_fetch=False)
+            except Exception as e:
+                print(f"Distance matrix lookup failed: {e}")
+        if not matrix:
+            if len(points) > 1:
+                print(f"No road distance table for these pagodas in {road_distance_store.path}; "
+                      f"edge weights use road factor estimates (run improved_pathfinder.py to fetch it)")
+            return {}
+        
+        distances = {}
+        for i, row in enumerate(matrix):
+            for j, km in enumerate(row):
+                if i != j and km is not None:
+                    distances[(names[i], names[j])] = km
+        return distances
+    
+    def warm_up_distance_matrix(self) -> int:
+        """Fetch the all-pairs road distance table in one call; returns the pairs known"""
+        self.road_distances = self._load_road_distances(allow_fetch=True)
+        self._build_compact_graph()
+        return len(self.road_distances)
+    
+    def _build_compact_graph(self):
+        """
+        Build a compressed adjacency (CSR) view of the graph shared by all
+        travel profiles, plus edge-weight arrays (km) per profile.
+
+        A profile's speed is constant, so its fastest path is its shortest
+        one: weights only differ between profiles where an edge falls back to
+        the road factor estimate. Profiles with identical weights share one
+        array and one path cache.
+        """
+        self.node_names = list(self.graph.keys())
+        self.node_index = {name: i for i, name in enumerate(self.node_names)}
+        
+        # Node coordinates in radians, for computing heuristic vectors
+        self.node_lat_rad = array('d', (math.radians(self.graph[n]['location']['lat']) for n in self.node_names))
+        self.node_lng_rad = array('d', (math.radians(self.graph[n]['location']['lng']) for n in self.node_names))
+        self.node_cos_lat = array('d', (math.cos(lat) for lat in self.node_lat_rad))
+        
+        self.edge_offsets = array('i', [0])
+        self.edge_targets = array('i')
+        edges = []
+        for name in self.node_names:
+            for neighbor in self.graph[name]['neighbors']:
+                self.edge_targets.append(self.node_index[neighbor])
+                edges.append((name, neighbor, self.graph[name]['location'], self.graph[neighbor]['location']))
+            self.edge_offsets.append(len(self.edge_targets))
+        
+        self.edge_weights = {}
+        self.path_cache = {}
+        shared = {}
+        for mode in TRAVEL_PROFILES:
+            weights = array('d', (self._edge_distance(a, b, loc_a, loc_b, mode) for a, b, loc_a, loc_b in edges))
+            weights, cache = shared.setdefault(weights.tobytes(), (weights, {}))
+            self.edge_weights[mode] = weights
+            self.path_cache[mode] = cache
+    
+    def _get_profile(self, mode: str) -> Dict:
+        """Look up a travel profile, rejecting unknown modes"""
+        profile = TRAVEL_PROFILES.get(mode)
+        if profile is None:
+            raise ValueError(f"Unknown travel mode: {mode}")
+        return profile
+    
+    def _road_factor(self, straight_distance: float, mode: str = DEFAULT_TRAVEL_MODE) -> float:
+        """Road factor of a travel profile for the given straight-line distance"""
+        # Longer distances have higher road factors due to road curvature
+        factors = self._get_profile(mode)['road_factors']
+        if straight_distance < 0.5:
+            return factors[0]  # Very close, mostly straight paths
+        elif straight_distance < 1.0:
+            return factors[1]  # Short distances, minor detours
+        elif straight_distance < 2.0:
+            return factors[2]  # Medium distances, some road curves
+        return factors[3]  # Longer distances, more road curvature
+    
+    def _calculate_realistic_distance(self, loc1: Dict, loc2: Dict, mode: str = DEFAULT_TRAVEL_MODE) -> float:
         """
         Calculate realistic road distance between two pagodas
         """
@@ -111,18 +488,29 @@ class ImprovedPagodaPathFinder:
             loc2['lat'], loc2['lng']
         )
         
-        # Apply road factor based on distance
-        # Longer distances have higher road factors due to road curvature
-        if straight_distance < 0.5:
-            road_factor = 1.1  # Very close, mostly straight paths
-        elif straight_distance < 1.0:
-            road_factor = 1.2  # Short distances, minor detours
-        elif straight_distance < 2.0:
-            road_factor = 1.3  # Medium distances, some road curves
-        else:
-            road_factor = 1.4  # Longer distances, more road curvature
-        
-        return straight_distance * road_factor
+        return straight_distance * self._road_factor(straight_distance, mode)
+    
+    def _edge_distance(self, a: str, b: str, loc_a: Dict, loc_b: Dict, mode: str = DEFAULT_TRAVEL_MODE) -> float:
+        """
+        Distance between two connected pagodas: the real road distance from the
+        offline road graph or the router's distance table, otherwise the road
+        factor estimate
+        """
+        if self.road_graph is not None:
+            road_distance = self.road_graph.pagoda_distance(a, b)
+            if road_distance is not None:
+                return road_distance
+        road_distance = self.road_distances.get((a, b))
+        if road_distance is not None:
+            # Table distances run between snapped road points; never report
+            # less than the straight line so the A* heuristic stays admissible
+            straight = self._haversine_distance(loc_a['lat'], loc_a['lng'], loc_b['lat'], loc_b['lng'])
+            return max(road_distance, straight)
+        return self._calculate_realistic_distance(loc_a, loc_b, mode)
+    
+    def estimate_travel_minutes(self, distance_km: float, mode: str = DEFAULT_TRAVEL_MODE) -> float:
+        """Estimate travel time in minutes for a road distance"""
+        return distance_km * 60.0 / self._get_profile(mode)['speed_kmh']
     
     def _haversine_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """Calculate great circle distance between two points in km"""
@@ -138,26 +526,36 @@ class ImprovedPagodaPathFinder:
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
         return R * c
     
-    def find_path_astar(self, start: str, goal: str) -> Optional[List[str]]:
+    def find_path_astar(self, start: str, goal: str, mode: str = DEFAULT_TRAVEL_MODE) -> Optional[List[str]]:
         """
-        Find shortest path using A* algorithm with proper heuristic
+        Find fastest path for a travel profile using A* over the compact graph
         """
         if start not in self.graph or goal not in self.graph:
             return None
+        self._get_profile(mode)  # rejects unknown modes
         
-        # Check cache first
+        # Check the profile's cache first
+        cache = self.path_cache[mode]
         cache_key = f"{start}-{goal}"
-        if cache_key in self.path_cache:
-            return self.path_cache[cache_key]
+        if cache_key in cache:
+            return cache[cache_key]
+        
+        names = self.node_names
+        offsets = self.edge_offsets
+        targets = self.edge_targets
+        weights = self.edge_weights[mode]
+        start_idx = self.node_index[start]
+        goal_idx = self.node_index[goal]
+        
+        # Straight-line distance never overestimates (road factors >= 1)
+        heuristic_km = self._heuristic_vector(goal_idx)
         
         # A* algorithm implementation
         closed_set = set()
         came_from = {}
-        g_score = {node: float('inf') for node in self.graph}
-        g_score[start] = 0
-        f_score = {node: float('inf') for node in self.graph}
-        f_score[start] = self._heuristic(start, goal)
-        open_set = [(f_score[start], start)]
+        g_score = [float('inf')] * len(names)
+        g_score[start_idx] = 0.0
+        open_set = [(heuristic_km[start_idx], start_idx)]
         
         while open_set:
             current = heapq.heappop(open_set)[1]
@@ -168,50 +566,87 @@ class ImprovedPagodaPathFinder:
                 
             closed_set.add(current)
             
-            if current == goal:
+            if current == goal_idx:
                 # Reconstruct path
                 path = []
                 while current in came_from:
-                    path.append(current)
+                    path.append(names[current])
                     current = came_from[current]
                 path.append(start)
                 path.reverse()
                 
                 # Cache the result
-                self.path_cache[cache_key] = path
+                cache[cache_key] = path
                 return path
             
             # Check neighbors
-            neighbors = self.graph.get(current, {}).get('neighbors', {})
-            for neighbor, distance in neighbors.items():
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[edge]
                 if neighbor in closed_set:
                     continue
                     
-                tentative_g_score = g_score[current] + distance
+                tentative_g_score = g_score[current] + weights[edge]
                 
                 if tentative_g_score < g_score[neighbor]:
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = tentative_g_score + self._heuristic(neighbor, goal)
                     # Always push; skip stale entries when popped
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                    heapq.heappush(open_set, (tentative_g_score + heuristic_km[neighbor], neighbor))
         
         return None
     
+    def find_tour_path(self, stops: List[str], mode: str = DEFAULT_TRAVEL_MODE) -> Optional[List[str]]:
+        """
+        Chain the fastest paths between consecutive tour stops
+        """
+        if len(stops) < 2:
+            return list(stops) if all(stop in self.graph for stop in stops) else None
+        
+        tour = [stops[0]]
+        for i in range(len(stops) - 1):
+            leg = self.find_path_astar(stops[i], stops[i + 1], mode)
+            if not leg:
+                return None
+            tour.extend(leg[1:])
+        return tour
+    
     def _heuristic(self, node: str, goal: str) -> float:
         """Heuristic function for A* (straight-line distance)"""
         if node not in self.graph or goal not in self.graph:
             return float('inf')
         
-        loc1 = self.graph[node]['location']
-        loc2 = self.graph[goal]['location']
+        return self._heuristic_vector(self.node_index[goal])[self.node_index[node]]
+    
+    def _heuristic_vector(self, goal: int) -> array:
+        """
+        Straight-line distances (km) from every node to the goal, computed in
+        one pass and kept in a small LRU keyed by goal
+        """
+        with self._heuristic_lock:
+            vector = self.heuristic_cache.get(goal)
+            if vector is not None:
+                self.heuristic_cache.move_to_end(goal)
+                return vector
         
-        return self._haversine_distance(
-            loc1['lat'], loc1['lng'],
-            loc2['lat'], loc2['lng']
-        )
+        R = 6371  # Earth radius in km
+        goal_lat = self.node_lat_rad[goal]
+        goal_lng = self.node_lng_rad[goal]
+        goal_cos = self.node_cos_lat[goal]
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        vector = array('d', (
+            2 * R * asin(min(1.0, sqrt(
+                sin((goal_lat - lat) / 2) ** 2 + cos_lat * goal_cos * sin((goal_lng - lng) / 2) ** 2
+            )))
+            for lat, lng, cos_lat in zip(self.node_lat_rad, self.node_lng_rad, self.node_cos_lat)
+        ))
+        
+        with self._heuristic_lock:
+            self.heuristic_cache[goal] = vector
+            if len(self.heuristic_cache) > HEURISTIC_CACHE_SIZE:
+                self.heuristic_cache.popitem(last=False)
+        return vector
     
-    def calculate_path_distance(self, path: List[str]) -> float:
+    def calculate_path_distance(self, path: List[str], mode: str = DEFAULT_TRAVEL_MODE) -> float:
         """Calculate total distance of a path"""
         if len(path) < 2:
             return 0.0
@@ -222,7 +657,12 @@ class ImprovedPagodaPathFinder:
             next_pagoda = path[i + 1]
             
             if current in self.graph and next_pagoda in self.graph[current]['neighbors']:
-                total_distance += self.graph[current]['neighbors'][next_pagoda]
+                total_distance += self._edge_distance(
+                    current, next_pagoda,
+                    self.graph[current]['location'],
+                    self.graph[next_pagoda]['location'],
+                    mode
+                )
             else:
                 # Fallback to straight-line distance
                 loc1 = self.graph[current]['location']
@@ -234,6 +674,10 @@ class ImprovedPagodaPathFinder:
         
         return total_distance
     
+    def calculate_path_duration(self, path: List[str], mode: str = DEFAULT_TRAVEL_MODE) -> float:
+        """Estimate travel time of a path in minutes"""
+        return self.estimate_travel_minutes(self.calculate_path_distance(path, mode), mode)
+    
     def find_nearby_pagodas(self, path: List[str], max_distance: float = 1.0) -> List[Dict]:
         """Find pagodas near the given path"""
         if not path:
@@ -288,17 +732,50 @@ class ImprovedPagodaPathFinder:
         
         return min(dist_to_start, dist_to_end)
     
-    def get_enhanced_path_with_road_coordinates(self, start: str, end: str) -> Optional[Dict]:
+    def get_enhanced_path_with_road_coordinates(self, start: str, end: str,
+                                                mode: str = DEFAULT_TRAVEL_MODE) -> Optional[Dict]:
+        """
+        Get enhanced path with real road-based coordinates for visualization.
+        Identical concurrent requests share one computation.
+        """
+        return route_flights.do(
+            (start, end, mode),
+            lambda: self._compute_enhanced_path(start, end, mode)
+        )
+    
+    def get_quick_path(self, start: str, end: str, mode: str = DEFAULT_TRAVEL_MODE) -> Optional[Dict]:
         """
-        Get enhanced path with real road-based coordinates for visualization
+        The enhanced path with geometry that needs no network: stored or
+        offline road geometry when it covers the path, otherwise the
+        interpolated fallback. 'refined' tells whether it is road-accurate.
         """
+        plan = self._plan_enhanced_path(start, end, mode)
+        if not plan:
+            return None
+        pagoda_path, pagoda_coordinates = plan
+        
+        try:
+            road_coordinates = self._create_offline_road_path(pagoda_coordinates)
+        except Exception as e:
+            print(f"Offline road routing failed: {e}")
+            road_coordinates = None
+        
+        result = self._path_result(pagoda_path,
+                                   road_coordinates or self._create_fallback_path(pagoda_coordinates),
+                                   mode)
+        result['refined'] = bool(road_coordinates)
+        return result
+    
+    def _plan_enhanced_path(self, start: str, end: str, mode: str) -> Optional[Tuple[List[str], List[Dict]]]:
+        """A* path with nearby pagodas added, and the coordinates of its pagodas"""
         # Find the pagoda path using our A* algorithm
-        pagoda_path = self.find_path_astar(start, end)
+        pagoda_path = self.find_path_astar(start, end, mode)
         if not pagoda_path:
             return None
         
         # Augment path with notable pagodas that are very close to the road between steps
-        pagoda_path = self._augment_path_with_nearby_pagodas(pagoda_path, max_additions=3, threshold_km=0.35)
+        # (on a copy, the A* result is cached per profile)
+        pagoda_path = self._augment_path_with_nearby_pagodas(list(pagoda_path), max_additions=3, threshold_km=0.35)
         
         # Get pagoda coordinates
         pagoda_coordinates = []
@@ -309,18 +786,39 @@ class ImprovedPagodaPathFinder:
                 'lng': loc['lng'],
                 'name': pagoda
             })
+        return pagoda_path, pagoda_coordinates
+    
+    def _compute_enhanced_path(self, start: str, end: str, mode: str) -> Optional[Dict]:
+        """A* path plus road geometry, distance and travel time"""
+        plan = self._plan_enhanced_path(start, end, mode)
+        if not plan:
+            return None
+        pagoda_path, pagoda_coordinates = plan
         
-        # Get real road-based coordinates
+        # Get real road-based coordinates, offline when stored edge geometry or
+        # the road graph covers the path
+        refined = True
         try:
-            road_coordinates = road_router.create_realistic_road_path(pagoda_coordinates)
+            road_coordinates = self._create_offline_road_path(pagoda_coordinates)
+            if not road_coordinates:
+                road_coordinates, refined = road_router.create_road_path(pagoda_coordinates)
             if not road_coordinates:
                 # Fallback to simple interpolation if road routing fails
                 road_coordinates = self._create_fallback_path(pagoda_coordinates)
+                refined = False
         except Exception as e:
             print(f"Road routing failed: {e}")
             # Fallback to simple interpolation
             road_coordinates = self._create_fallback_path(pagoda_coordinates)
+            refined = False
         
+        result = self._path_result(pagoda_path, road_coordinates, mode)
+        # Whether the geometry is road-accurate rather than (partly) interpolated
+        result['refined'] = refined
+        return result
+    
+    def _path_result(self, pagoda_path: List[str], road_coordinates: List[Dict], mode: str) -> Dict:
+        """Enhanced path response with the distance measured along the geometry"""
         # Calculate total distance using road coordinates
         total_distance = 0
         for i in range(len(road_coordinates) - 1):
@@ -336,6 +834,8 @@ class ImprovedPagodaPathFinder:
             'coordinates': road_coordinates,
             'distance': total_distance,
             'distanceKm': total_distance,
+            'durationMinutes': self.estimate_travel_minutes(total_distance, mode),
+            'mode': mode,
             'pathLength': len(pagoda_path)
         }
 
@@ -378,6 +878,94 @@ class ImprovedPagodaPathFinder:
         
         return path
     
+    def _create_offline_road_path(self, pagoda_coordinates: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Concatenate stored edge polylines (or offline road graph legs) along
+        the path; None if any leg is not available without network I/O
+        """
+        if len(pagoda_coordinates) < 2:
+            return None
+        
+        result = []
+        for i in range(len(pagoda_coordinates) - 1):
+            current = pagoda_coordinates[i]
+            leg = self._offline_leg_geometry(current['name'], pagoda_coordinates[i + 1]['name'])
+            if leg is None:
+                return None
+            result.append(current)
+            result.extend(leg)
+        result.append(pagoda_coordinates[-1])
+        
+        return result
+    
+    def _offline_leg_geometry(self, a: str, b: str) -> Optional[List[Dict]]:
+        """Road polyline between two pagodas from the local stores"""
+        leg = self.geometry_store.get(a, b)
+        if leg is None and self.road_graph is not None:
+            route = self.road_graph.route(a, b)
+            if route is not None:
+                leg = route[1]
+        return leg
+    
+    def _augmented_legs(self) -> Set[Tuple[str, str]]:
+        """
+        Undirected pagoda pairs that are consecutive in a planned route without
+        being a graph edge, over every route and every distinct edge weighting
+        """
+        modes = {id(weights): mode for mode, weights in self.edge_weights.items()}.values()
+        legs = set()
+        for mode in modes:
+            for start in self.node_names:
+                for goal in self.node_names:
+                    if start == goal:
+                        continue
+                    plan = self._plan_enhanced_path(start, goal, mode)
+                    if not plan:
+                        continue
+                    path = plan[0]
+                    for a, b in zip(path, path[1:]):
+                        if b not in self.graph[a]['neighbors']:
+                            legs.add(tuple(sorted((a, b))))
+        return legs
+    
+    def warm_up_edge_geometry(self, all_pairs: bool = False, refresh: bool = False) -> Dict[str, int]:
+        """
+        Precompute the road polyline of every graph edge and of every leg that
+        nearby-pagoda augmentation adds to a route (or of every pagoda pair)
+        into the geometry store, from the road graph when installed,
+        otherwise from the road router. Interpolated fallbacks are not stored.
+        """
+        if all_pairs:
+            pairs = [(a, b) for i, a in enumerate(self.node_names) for b in self.node_names[i + 1:]]
+        else:
+            pairs = sorted({tuple(sorted((a, b))) for a in self.graph for b in self.graph[a]['neighbors']}
+                           | self._augmented_legs())
+        
+        stats = {'edges': len(pairs), 'stored': 0, 'skipped': 0, 'failed': 0}
+        for a, b in pairs:
+            if not refresh and self.geometry_store.get(a, b) is not None:
+                stats['skipped'] += 1
+                continue
+            
+            leg = None
+            if self.road_graph is not None:
+                route = self.road_graph.route(a, b)
+                if route is not None:
+                    leg = route[1]
+            if leg is None:
+                loc_a = self.graph[a]['location']
+                loc_b = self.graph[b]['location']
+                leg = road_router.get_road_route(loc_a['lat'], loc_a['lng'], loc_b['lat'], loc_b['lng'])
+            
+            if leg:
+                self.geometry_store.put(a, b, leg)
+                stats['stored'] += 1
+            else:
+                stats['failed'] += 1
+        
+        self.geometry_store.save()
+        return stats
+    
     def _create_fallback_path(self, pagoda_coordinates: List[Dict]) -> List[Dict]:
         """Create a fallback path with simple interpolation if road routing fails"""
         if len(pagoda_coordinates) < 2:
@@ -422,9 +1010,10 @@ class ImprovedPagodaPathFinder:
         for i in range(1, num_points + 1):
             ratio = i / (num_points + 1)
             
-            # Add slight curve to simulate road behavior
-            lat_offset = (hash(f"{start_loc['lat']}{end_loc['lat']}{i}") % 100 - 50) / 100000
-            lng_offset = (hash(f"{start_loc['lng']}{end_loc['lng']}{i}") % 100 - 50) / 100000
+            # Add slight curve to simulate road behavior (stable across processes,
+            # unlike the randomized built-in hash())
+            lat_offset = (self._stable_hash(f"{start_loc['lat']}{end_loc['lat']}{i}") % 100 - 50) / 100000
+            lng_offset = (self._stable_hash(f"{start_loc['lng']}{end_loc['lng']}{i}") % 100 - 50) / 100000
             
             lat = start_loc['lat'] + (end_loc['lat'] - start_loc['lat']) * ratio + lat_offset
             lng = start_loc['lng'] + (end_loc['lng'] - start_loc['lng']) * ratio + lng_offset
@@ -436,3 +1025,31 @@ class ImprovedPagodaPathFinder:
             })
         
         return waypoints
+    
+    @staticmethod
+    def _stable_hash(text: str) -> int:
+        return zlib.crc32(text.encode('utf-8'))
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute road distances and polylines for the pathfinder graph")
+    parser.add_argument('--all-pairs', action='store_true',
+                        help="Cover every pagoda pair, not just the graph edges and augmented legs routes use")
+    parser.add_argument('--refresh', action='store_true', help="Refetch edges that are already stored")
+    args = parser.parse_args()
+    
+    # Use the same pagoda source as the Flask app (MongoDB, then JS fallback)
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import load_pagoda_data
+    
+    pathfinder = ImprovedPagodaPathFinder(load_pagoda_data())
+    pairs = pathfinder.warm_up_distance_matrix()
+    print(f"Distance matrix: {pairs} pagoda pairs with road distances")
+    stats = pathfinder.warm_up_edge_geometry(all_pairs=args.all_pairs, refresh=args.refresh)
+    print(f"Edge geometry: {stats['stored']} stored, {stats['skipped']} already cached, "
+          f"{stats['failed']} failed of {stats['edges']} -> {pathfinder.geometry_store.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Lightweight inference for the chatbot intent classifiers.
+
+The classifiers are trained with scikit-learn at build time
+(`python chatbot_backend.py --build-model`) and compiled here into plain
+numpy arrays: the TF-IDF vocabulary and idf weights, log-linear weights for
+logistic regression and naive Bayes, and node tables for the random forest
+trees. Loading the joblib artifact and classifying messages then needs only
+numpy, so the chatbot starts without importing scikit-learn, and servers
+that fork after loading share the arrays between workers.
+"""
+
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from message_features import TOKEN_PATTERN, word_ngrams
+
+
+def softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=1, keepdims=True)
+    return scores
+
+
+class CompiledTfidf:
+    """TfidfVectorizer.transform for word n-grams with l2 normalization"""
+
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, ngram_range: Tuple[int, int]):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.ngram_range = tuple(ngram_range)
+
+    @classmethod
+    def compile(cls, vectorizer) -> Dict[str, Any]:
+        if vectorizer.analyzer != 'word' or vectorizer.sublinear_tf or vectorizer.norm != 'l2' \
+                or vectorizer.stop_words is not None or not vectorizer.lowercase:
+            raise ValueError("Only lowercase word n-gram TF-IDF with l2 norm can be compiled")
+        return {
+            'vocabulary': {term: int(i) for term, i in vectorizer.vocabulary_.items()},
+            'idf': np.asarray(vectorizer.idf_, dtype=np.float64),
+            'ngram_range': tuple(vectorizer.ngram_range)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CompiledTfidf':
+        return cls(data['vocabulary'], data['idf'], data['ngram_range'])
+
+    def terms(self, text: str) -> List[str]:
+        """Word n-grams of a text, in scikit-learn's order"""
+        return word_ngrams(TOKEN_PATTERN.findall(text.lower()), self.ngram_range)
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        return self.transform_terms([self.terms(text) for text in texts])
+
+    def transform_terms(self, term_lists: List[List[str]]) -> np.ndarray:
+        """transform() for messages already split into n-grams (MessageFeatures.ngrams)"""
+        X = np.zeros((len(term_lists), len(self.idf)), dtype=np.float64)
+        for row, terms in enumerate(term_lists):
+            for term in terms:
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    X[row, column] += 1.0
+        X *= self.idf
+        norms = np.sqrt((X * X).sum(axis=1, keepdims=True))
+        norms[norms == 0.0] = 1.0
+        X /= norms
+        return X
+
+
+class LogLinearClassifier:
+    """
+    Classifiers whose probabilities are a softmax over X @ weights.T + bias:
+    multinomial logistic regression and multinomial naive Bayes
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, classes: np.ndarray):
+        self.weights = weights
+        self.bias = bias
+        self.classes_ = classes
+
+    @classmethod
+    def compile(cls, classifier) -> Dict[str, Any]:
+        name = type(classifier).__name__
+        if name == 'LogisticRegression':
+            if len(classifier.classes_) == 2:
+                # Binary: sigmoid(w.x + b) equals a softmax over [0, w.x + b]
+                weights = np.vstack([np.zeros_like(classifier.coef_), classifier.coef_])
+                bias = np.concatenate([[0.0], classifier.intercept_])
+            else:
+                weights, bias = classifier.coef_, classifier.intercept_
+        elif name == 'MultinomialNB':
+            weights, bias = classifier.feature_log_prob_, classifier.class_log_prior_
+        else:
+            raise ValueError(f"Cannot compile {name} as a log-linear classifier")
+        return {
+            'type': 'loglinear',
+            'weights': np.asarray(weights, dtype=np.float64),
+            'bias': np.asarray(bias, dtype=np.float64),
+            'classes': np.asarray(classifier.classes_)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LogLinearClassifier':
+        return cls(data['weights'], data['bias'], data['classes'])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return softmax(X @ self.weights.T + self.bias)
+
+
+class ForestClassifier:
+    """Random forest: the mean of the trees' leaf class distributions"""
+
+    def __init__(self, trees: List[Dict[str, np.ndarray]], classes: np.ndarray):
+        self.trees = trees
+        self.classes_ = classes
+
+    @classmethod
+    def compile(cls, forest) -> Dict[str, Any]:
+        trees = []
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0.0] = 1.0
+            trees.append({
+                'left': tree.children_left.copy(),
+                'right': tree.children_right.copy(),
+                'feature': tree.feature.copy(),
+                'threshold': tree.threshold.copy(),
+                'value': value / totals
+            })
+        return {'type': 'forest', 'trees': trees, 'classes': np.asarray(forest.classes_)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ForestClassifier':
+        return cls(data['trees'], data['classes'])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        # Trees split on float32 features, as scikit-learn does
+        X = X.astype(np.float32).astype(np.float64)
+        proba = np.zeros((X.shape[0], len(self.classes_)), dtype=np.float64)
+        all_rows = np.arange(X.shape[0])
+        for tree in self.trees:
+            left, right = tree['left'], tree['right']
+            feature, threshold = tree['feature'], tree['threshold']
+            # Advance every row one level per step until all have reached a leaf
+            node = np.zeros(X.shape[0], dtype=np.intp)
+            rows = all_rows if left[0] != -1 else all_rows[:0]
+            while rows.size:
+                current = node[rows]
+                goes_left = X[rows, feature[current]] <= threshold[current]
+                node[rows] = np.where(goes_left, left[current], right[current])
+                rows = rows[left[node[rows]] != -1]
+            proba += tree['value'][node]
+        proba /= len(self.trees)
+        return proba
+
+
+CLASSIFIER_TYPES = {'loglinear': LogLinearClassifier, 'forest': ForestClassifier}
+
+
+def compile_classifier(classifier) -> Dict[str, Any]:
+    if type(classifier).__name__ == 'RandomForestClassifier':
+        return ForestClassifier.compile(classifier)
+    return LogLinearClassifier.compile(classifier)
+
+
+def load_classifier(data: Dict[str, Any]):
+    return CLASSIFIER_TYPES[data['type']].from_dict(data)
+
+
+class IntentEnsemble:
+    """
+    The intent classifiers and the one TF-IDF vectorizer they share: each
+    message is vectorized once and every classifier reads the same features
+    """
+
+    def __init__(self, tfidf: CompiledTfidf, classifiers: Dict[str, Any]):
+        self.tfidf = tfidf
+        self.classifiers = classifiers
+        self.classes_ = next(iter(classifiers.values())).classes_ if classifiers else np.array([])
+
+    def __len__(self) -> int:
+        return len(self.classifiers)
+
+    @staticmethod
+    def compile(vectorizer, classifiers: Dict[str, Any]) -> Dict[str, Any]:
+        compiled = {name: compile_classifier(clf) for name, clf in classifiers.items()}
+        labels = [list(data['classes']) for data in compiled.values()]
+        if any(classes != labels[0] for classes in labels):
+            raise ValueError("Ensemble classifiers must be trained on the same intents")
+        return {'tfidf': CompiledTfidf.compile(vectorizer), 'classifiers': compiled}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'IntentEnsemble':
+        return cls(CompiledTfidf.from_dict(data['tfidf']),
+                   {name: load_classifier(clf) for name, clf in data['classifiers'].items()})
+
+    def vectorize(self, texts: List[str]) -> np.ndarray:
+        return self.tfidf.transform(texts)
+
+    def predict_proba(self, X: np.ndarray) -> Dict[str, np.ndarray]:
+        """Class probabilities of every classifier, one call each"""
+        return {name: clf.predict_proba(X) for name, clf in self.classifiers.items()}
+
+    def classify(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """
+        Confidence-weighted vote: each classifier votes for its top intent
+        with that intent's probability; returns (intent, summed votes / classifiers)
+        """
+        return self.classify_terms([self.tfidf.terms(text) for text in texts])
+
+    def classify_terms(self, term_lists: List[List[str]]) -> List[Tuple[str, float]]:
+        """classify() for messages already split into n-grams"""
+        if not self.classifiers or not term_lists:
+            return [('unknown', 0.0)] * len(term_lists)
+
+        X = self.tfidf.transform_terms(term_lists)
+        rows = np.arange(len(term_lists))
+        votes = np.zeros((len(term_lists), len(self.classes_)), dtype=np.float64)
+        for proba in self.predict_proba(X).values():
+            best = proba.argmax(axis=1)
+            votes[rows, best] += proba[rows, best]
+
+        winners = votes.argmax(axis=1)
+        confidences = votes[rows, winners] / len(self.classifiers)
+        return [(str(self.classes_[w]), float(c)) for w, c in zip(winners, confidences)]
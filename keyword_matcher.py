@@ -0,0 +1,128 @@
+"""
+Multi-keyword matching for the chatbot's analyzers.
+
+KeywordMatcher compiles a keyword list into an Aho-Corasick automaton once,
+then finds every occurrence of every keyword, overlapping ones included, in
+a single pass over the text. The result is the same as testing
+`keyword in text` for each keyword, but the cost grows with the length of
+the message instead of the size of the keyword tables.
+
+RegexTrigger handles regex tables: each pattern's literal prefix is fed to
+the automaton, and only patterns whose prefix occurs in the text are run.
+"""
+
+import re
+from collections import deque
+from typing import List, Dict, Set, Tuple, Iterable, Optional, Pattern
+
+# Characters that end the literal prefix of a regex pattern
+_REGEX_META = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+# Quantifiers that make the character before them optional
+_OPTIONAL_QUANTIFIERS = "?*{"
+
+
+def _literal_prefix(pattern: str) -> str:
+    """
+    Literal text every match of pattern starts with ('' if there is none):
+    the characters before the first metacharacter, minus the last one when
+    a quantifier follows it (e.g. 'route' for 'routes?')
+    """
+    if '|' in pattern:
+        # An alternative may start with anything
+        return ''
+    meta = _REGEX_META.search(pattern)
+    if meta is None:
+        return pattern
+    literal = pattern[:meta.start()]
+    if meta.group() in _OPTIONAL_QUANTIFIERS:
+        literal = literal[:-1]
+    return literal
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a fixed set of keywords"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted({k for k in keywords if k})
+        self._goto: List[Dict[str, int]] = [{}]
+        # Keywords ending at each state, including those reached via fail links
+        self._out: List[Tuple[str, ...]] = [()]
+
+        for keyword in self.keywords:
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._out.append(())
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state] = (keyword,)
+
+        # Breadth-first, so a state's fail target is finished before it.
+        # The goto and fail links are folded into one transition table, so
+        # scanning costs a single dict lookup per character
+        fail = [0] * len(self._goto)
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta = dict(self._delta[fail[state]])
+            delta.update(self._goto[state])
+            self._delta[state] = delta
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail[nxt] = self._delta[fail[state]].get(ch, 0) if state else 0
+                self._out[nxt] = self._out[nxt] + self._out[fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """Every (start, end, keyword) occurrence in text, ordered by end position"""
+        delta, out = self._delta, self._out
+        matches = []
+        state = 0
+        for end, ch in enumerate(text, 1):
+            state = delta[state].get(ch, 0)
+            for keyword in out[state]:
+                matches.append((end - len(keyword), end, keyword))
+        return matches
+
+    def found(self, text: str) -> Set[str]:
+        """The keywords that occur in text"""
+        delta, out = self._delta, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class RegexTrigger:
+    """A labelled regex table whose patterns only run when their literal prefix occurs"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, str]]):
+        self.patterns: List[Tuple[str, str, Pattern]] = []
+        for label, pattern in patterns:
+            self.patterns.append((label, _literal_prefix(pattern), re.compile(pattern)))
+
+    @property
+    def literals(self) -> List[str]:
+        return [literal for _, literal, _ in self.patterns if literal]
+
+    def search(self, text: str, found: Set[str]) -> Optional[str]:
+        """
+        Label of the first pattern, in table order, that matches text;
+        found holds the literals a KeywordMatcher found in text
+        """
+        for label, literal, regex in self.patterns:
+            if literal and literal not in found:
+                continue
+            if regex.search(text):
+                return label
+        return None
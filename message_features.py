@@ -0,0 +1,58 @@
+"""
+Per-message features shared by the chatbot's analyzers.
+
+A message used to be lowercased and scanned separately by every analyzer
+(context, sentiment, entities, question type, topic, intent rules and the
+intent ensemble). MessageFeatures does that work once per message: the
+normalized text, word tokens and n-grams for the intent vectorizer, and the
+keyword hits from one pass of the chatbot's shared KeywordMatcher. Analyzers
+take it as an optional `features` argument and fall back to their own
+scanning when called on bare text.
+"""
+
+import re
+from typing import List, Set, Tuple
+
+# scikit-learn's default TfidfVectorizer token pattern
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Name words, as the pagoda alias indexes split names: ASCII letters and digits
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def word_ngrams(tokens: List[str], ngram_range: Tuple[int, int]) -> List[str]:
+    """Word n-grams of a token list, in scikit-learn's order"""
+    min_n, max_n = ngram_range
+    terms = []
+    for n in range(min_n, min(max_n, len(tokens)) + 1):
+        for i in range(len(tokens) - n + 1):
+            terms.append(" ".join(tokens[i:i + n]))
+    return terms
+
+
+class MessageFeatures:
+    """
+    Everything the analyzers read from one message:
+
+    text        the message as received
+    lower       lowercased text, for the substring keyword tables
+    normalized  lowercased and stripped
+    tokens      word tokens; token_set for membership tests
+    words       name words for the pagoda alias trie
+    ngrams      word n-grams for the intent vectorizer
+    hits        keywords of the shared matcher that occur in the message
+    word_count  whitespace-separated words
+    """
+
+    __slots__ = ('text', 'lower', 'normalized', 'tokens', 'token_set', 'words', 'ngrams', 'hits', 'word_count')
+
+    def __init__(self, text: str, matcher=None, ngram_range: Tuple[int, int] = (1, 2)):
+        self.text = text
+        self.lower = text.lower()
+        self.normalized = self.lower.strip()
+        self.tokens = TOKEN_PATTERN.findall(self.lower)
+        self.token_set: Set[str] = set(self.tokens)
+        self.words = WORD_PATTERN.findall(self.lower)
+        self.ngrams = word_ngrams(self.tokens, ngram_range)
+        self.hits: Set[str] = matcher.found(self.lower) if matcher is not None else set()
+        self.word_count = len(text.split())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Local OSRM stand-in for routing tests and benchmarks.
+
+Answers /route/v1/driving and /table/v1/driving in OSRM's response format
+from the pathfinder graph: every requested coordinate is snapped to its
+nearest pagoda and legs follow the A* path between pagodas. Latency, error
+rate and timeouts can be injected through a failure profile, chosen at
+startup or switched at runtime with POST /_mock/profile.
+
+Usage:
+    python mock_osrm_server.py --port 5005 --profile flaky
+    OSRM_URL=http://localhost:5005 OSRM_PUBLIC_URL= python app.py
+"""
+
+import math
+import time
+import random
+import argparse
+import threading
+from typing import List, Dict, Tuple, Optional
+
+from flask import Flask, jsonify, request
+
+from improved_pathfinder import ImprovedPagodaPathFinder
+
+# Named failure profiles: latency in ms, share of 503 responses and share of
+# requests that hang for timeout_s before failing with 504
+FAILURE_PROFILES = {
+    'healthy': {'latency_ms': 20, 'jitter_ms': 10, 'error_rate': 0.0, 'timeout_rate': 0.0, 'timeout_s': 0.0},
+    'slow': {'latency_ms': 800, 'jitter_ms': 400, 'error_rate': 0.0, 'timeout_rate': 0.0, 'timeout_s': 0.0},
+    'flaky': {'latency_ms': 50, 'jitter_ms': 30, 'error_rate': 0.3, 'timeout_rate': 0.0, 'timeout_s': 0.0},
+    'timeouts': {'latency_ms': 50, 'jitter_ms': 30, 'error_rate': 0.0, 'timeout_rate': 0.2, 'timeout_s': 12.0},
+    'down': {'latency_ms': 0, 'jitter_ms': 0, 'error_rate': 1.0, 'timeout_rate': 0.0, 'timeout_s': 0.0},
+}
+
+# Road speed used for OSRM 'duration' fields
+MOCK_SPEED_KMH = 25.0
+
+
+class FailureInjector:
+    """Applies the active failure profile to each request"""
+
+    def __init__(self, profile: str = 'healthy', seed: Optional[int] = None):
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.set_profile(profile)
+
+    def set_profile(self, profile, **overrides):
+        if isinstance(profile, str):
+            if profile not in FAILURE_PROFILES:
+                raise ValueError(f"Unknown failure profile: {profile}")
+            settings = dict(FAILURE_PROFILES[profile], name=profile)
+        else:
+            settings = dict(profile, name=profile.get('name', 'custom'))
+        settings.update(overrides)
+        with self._lock:
+            self.settings = settings
+
+    def inject(self) -> Optional[Tuple[Dict, int]]:
+        """Sleep for the profile's latency; returns an error response to send instead, if any"""
+        with self._lock:
+            settings = dict(self.settings)
+            roll = self.random.random()
+            latency = max(0.0, settings['latency_ms'] + self.random.uniform(-1, 1) * settings['jitter_ms'])
+
+        if roll < settings['timeout_rate']:
+            time.sleep(settings['timeout_s'])
+            return {'code': 'Timeout', 'message': 'Injected timeout'}, 504
+
+        time.sleep(latency / 1000.0)
+        if roll < settings['timeout_rate'] + settings['error_rate']:
+            return {'code': 'Unavailable', 'message': 'Injected error'}, 503
+        return None
+
+
+class MockOSRM:
+    """OSRM route and table answers computed from the pathfinder graph"""
+
+    def __init__(self, pathfinder: ImprovedPagodaPathFinder):
+        self.pathfinder = pathfinder
+        self.names, self.points = pathfinder._pagoda_points()
+        self.index = {name: i for i, name in enumerate(self.names)}
+        # The pathfinder's path and heuristic caches are not thread-safe
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_coordinates(coordinate_string: str) -> List[Tuple[float, float]]:
+        """OSRM 'lng,lat;lng,lat' to [(lat, lng), ...]"""
+        coordinates = []
+        for pair in coordinate_string.split(';'):
+            lng, lat = pair.split(',')
+            coordinates.append((float(lat), float(lng)))
+        return coordinates
+
+    def snap(self, lat: float, lng: float) -> Tuple[str, float]:
+        """Nearest pagoda and its distance in km"""
+        best, best_km = None, math.inf
+        for name, (plat, plng) in zip(self.names, self.points):
+            d = self.pathfinder._haversine_distance(lat, lng, plat, plng)
+            if d < best_km:
+                best, best_km = name, d
+        return best, best_km
+
+    def leg(self, start: Tuple[float, float], end: Tuple[float, float]) -> Optional[Tuple[float, List[List[float]]]]:
+        """Distance in km and [lng, lat] geometry of one leg, None if unreachable"""
+        a, a_km = self.snap(*start)
+        b, b_km = self.snap(*end)
+        path = [a] if a == b else self.pathfinder.find_path_astar(a, b)
+        if not path:
+            return None
+
+        geometry = [[start[1], start[0]]]
+        for name in path:
+            lat, lng = self.points[self.index[name]]
+            geometry.append([lng, lat])
+        geometry.append([end[1], end[0]])
+        return a_km + self.pathfinder.calculate_path_distance(path) + b_km, geometry
+
+    def route(self, coordinates: List[Tuple[float, float]]) -> Tuple[Dict, int]:
+        with self._lock:
+            return self._route(coordinates)
+
+    def _route(self, coordinates: List[Tuple[float, float]]) -> Tuple[Dict, int]:
+        legs, geometry = [], []
+        for start, end in zip(coordinates, coordinates[1:]):
+            result = self.leg(start, end)
+            if result is None:
+                return {'code': 'NoRoute', 'message': 'Impossible route between points'}, 400
+            km, leg_geometry = result
+            legs.append({'distance': km * 1000, 'duration': km / MOCK_SPEED_KMH * 3600,
+                         'steps': [], 'summary': '', 'weight': km * 1000})
+            geometry.extend(leg_geometry if not geometry else leg_geometry[1:])
+
+        distance = sum(leg['distance'] for leg in legs)
+        duration = sum(leg['duration'] for leg in legs)
+        return {
+            'code': 'Ok',
+            'routes': [{
+                'geometry': {'type': 'LineString', 'coordinates': geometry},
+                'legs': legs,
+                'distance': distance,
+                'duration': duration,
+                'weight_name': 'routability',
+                'weight': distance
+            }],
+            'waypoints': [{'location': [lng, lat], 'name': self.snap(lat, lng)[0]} for lat, lng in coordinates]
+        }, 200
+
+    def table(self, coordinates: List[Tuple[float, float]], annotations: str) -> Tuple[Dict, int]:
+        with self._lock:
+            return self._table(coordinates, annotations)
+
+    def _table(self, coordinates: List[Tuple[float, float]], annotations: str) -> Tuple[Dict, int]:
+        distances = []
+        for start in coordinates:
+            row = []
+            for end in coordinates:
+                result = None if start == end else self.leg(start, end)
+                row.append(0.0 if start == end else (round(result[0] * 1000, 1) if result else None))
+            distances.append(row)
+
+        response = {
+            'code': 'Ok',
+            'sources': [{'location': [lng, lat]} for lat, lng in coordinates],
+            'destinations': [{'location': [lng, lat]} for lat, lng in coordinates]
+        }
+        if 'duration' in annotations:
+            response['durations'] = [
+                [None if d is None else round(d / 1000 / MOCK_SPEED_KMH * 3600, 1) for d in row]
+                for row in distances
+            ]
+        if 'distance' in annotations:
+            response['distances'] = distances
+        return response, 200
+
+
+def create_mock_osrm_app(pagoda_data: List[Dict], profile: str = 'healthy',
+                         seed: Optional[int] = None) -> Flask:
+    """Flask app serving the OSRM stand-in; the injector is exposed as app.config['INJECTOR']"""
+    app = Flask(__name__)
+    osrm = MockOSRM(ImprovedPagodaPathFinder(pagoda_data))
+    injector = FailureInjector(profile, seed)
+    app.config['INJECTOR'] = injector
+
+    def _invalid(message: str):
+        return jsonify({'code': 'InvalidQuery', 'message': message}), 400
+
+    @app.route('/route/v1/driving/<path:coordinate_string>')
+    def route(coordinate_string):
+        failure = injector.inject()
+        if failure:
+            return jsonify(failure[0]), failure[1]
+        try:
+            coordinates = osrm.parse_coordinates(coordinate_string)
+        except ValueError:
+            return _invalid('Query string malformed')
+        if len(coordinates) < 2:
+            return _invalid('Number of coordinates needs to be at least two')
+        if request.args.get('geometries', 'polyline') != 'geojson':
+            return jsonify({'code': 'InvalidOptions', 'message': 'Only geometries=geojson is supported'}), 400
+        body, status = osrm.route(coordinates)
+        return jsonify(body), status
+
+    @app.route('/table/v1/driving/<path:coordinate_string>')
+    def table(coordinate_string):
+        failure = injector.inject()
+        if failure:
+            return jsonify(failure[0]), failure[1]
+        try:
+            coordinates = osrm.parse_coordinates(coordinate_string)
+        except ValueError:
+            return _invalid('Query string malformed')
+        body, status = osrm.table(coordinates, request.args.get('annotations', 'duration'))
+        return jsonify(body), status
+
+    @app.route('/_mock/profile', methods=['GET', 'POST'])
+    def failure_profile():
+        """Show or switch the failure profile: {"profile": "flaky", "error_rate": 0.5}"""
+        if request.method == 'POST':
+            data = request.get_json() or {}
+            overrides = {k: float(v) for k, v in data.items() if k in FAILURE_PROFILES['healthy']}
+            try:
+                injector.set_profile(data.get('profile', injector.settings['name']), **overrides)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+        return jsonify({'success': True, 'profile': injector.settings})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an OSRM-compatible mock router from the pagoda graph")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5005)
+    parser.add_argument('--profile', default='healthy', choices=sorted(FAILURE_PROFILES))
+    parser.add_argument('--seed', type=int, help="Seed the failure injection for repeatable runs")
+    args = parser.parse_args()
+
+    from app import load_pagoda_data
+    app = create_mock_osrm_app(load_pagoda_data(), args.profile, args.seed)
+    print(f"Mock OSRM ({args.profile}) on http://{args.host}:{args.port}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
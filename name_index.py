@@ -0,0 +1,267 @@
+"""
+Pagoda name indexes for the chatbot's entity lookups.
+
+AliasTrie maps word sequences (pagoda names, short names, ids and their
+variants) to pagodas and finds mentions with a longest-match scan over the
+message's words, so extraction cost depends on message length rather than
+on the size of the catalogue. SubstringIndex answers "first name containing
+this text" with one str.find over all names instead of a Python loop.
+FuzzyIndex resolves typos from a SymSpell deletion dictionary, verifying
+the few candidates it returns with a bounded edit distance.
+CloseMatchIndex returns exactly difflib.get_close_matches, but skips the keys
+that cannot reach the cutoff before running SequenceMatcher.
+"""
+
+import difflib
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from typing import List, Dict, Set, Tuple, Iterable, Optional, Any
+
+import numpy as np
+
+from message_features import WORD_PATTERN
+
+# Key under which a trie node stores the alias ending there
+_END = ''
+
+
+def name_words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+class AliasTrie:
+    """Token trie of aliases; each alias maps to a value (a pagoda id)"""
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, alias: str, value: Any, replace: bool = True):
+        """Index an alias; with replace=False an alias already present keeps its value"""
+        words = name_words(alias)
+        if not words:
+            return
+        node = self.root
+        for word in words:
+            node = node.setdefault(word, {})
+        if _END not in node:
+            self.size += 1
+        elif not replace:
+            return
+        node[_END] = (" ".join(words), value)
+
+    def get(self, alias: str) -> Optional[Any]:
+        node = self.root
+        for word in name_words(alias):
+            node = node.get(word)
+            if node is None:
+                return None
+        entry = node.get(_END)
+        return entry[1] if entry else None
+
+    def scan(self, words: List[str]) -> List[Tuple[int, int, str, Any]]:
+        """
+        Leftmost-longest alias matches in a word list, without overlaps:
+        [(start, end, alias, value), ...] with words[start:end] == alias
+        """
+        matches = []
+        i, n = 0, len(words)
+        while i < n:
+            node, best = self.root, None
+            j = i
+            while j < n:
+                node = node.get(words[j])
+                if node is None:
+                    break
+                j += 1
+                if _END in node:
+                    best = (j, node[_END])
+            if best:
+                end, (alias, value) = best
+                matches.append((i, end, alias, value))
+                i = end
+            else:
+                i += 1
+        return matches
+
+
+class SubstringIndex:
+    """First item, in insertion order, whose text contains a query string"""
+
+    _SEPARATOR = '\x00'
+
+    def __init__(self, items: Iterable[Tuple[str, Any]]):
+        texts, self.values, self.offsets = [], [], []
+        offset = 0
+        for text, value in items:
+            self.offsets.append(offset)
+            self.values.append(value)
+            texts.append(text)
+            offset += len(text) + 1
+        self.blob = self._SEPARATOR.join(texts)
+
+    def first(self, query: str) -> Optional[Any]:
+        if not query or self._SEPARATOR in query:
+            return None
+        position = self.blob.find(query)
+        if position < 0:
+            return None
+        return self.values[bisect_right(self.offsets, position) - 1]
+
+
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """
+    Levenshtein distance between a and b, or None if it exceeds max_distance.
+    Only the diagonal band of width 2 * max_distance + 1 is computed
+    """
+    if a == b:
+        return 0
+    if len(a) > len(b):
+        a, b = b, a
+    n, m = len(a), len(b)
+    if m - n > max_distance:
+        return None
+    beyond = max_distance + 1
+    previous = [i if i <= max_distance else beyond for i in range(n + 1)]
+    for j in range(1, m + 1):
+        cb = b[j - 1]
+        low, high = max(1, j - max_distance), min(n, j + max_distance)
+        current = [beyond] * (n + 1)
+        current[0] = j if j <= max_distance else beyond
+        row_min = current[0]
+        for i in range(low, high + 1):
+            cost = previous[i - 1] if a[i - 1] == cb else previous[i - 1] + 1
+            if previous[i] + 1 < cost:
+                cost = previous[i] + 1
+            if current[i - 1] + 1 < cost:
+                cost = current[i - 1] + 1
+            if cost > beyond:
+                cost = beyond
+            current[i] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return None
+        previous = current
+    return previous[n] if previous[n] <= max_distance else None
+
+
+def deletes(text: str, max_edits: int) -> Set[str]:
+    """text and every string made from it by deleting up to max_edits characters"""
+    variants = {text}
+    frontier = {text}
+    for _ in range(max_edits):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+
+class FuzzyIndex:
+    """
+    SymSpell-style approximate lookup. Every key's prefix is indexed under
+    all its deletion variants; two strings within max_edits edits share a
+    variant, so a query collects its candidates with a few dict lookups and
+    verifies them with a bounded edit distance. Similarity is
+    1 - edit distance / longer length.
+    """
+
+    def __init__(self, items: Iterable[Tuple[str, Any]], max_edits: int = 2, prefix_length: int = 7):
+        self.max_edits = max_edits
+        self.prefix_length = prefix_length
+        self.keys: List[str] = []
+        self.values: List[Any] = []
+        self.variants: Dict[str, List[int]] = defaultdict(list)
+        for key, value in items:
+            if not key:
+                continue
+            index = len(self.keys)
+            self.keys.append(key)
+            self.values.append(value)
+            for variant in deletes(key[:prefix_length], max_edits):
+                self.variants[variant].append(index)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, query: str, min_similarity: float, limit: Optional[int] = None) -> List[Tuple[float, str, Any]]:
+        """(similarity, key, value) of keys within max_edits and at least min_similarity alike, best first"""
+        if not query:
+            return []
+        candidates = set()
+        for variant in deletes(query[:self.prefix_length], self.max_edits):
+            candidates.update(self.variants.get(variant, ()))
+
+        results = []
+        for index in candidates:
+            key = self.keys[index]
+            longer = max(len(query), len(key))
+            allowed = min(self.max_edits, int((1 - min_similarity) * longer + 1e-9))
+            distance = bounded_edit_distance(query, key, allowed)
+            if distance is not None:
+                results.append((1 - distance / longer, key, self.values[index]))
+
+        results.sort(key=lambda r: (-r[0], r[1]))
+        return results[:limit] if limit else results
+
+
+class CloseMatchIndex:
+    """
+    difflib.get_close_matches over a fixed list of keys. A key's similarity
+    never exceeds difflib's quick_ratio, the share of characters the two
+    strings have in common; that bound is computed for every key at once from
+    a matrix of character counts. Keys are scored best bound first, stopping
+    once no remaining bound can beat the n matches already found, so the
+    result is the same as without the index.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys: List[str] = list(dict.fromkeys(keys))
+        self.alphabet: Dict[str, int] = {}
+        for key in self.keys:
+            for ch in key:
+                self.alphabet.setdefault(ch, len(self.alphabet))
+        self.counts = np.zeros((len(self.keys), len(self.alphabet)), dtype=np.int32)
+        for row, key in enumerate(self.keys):
+            for ch in key:
+                self.counts[row, self.alphabet[ch]] += 1
+        self.lengths = np.array([len(key) for key in self.keys], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get_close_matches(self, word: str, n: int = 3, cutoff: float = 0.6) -> List[str]:
+        """Same result as difflib.get_close_matches(word, keys, n, cutoff)"""
+        if not self.keys or not word or n <= 0:
+            # Nothing to prune (an empty word only matches an empty key);
+            # difflib also rejects a non-positive n
+            return difflib.get_close_matches(word, self.keys, n, cutoff)
+        query = np.zeros(len(self.alphabet), dtype=np.int32)
+        for ch in word:
+            column = self.alphabet.get(ch)
+            if column is not None:
+                query[column] += 1
+        # quick_ratio of every key, with the same arithmetic as difflib
+        bound = 2.0 * np.minimum(self.counts, query).sum(axis=1) / (self.lengths + len(word))
+        rows = np.flatnonzero(bound >= cutoff)
+        rows = rows[np.argsort(-bound[rows], kind='stable')]
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+        best: List[Tuple[float, str]] = []  # min-heap of the n best (score, key)
+        for row in rows:
+            if len(best) == n and bound[row] < best[0][0]:
+                break
+            key = self.keys[row]
+            matcher.set_seq1(key)
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                score = matcher.ratio()
+                if score >= cutoff:
+                    if len(best) < n:
+                        heapq.heappush(best, (score, key))
+                    else:
+                        heapq.heappushpop(best, (score, key))
+        return [key for _score, key in sorted(best, reverse=True)]
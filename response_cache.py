@@ -0,0 +1,85 @@
+"""
+LRU cache with per-entry expiry for the chatbot's response parts.
+
+Entries live in an OrderedDict kept in least recently used order, so lookups,
+inserts and evictions are O(1): a hit moves the entry to the end, and a full
+cache drops the entry at the front. Every entry carries its own expiry time,
+letting static parts (pagoda descriptions, intent classifications) outlive
+ones that depend on external services (routes).
+
+Responses with varied phrasing are cached as parts: fixed strings and lists
+of alternative phrasings, from which render_parts picks one per reply.
+"""
+
+import time
+import random
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Hashable, Optional
+
+# Returned by get() on a miss, so None can be cached
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ttl seconds after being stored"""
+
+    def __init__(self, max_size: int = 1000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Any:
+        """The cached value, or MISSING if absent or expired"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.entries[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, build: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Cached value for key, computing and storing it with build() on a miss"""
+        value = self.get(key)
+        if value is MISSING:
+            value = build()
+            self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_size': self.max_size,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def render_parts(parts: List[Any]) -> str:
+    """Join response parts, choosing one phrasing wherever a part lists alternatives"""
+    return "".join(random.choice(part) if isinstance(part, list) else part for part in parts)
@@ -0,0 +1,500 @@
+"""
+Road Graph Module for Baganetic
+Builds an offline, intersection-level road network from a local OpenStreetMap
+extract and stores it in the pathfinder's binary format
+
+Usage:
+    python road_graph.py bagan.osm.pbf -o assets/data/bagan_road_graph.bin
+"""
+
+import os
+import sys
+import json
+import math
+import heapq
+import struct
+import argparse
+import xml.etree.ElementTree as ET
+from array import array
+from collections import defaultdict
+from typing import List, Dict, Tuple, Optional
+
+# pyosmium is only needed to read .osm.pbf extracts
+try:
+    import osmium
+except Exception:  # pragma: no cover
+    osmium = None
+
+ROAD_GRAPH_PATH = os.getenv("ROAD_GRAPH_PATH", "assets/data/bagan_road_graph.bin")
+DEFAULT_PAGODA_JSON = os.path.join("Database, Report and Datasets", "baganetic_users.pagodas.json")
+
+ROAD_GRAPH_MAGIC = b"BGNROAD"
+ROAD_GRAPH_VERSION = 1
+
+# Pagodas further than this from any road are reported when snapping
+MAX_SNAP_KM = 0.5
+
+# OSM highway types usable by visitors (on foot, by bike, cart or car)
+ROUTABLE_HIGHWAYS = {
+    'motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'unclassified',
+    'residential', 'service', 'living_street', 'road', 'track', 'path',
+    'footway', 'cycleway', 'pedestrian', 'bridleway', 'steps',
+    'motorway_link', 'trunk_link', 'primary_link', 'secondary_link', 'tertiary_link'
+}
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Calculate great circle distance between two points in km"""
+    R = 6371  # Earth radius in km
+
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+
+    a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlng / 2) * math.sin(dlng / 2))
+
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+class RoadGraph:
+    """
+    Intersection-level road network in compressed adjacency (CSR) form.
+    Each directed edge carries its length and the shape points between its
+    two intersections; pagodas are snapped to their nearest road node.
+    """
+
+    def __init__(self, node_lat: array, node_lng: array,
+                 edge_offsets: array, edge_targets: array, edge_km: array,
+                 shape_offsets: array, shape_lat: array, shape_lng: array,
+                 pagoda_names: List[str], pagoda_nodes: array,
+                 snap_km: array, pagoda_km: array):
+        self.node_lat = node_lat
+        self.node_lng = node_lng
+        self.edge_offsets = edge_offsets
+        self.edge_targets = edge_targets
+        self.edge_km = edge_km
+        self.shape_offsets = shape_offsets
+        self.shape_lat = shape_lat
+        self.shape_lng = shape_lng
+        self.pagoda_names = pagoda_names
+        self.pagoda_nodes = pagoda_nodes
+        self.snap_km = snap_km
+        self.pagoda_km = pagoda_km
+        self.pagoda_index = {name: i for i, name in enumerate(pagoda_names)}
+        self.route_cache = {}
+        self.snap_cache = {}
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_lat)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_targets)
+
+    def has_pagoda(self, name: str) -> bool:
+        return name in self.pagoda_index
+
+    def pagoda_distance(self, start: str, end: str) -> Optional[float]:
+        """
+        Road distance in km between two pagodas, including the walk from each
+        pagoda to its snapped road node; None if unknown or unreachable
+        """
+        i = self.pagoda_index.get(start)
+        j = self.pagoda_index.get(end)
+        if i is None or j is None:
+            return None
+
+        road_km = self.pagoda_km[i * len(self.pagoda_names) + j]
+        if math.isinf(road_km):
+            return None
+        return self.snap_km[i] + road_km + self.snap_km[j]
+
+    def shortest_distances(self, source: int) -> array:
+        """Dijkstra from one road node; returns km to every node"""
+        dist = array('d', [float('inf')]) * self.node_count
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        offsets, targets, lengths = self.edge_offsets, self.edge_targets, self.edge_km
+
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[edge]
+                nd = d + lengths[edge]
+                if nd < dist[neighbor]:
+                    dist[neighbor] = nd
+                    heapq.heappush(heap, (nd, neighbor))
+
+        return dist
+
+    def route(self, start: str, end: str) -> Optional[Tuple[float, List[Dict]]]:
+        """
+        Road route between two pagodas using A* over the road network.
+        Returns the road distance in km and the road geometry between the
+        snapped road nodes, or None if either pagoda is not on the network.
+        """
+        cache_key = (start, end)
+        if cache_key in self.route_cache:
+            return self.route_cache[cache_key]
+
+        i = self.pagoda_index.get(start)
+        j = self.pagoda_index.get(end)
+        if i is None or j is None:
+            return None
+
+        result = self._astar(self.pagoda_nodes[i], self.pagoda_nodes[j])
+        self.route_cache[cache_key] = result
+        if result is not None:
+            self.route_cache[(end, start)] = (result[0], list(reversed(result[1])))
+        return result
+
+    def nearest_node(self, lat: float, lng: float) -> Optional[int]:
+        """Closest road node to a point, or None if it is beyond MAX_SNAP_KM"""
+        cache_key = (round(lat, 5), round(lng, 5))
+        if cache_key in self.snap_cache:
+            return self.snap_cache[cache_key]
+
+        best, best_km = None, MAX_SNAP_KM
+        for node in range(self.node_count):
+            d = haversine_km(lat, lng, self.node_lat[node], self.node_lng[node])
+            if d <= best_km:
+                best, best_km = node, d
+        self.snap_cache[cache_key] = best
+        return best
+
+    def route_points(self, points: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """
+        Road geometry through arbitrary (lat, lng) waypoints, each snapped to
+        its nearest road node. None if any waypoint is off the network or
+        two consecutive waypoints are not connected.
+        """
+        nodes = [self.nearest_node(lat, lng) for lat, lng in points]
+        if not nodes or any(node is None for node in nodes):
+            return None
+
+        coordinates = [self._node_coordinate(nodes[0])]
+        for source, target in zip(nodes, nodes[1:]):
+            if source == target:
+                continue
+            result = self._astar(source, target)
+            if result is None:
+                return None
+            coordinates.extend(result[1][1:])
+        return coordinates
+
+    def _astar(self, source: int, target: int) -> Optional[Tuple[float, List[Dict]]]:
+        """A* between two road nodes with a straight-line heuristic"""
+        target_lat = self.node_lat[target]
+        target_lng = self.node_lng[target]
+        offsets, targets, lengths = self.edge_offsets, self.edge_targets, self.edge_km
+
+        g_score = {source: 0.0}
+        came_from = {}  # node -> edge used to reach it
+        closed_set = set()
+        open_set = [(haversine_km(self.node_lat[source], self.node_lng[source], target_lat, target_lng), source)]
+
+        while open_set:
+            current = heapq.heappop(open_set)[1]
+            if current in closed_set:
+                continue
+            closed_set.add(current)
+
+            if current == target:
+                return g_score[current], self._edge_path_coordinates(source, target, came_from)
+
+            for edge in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[edge]
+                if neighbor in closed_set:
+                    continue
+                tentative_g_score = g_score[current] + lengths[edge]
+                if tentative_g_score < g_score.get(neighbor, float('inf')):
+                    g_score[neighbor] = tentative_g_score
+                    came_from[neighbor] = (current, edge)
+                    h = haversine_km(self.node_lat[neighbor], self.node_lng[neighbor], target_lat, target_lng)
+                    heapq.heappush(open_set, (tentative_g_score + h, neighbor))
+
+        return None
+
+    def _edge_path_coordinates(self, source: int, target: int, came_from: Dict) -> List[Dict]:
+        """Expand the edges of a found route into road coordinates"""
+        edges = []
+        node = target
+        while node != source:
+            node, edge = came_from[node]
+            edges.append((node, edge))
+        edges.reverse()
+
+        coordinates = [self._node_coordinate(source)]
+        for _node, edge in edges:
+            for k in range(self.shape_offsets[edge], self.shape_offsets[edge + 1]):
+                coordinates.append({'lat': self.shape_lat[k], 'lng': self.shape_lng[k], 'name': "Road waypoint"})
+            coordinates.append(self._node_coordinate(self.edge_targets[edge]))
+        return coordinates
+
+    def _node_coordinate(self, node: int) -> Dict:
+        return {'lat': self.node_lat[node], 'lng': self.node_lng[node], 'name': "Road waypoint"}
+
+    def _arrays(self) -> List[array]:
+        """Arrays in on-disk order"""
+        return [
+            self.node_lat, self.node_lng,
+            self.edge_offsets, self.edge_targets, self.edge_km,
+            self.shape_offsets, self.shape_lat, self.shape_lng,
+            self.pagoda_nodes, self.snap_km, self.pagoda_km
+        ]
+
+    def save(self, path: str):
+        """
+        Write the graph in the binary format: magic, a length-prefixed JSON
+        header, then the raw arrays in fixed order
+        """
+        header = {
+            'version': ROAD_GRAPH_VERSION,
+            'byteorder': sys.byteorder,
+            'int_size': array('i').itemsize,
+            'nodes': self.node_count,
+            'edges': self.edge_count,
+            'shapes': len(self.shape_lat),
+            'pagodas': self.pagoda_names
+        }
+        blob = json.dumps(header).encode('utf-8')
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(ROAD_GRAPH_MAGIC)
+            f.write(struct.pack('<I', len(blob)))
+            f.write(blob)
+            for values in self._arrays():
+                values.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'RoadGraph':
+        """Read a graph written by save()"""
+        with open(path, 'rb') as f:
+            if f.read(len(ROAD_GRAPH_MAGIC)) != ROAD_GRAPH_MAGIC:
+                raise ValueError(f"{path} is not a Baganetic road graph")
+            (header_len,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+            if header.get('version') != ROAD_GRAPH_VERSION:
+                raise ValueError(f"Unsupported road graph version: {header.get('version')}")
+            if header.get('int_size') != array('i').itemsize:
+                raise ValueError("Road graph was written with a different integer size")
+
+            n, e, s = header['nodes'], header['edges'], header['shapes']
+            p = len(header['pagodas'])
+            layout = [
+                ('d', n), ('d', n),
+                ('i', n + 1), ('i', e), ('d', e),
+                ('i', e + 1), ('d', s), ('d', s),
+                ('i', p), ('d', p), ('d', p * p)
+            ]
+            arrays = []
+            for typecode, count in layout:
+                values = array(typecode)
+                values.fromfile(f, count)
+                if header['byteorder'] != sys.byteorder:
+                    values.byteswap()
+                arrays.append(values)
+
+        (node_lat, node_lng, edge_offsets, edge_targets, edge_km,
+         shape_offsets, shape_lat, shape_lng, pagoda_nodes, snap_km, pagoda_km) = arrays
+        return cls(node_lat, node_lng, edge_offsets, edge_targets, edge_km,
+                   shape_offsets, shape_lat, shape_lng,
+                   header['pagodas'], pagoda_nodes, snap_km, pagoda_km)
+
+
+# Road graph loaded once per process (None if no file is installed)
+_default_road_graph = None
+_default_road_graph_loaded = False
+
+
+def load_default_road_graph() -> Optional[RoadGraph]:
+    """Load the installed road graph, if any, once per process"""
+    global _default_road_graph, _default_road_graph_loaded
+    if not _default_road_graph_loaded:
+        _default_road_graph_loaded = True
+        if os.path.exists(ROAD_GRAPH_PATH):
+            try:
+                _default_road_graph = RoadGraph.load(ROAD_GRAPH_PATH)
+            except Exception as e:
+                print(f"Failed to load road graph {ROAD_GRAPH_PATH}: {e}")
+    return _default_road_graph
+
+
+def _read_osm_xml(path: str) -> Tuple[Dict[int, Tuple[float, float]], List[List[int]]]:
+    """Stream an .osm XML extract, keeping nodes and routable ways"""
+    nodes = {}
+    ways = []
+    for _event, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag == 'node':
+            nodes[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+            elem.clear()
+        elif elem.tag == 'way':
+            highway = None
+            for tag in elem.iter('tag'):
+                if tag.get('k') == 'highway':
+                    highway = tag.get('v')
+                    break
+            if highway in ROUTABLE_HIGHWAYS:
+                ways.append([int(nd.get('ref')) for nd in elem.iter('nd')])
+            elem.clear()
+        elif elem.tag == 'relation':
+            elem.clear()
+    return nodes, ways
+
+
+def _read_osm_pbf(path: str) -> Tuple[Dict[int, Tuple[float, float]], List[List[int]]]:
+    """Read an .osm.pbf extract with pyosmium, keeping routable ways"""
+    if osmium is None:
+        raise RuntimeError("pyosmium is required to read .osm.pbf extracts (pip install osmium)")
+
+    nodes = {}
+    ways = []
+
+    class WayCollector(osmium.SimpleHandler):
+        def way(self, way):
+            if way.tags.get('highway') not in ROUTABLE_HIGHWAYS:
+                return
+            refs = []
+            for node in way.nodes:
+                if node.location.valid():
+                    nodes[node.ref] = (node.location.lat, node.location.lon)
+                    refs.append(node.ref)
+            ways.append(refs)
+
+    WayCollector().apply_file(path, locations=True)
+    return nodes, ways
+
+
+def read_osm_extract(path: str) -> Tuple[Dict[int, Tuple[float, float]], List[List[int]]]:
+    """Read node coordinates and routable way node lists from an OSM extract"""
+    if path.endswith('.pbf'):
+        return _read_osm_pbf(path)
+    return _read_osm_xml(path)
+
+
+def build_road_graph(osm_nodes: Dict[int, Tuple[float, float]], ways: List[List[int]],
+                     pagoda_data: List[Dict]) -> RoadGraph:
+    """
+    Build an intersection-level road graph from OSM ways and snap each pagoda
+    to its nearest road node. Ways are treated as two-way since most visitors
+    walk or cycle.
+    """
+    ways = [[ref for ref in refs if ref in osm_nodes] for refs in ways]
+    ways = [refs for refs in ways if len(refs) >= 2]
+
+    # Intersections are way endpoints and nodes shared by several ways
+    use_count = defaultdict(int)
+    for refs in ways:
+        for ref in refs:
+            use_count[ref] += 1
+        use_count[refs[0]] += 1
+        use_count[refs[-1]] += 1
+    if not use_count:
+        raise ValueError("OSM extract contains no routable roads")
+
+    # Snap pagodas to their nearest road node, which becomes a graph vertex
+    pagodas = []
+    for pagoda in pagoda_data:
+        loc = pagoda.get('location', {})
+        coords = loc.get('coordinates', loc)
+        if coords.get('lat') is None or coords.get('lng') is None:
+            continue
+        best_ref, best_km = None, float('inf')
+        for ref in use_count:
+            lat, lng = osm_nodes[ref]
+            d = haversine_km(coords['lat'], coords['lng'], lat, lng)
+            if d < best_km:
+                best_ref, best_km = ref, d
+        if best_km > MAX_SNAP_KM:
+            print(f"Warning: {pagoda['name']} is {best_km:.2f} km from the nearest road")
+        pagodas.append((pagoda['name'], best_ref, best_km))
+        use_count[best_ref] += 2
+
+    vertices = {}
+    for ref, count in use_count.items():
+        if count >= 2:
+            vertices[ref] = len(vertices)
+
+    # Split ways at vertices, keeping the shortest of any parallel edges
+    edges = defaultdict(dict)  # u -> v -> (km, shape refs)
+    for refs in ways:
+        start, km, shape = refs[0], 0.0, []
+        for prev, ref in zip(refs, refs[1:]):
+            km += haversine_km(*osm_nodes[prev], *osm_nodes[ref])
+            if ref not in vertices:
+                shape.append(ref)
+                continue
+            u, v = vertices[start], vertices[ref]
+            if u != v:
+                if v not in edges[u] or km < edges[u][v][0]:
+                    edges[u][v] = (km, shape)
+                    edges[v][u] = (km, list(reversed(shape)))
+            start, km, shape = ref, 0.0, []
+
+    node_lat = array('d', [0.0]) * len(vertices)
+    node_lng = array('d', [0.0]) * len(vertices)
+    for ref, index in vertices.items():
+        node_lat[index], node_lng[index] = osm_nodes[ref]
+
+    edge_offsets, edge_targets, edge_km = array('i', [0]), array('i'), array('d')
+    shape_offsets, shape_lat, shape_lng = array('i', [0]), array('d'), array('d')
+    for u in range(len(vertices)):
+        for v, (km, shape) in edges.get(u, {}).items():
+            edge_targets.append(v)
+            edge_km.append(km)
+            for ref in shape:
+                lat, lng = osm_nodes[ref]
+                shape_lat.append(lat)
+                shape_lng.append(lng)
+            shape_offsets.append(len(shape_lat))
+        edge_offsets.append(len(edge_targets))
+
+    graph = RoadGraph(
+        node_lat, node_lng, edge_offsets, edge_targets, edge_km,
+        shape_offsets, shape_lat, shape_lng,
+        [name for name, _ref, _km in pagodas],
+        array('i', (vertices[ref] for _name, ref, _km in pagodas)),
+        array('d', (km for _name, _ref, km in pagodas)),
+        array('d')
+    )
+
+    # Pagoda-to-pagoda road distances, one Dijkstra per pagoda
+    for source in graph.pagoda_nodes:
+        dist = graph.shortest_distances(source)
+        graph.pagoda_km.extend(dist[target] for target in graph.pagoda_nodes)
+
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline Bagan road graph from an OpenStreetMap extract")
+    parser.add_argument('extract', help="Path to a .osm or .osm.pbf extract covering Bagan")
+    parser.add_argument('-o', '--output', default=ROAD_GRAPH_PATH, help="Output road graph file")
+    parser.add_argument('--pagodas', default=DEFAULT_PAGODA_JSON, help="Pagoda dataset (JSON export)")
+    args = parser.parse_args()
+
+    with open(args.pagodas, 'r', encoding='utf-8') as f:
+        pagoda_data = json.load(f)
+
+    print(f"Reading {args.extract}...")
+    osm_nodes, ways = read_osm_extract(args.extract)
+    print(f"Read {len(ways)} routable ways")
+
+    graph = build_road_graph(osm_nodes, ways, pagoda_data)
+    graph.save(args.output)
+    print(f"Saved {graph.node_count} intersections, {graph.edge_count} road edges "
+          f"and {len(graph.pagoda_names)} pagodas to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,115 +5,660 @@ Integrates with OpenStreetMap routing services to get actual road-based paths
 
 import requests
 import math
-from typing import List, Dict, Tuple, Optional
+import os
+import json
+import zlib
+import sqlite3
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Tuple, Optional, Callable, Any
 import time
+from road_graph import RoadGraph, load_default_road_graph
+
+# Persistent route geometry cache, shared by all worker processes
+ROUTE_CACHE_PATH = os.getenv("ROUTE_CACHE_PATH", "assets/data/route_cache.sqlite3")
+ROUTE_CACHE_TTL = int(os.getenv("ROUTE_CACHE_TTL_S", str(7 * 24 * 3600)))  # fresh for a week
+ROUTE_CACHE_STALE_TTL = int(os.getenv("ROUTE_CACHE_STALE_TTL_S", str(30 * 24 * 3600)))  # then served stale
+ROUTE_CACHE_PRECISION = 5  # decimal places of waypoints in cache keys (~1 m)
+
+# Segment-by-segment fallback: fetched concurrently within one overall deadline
+SEGMENT_FETCH_WORKERS = 4
+SEGMENT_FETCH_DEADLINE = 10.0  # seconds
+
+# Bounded retries (connection errors, 429 and 5xx only) with jittered backoff
+ROUTER_MAX_RETRIES = 2
+ROUTER_BACKOFF_BASE = 0.25  # seconds, doubled per attempt
+
+# Circuit breaker: open after consecutive failures, probe again after a cool-down
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT = 30.0  # seconds
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Routing backends: a self-hosted OSRM (e.g. http://localhost:5005) is preferred
+# when configured; set OSRM_PUBLIC_URL empty to stop using the public demo server
+OSRM_URL = os.getenv("OSRM_URL", "")
+OSRM_PUBLIC_URL = os.getenv("OSRM_PUBLIC_URL", "http://router.project-osrm.org")
+GRAPHHOPPER_API_KEY = os.getenv("GRAPHHOPPER_API_KEY", "")
+
+# Latency-aware selection and hedged requests
+ROUTER_HEDGING = os.getenv("ROUTER_HEDGING", "true").lower() == "true"
+HEDGE_DEFAULT_DELAY = 2.0  # seconds, until a backend has enough latency samples
+HEDGE_MIN_SAMPLES = 10
+BACKEND_STATS_WINDOW = 100  # recent calls kept per backend
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling a backend whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Per-backend circuit breaker. Closed: requests flow. Open: requests are
+    short-circuited until the cool-down ends. Half-open: one probe request
+    decides whether to close again or re-open.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_short_circuits = 0
+        self._lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            self.total_short_circuits += 1
+            return False
+    
+    def available(self) -> bool:
+        """Whether a request would currently be let through (no state change)"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            return self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout
+    
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+    
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.time()
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'total_failures': self.total_failures,
+                'short_circuits': self.total_short_circuits,
+                'retry_in': max(0.0, round(self.reset_timeout - (time.time() - self.opened_at), 1))
+                            if self.state == 'open' else 0.0
+            }
+
+
+class RouteGeometryCache:
+    """
+    On-disk route geometry cache backed by SQLite in WAL mode.
+    Entries are keyed by kind ('road' for geometry from any backend,
+    'osrm-table' for distance matrices) and rounded waypoint sequence, and
+    hold zlib-compressed JSON (geometry as [lat, lng] pairs, distance
+    matrices). Entries past their TTL are still served for the stale window
+    while one caller revalidates them.
+    """
+    
+    def __init__(self, path: str = ROUTE_CACHE_PATH, ttl: int = ROUTE_CACHE_TTL,
+                 stale_ttl: int = ROUTE_CACHE_STALE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._local = threading.local()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite handles cross-process locking"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS route_geometry ("
+                " key TEXT PRIMARY KEY,"
+                " geometry BLOB NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " refreshing_at REAL NOT NULL DEFAULT 0)"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def make_key(backend: str, coordinates: List[Tuple[float, float]]) -> str:
+        """Cache key from the entry kind and the rounded (lat, lng) waypoint sequence"""
+        waypoints = ";".join(
+            f"{lat:.{ROUTE_CACHE_PRECISION}f},{lng:.{ROUTE_CACHE_PRECISION}f}" for lat, lng in coordinates
+        )
+        return f"{backend}|{waypoints}"
+    
+    def get(self, key: str) -> Tuple[Optional[Any], bool]:
+        """
+        Look up a cached payload. Returns (payload, stale); payload is None
+        on a miss or when the entry is older than TTL + stale window.
+        """
+        try:
+            row = self._connect().execute(
+                "SELECT geometry, fetched_at FROM route_geometry WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Route cache read failed: {e}")
+            return None, False
+        
+        if row is None:
+            return None, False
+        age = time.time() - row[1]
+        if age > self.ttl + self.stale_ttl:
+            return None, False
+        
+        return json.loads(zlib.decompress(row[0]).decode('utf-8')), age > self.ttl
+    
+    def set(self, key: str, payload: Any):
+        """Store a JSON payload compressed"""
+        blob = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO route_geometry (key, geometry, fetched_at, refreshing_at) VALUES (?, ?, ?, 0)",
+                (key, sqlite3.Binary(blob), time.time())
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Route cache write failed: {e}")
+    
+    def claim_refresh(self, key: str, lease: float = 60.0) -> bool:
+        """Atomically claim the revalidation of a stale entry across processes"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            cursor = conn.execute(
+                "UPDATE route_geometry SET refreshing_at = ? WHERE key = ? AND refreshing_at < ?",
+                (now, key, now - lease)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Route cache refresh claim failed: {e}")
+            return False
+    
+    def clear(self):
+        """Drop every cached entry"""
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM route_geometry")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Route cache clear failed: {e}")
+
+
+class BackendStats:
+    """Rolling latency (successful calls) and error rate of one routing backend"""
+    
+    def __init__(self, window: int = BACKEND_STATS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(latency)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return 1.0 - sum(self.outcomes) / len(self.outcomes)
+    
+    def hedge_delay(self) -> float:
+        """Wait this long for a backend before hedging: its p95 once known"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return self.quantile(0.95)
+    
+    def snapshot(self) -> Dict:
+        p50 = self.quantile(0.5)
+        p95 = self.quantile(0.95)
+        return {
+            'p50_ms': None if p50 is None else round(p50 * 1000, 1),
+            'p95_ms': None if p95 is None else round(p95 * 1000, 1),
+            'error_rate': round(self.error_rate, 3),
+            'samples': len(self.outcomes)
+        }
+
+
+class RoutingBackend:
+    """
+    A source of road geometry through a sequence of (lat, lng) waypoints.
+    route() returns coordinates or None; it should not raise.
+    """
+    
+    name = 'backend'
+    
+    def available(self) -> bool:
+        return True
+    
+    def route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        raise NotImplementedError
+
+
+class OSRMBackend(RoutingBackend):
+    """OSRM HTTP API (self-hosted or the public demo server)"""
+    
+    def __init__(self, router: 'RoadRouter', name: str, base_url: str):
+        self.router = router
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.route_url = f"{self.base_url}/route/v1/driving"
+        self.table_url = f"{self.base_url}/table/v1/driving"
+    
+    def route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        return self.router._fetch_osrm_route(self, coordinates)
+    
+    def table(self, coordinates: List[Tuple[float, float]]) -> Optional[List[List[Optional[float]]]]:
+        return self.router._fetch_osrm_table(self, coordinates)
+
+
+class GraphHopperBackend(RoutingBackend):
+    """GraphHopper routing API (requires an API key)"""
+    
+    name = 'graphhopper'
+    
+    def __init__(self, router: 'RoadRouter'):
+        self.router = router
+    
+    def available(self) -> bool:
+        return bool(self.router.graphhopper_api_key)
+    
+    def route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        return self.router._fetch_graphhopper_route(coordinates)
+
+
+class LocalGraphBackend(RoutingBackend):
+    """Offline router over the imported OSM road graph"""
+    
+    name = 'local'
+    
+    def __init__(self, road_graph: Optional[RoadGraph] = None):
+        self.road_graph = road_graph
+    
+    @property
+    def graph(self) -> Optional[RoadGraph]:
+        return self.road_graph if self.road_graph is not None else load_default_road_graph()
+    
+    def available(self) -> bool:
+        return self.graph is not None
+    
+    def route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        graph = self.graph
+        return graph.route_points(coordinates) if graph is not None else None
+
+
+class InterpolationBackend(RoutingBackend):
+    """Last resort: a midpoint between each pair of waypoints, no road data"""
+    
+    name = 'fallback'
+    
+    def route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        result = []
+        for i in range(len(coordinates) - 1):
+            (lat1, lng1), (lat2, lng2) = coordinates[i], coordinates[i + 1]
+            result.append({'lat': lat1, 'lng': lng1, 'name': "Road waypoint"})
+            result.append({'lat': (lat1 + lat2) / 2, 'lng': (lng1 + lng2) / 2, 'name': f"Waypoint {i + 1}"})
+        lat, lng = coordinates[-1]
+        result.append({'lat': lat, 'lng': lng, 'name': "Road waypoint"})
+        return result
+
 
 class RoadRouter:
     """
-    Handles road-based routing using OpenStreetMap routing services
+    Handles road-based routing using OpenStreetMap routing services.
+    Requests go to the fastest healthy backend, optionally hedged with the
+    next one when the first is slower than its usual p95.
     """
     
-    def __init__(self):
-        self.osrm_url = "http://router.project-osrm.org/route/v1/driving"
+    def __init__(self, cache: Optional[RouteGeometryCache] = None,
+                 backends: Optional[List[RoutingBackend]] = None):
         self.graphhopper_url = "https://graphhopper.com/api/1/route"
-        self.graphhopper_api_key = None  # You can add a GraphHopper API key for better routing
+        self.graphhopper_api_key = GRAPHHOPPER_API_KEY or None  # Set GRAPHHOPPER_API_KEY to enable GraphHopper
+        self.cache = cache if cache is not None else RouteGeometryCache()
         
-    def get_road_route(self, start_lat: float, start_lng: float, 
-                      end_lat: float, end_lng: float) -> Optional[List[Dict]]:
+        self.backends = backends if backends is not None else self._default_backends()
+        self.fallback_backend = InterpolationBackend()
+        self.hedging = ROUTER_HEDGING
+        self.stats = {b.name: BackendStats() for b in self.backends + [self.fallback_backend]}
+        self.breakers = {b.name: CircuitBreaker(b.name) for b in self.backends}
+        
+        # Pooled keep-alive connections, sized for the segment fetch workers
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=SEGMENT_FETCH_WORKERS * 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        self.segment_executor = ThreadPoolExecutor(max_workers=SEGMENT_FETCH_WORKERS,
+                                                   thread_name_prefix="road-segment")
+        # Backend calls run here so a slow backend can be hedged
+        self.backend_executor = ThreadPoolExecutor(max_workers=SEGMENT_FETCH_WORKERS * 2,
+                                                   thread_name_prefix="road-backend")
+    
+    def _default_backends(self) -> List[RoutingBackend]:
+        backends = [LocalGraphBackend()]
+        if OSRM_URL:
+            backends.append(OSRMBackend(self, 'osrm-local', OSRM_URL))
+        if OSRM_PUBLIC_URL:
+            backends.append(OSRMBackend(self, 'osrm', OSRM_PUBLIC_URL))
+        backends.append(GraphHopperBackend(self))
+        return backends
+    
+    def _backend_available(self, backend: RoutingBackend) -> bool:
+        breaker = self.breakers.get(backend.name)
+        return backend.available() and (breaker is None or breaker.available())
+    
+    def _ranked_backends(self) -> List[RoutingBackend]:
+        """Healthy backends, mostly-failing ones last, then fastest p50 first"""
+        def rank(backend):
+            stats = self.stats[backend.name]
+            p50 = stats.quantile(0.5)
+            # Backends without samples yet go first so they get measured
+            return (stats.error_rate >= 0.5, p50 if p50 is not None else 0.0)
+        return sorted((b for b in self.backends if self._backend_available(b)), key=rank)
+    
+    def _call_backend(self, backend: RoutingBackend,
+                      coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """Run one backend, recording its latency and outcome"""
+        started = time.monotonic()
+        try:
+            result = backend.route(coordinates)
+        except Exception as e:
+            print(f"Routing backend {backend.name} failed: {e}")
+            result = None
+        self.stats[backend.name].record(time.monotonic() - started, bool(result))
+        return result
+    
+    def _route_via_backends(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
         """
-        Get road-based route between two points using OSRM
+        Route through the ranked backends. The next backend is fired when the
+        current one exceeds its p95 (hedging) or when every call in flight
+        has failed; the first non-empty result wins.
         """
-        try:
-            # Format coordinates for OSRM (longitude, latitude)
-            start_coords = f"{start_lng},{start_lat}"
-            end_coords = f"{end_lng},{end_lat}"
+        remaining = self._ranked_backends()
+        if not remaining:
+            return None
+        
+        current = remaining.pop(0)
+        in_flight = {self.backend_executor.submit(self._call_backend, current, coordinates): current}
+        while in_flight:
+            delay = self.stats[current.name].hedge_delay() if self.hedging and remaining else None
+            done, _pending = wait(in_flight, timeout=delay, return_when=FIRST_COMPLETED)
+            for future in done:
+                del in_flight[future]
+                result = future.result()
+                if result:
+                    return result
             
-            url = f"{self.osrm_url}/{start_coords};{end_coords}"
-            params = {
-                'overview': 'full',
-                'geometries': 'geojson',
-                'steps': 'false',  # We don't need turn-by-turn instructions
-                'annotations': 'false'
-            }
+            if remaining and (not done or not in_flight):
+                current = remaining.pop(0)
+                in_flight[self.backend_executor.submit(self._call_backend, current, coordinates)] = current
+        
+        return None
+    
+    def _request_json(self, backend: str, url: str, params: Dict, timeout: float) -> Dict:
+        """
+        GET a routing backend through the pooled session, retrying connection
+        errors and 429/5xx responses with jittered exponential backoff.
+        Timeouts are not retried; they count towards the circuit breaker.
+        """
+        breaker = self.breakers[backend]
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"{backend} circuit is open")
+        
+        for attempt in range(ROUTER_MAX_RETRIES + 1):
+            retryable = False
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+                retryable = response.status_code in RETRYABLE_STATUS_CODES
+                response.raise_for_status()
+                data = response.json()
+                breaker.record_success()
+                return data
+            except requests.exceptions.Timeout:
+                # ConnectTimeout is also a ConnectionError; catch it first
+                breaker.record_failure()
+                raise
+            except requests.exceptions.ConnectionError:
+                retryable = True
+                if attempt == ROUTER_MAX_RETRIES:
+                    breaker.record_failure()
+                    raise
+            except requests.exceptions.HTTPError:
+                if not retryable:
+                    # Other 4xx (e.g. OSRM NoRoute): the backend is healthy
+                    breaker.record_success()
+                    raise
+                if attempt == ROUTER_MAX_RETRIES:
+                    breaker.record_failure()
+                    raise
+            except requests.exceptions.RequestException:
+                breaker.record_failure()
+                raise
+            except ValueError:
+                # Not JSON: a broken backend rather than a bad request
+                breaker.record_failure()
+                raise
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            time.sleep(random.uniform(0, ROUTER_BACKOFF_BASE * (2 ** attempt)))
+    
+    def health(self) -> Dict:
+        """Availability, latency, error rate and circuit breaker state per routing backend"""
+        health = {}
+        for backend in self.backends + [self.fallback_backend]:
+            breaker = self.breakers.get(backend.name)
+            entry = self.stats[backend.name].snapshot()
+            entry['available'] = backend.available()
+            entry['circuit'] = breaker.snapshot() if breaker is not None else None
+            health[backend.name] = entry
+        return health
+    
+    @staticmethod
+    def _pack_coordinates(coordinates: List[Dict]) -> List[List[float]]:
+        return [[round(c['lat'], 6), round(c['lng'], 6)] for c in coordinates]
+    
+    @staticmethod
+    def _unpack_coordinates(points: List[List[float]]) -> List[Dict]:
+        return [{'lat': lat, 'lng': lng, 'name': "Road waypoint"} for lat, lng in points]
+    
+    def _cached_route(self, backend: str, coordinates: List[Tuple[float, float]],
+                      fetch: Callable[[], Optional[List[Dict]]]) -> Optional[List[Dict]]:
+        """
+        Serve a route from the geometry cache, fetching on a miss; stale
+        entries are returned immediately and refreshed in the background
+        """
+        points = self._cached(self.cache.make_key(backend, coordinates),
+                              lambda: self._pack_result(fetch()))
+        return self._unpack_coordinates(points) if points else None
+    
+    def _pack_result(self, coordinates: Optional[List[Dict]]) -> Optional[List[List[float]]]:
+        return self._pack_coordinates(coordinates) if coordinates else None
+    
+    def _cached(self, key: str, fetch: Callable[[], Any], allow_fetch: bool = True) -> Any:
+        """Cache-aside lookup with stale-while-revalidate"""
+        cached, stale = self.cache.get(key)
+        if cached is not None:
+            if stale and allow_fetch and self.cache.claim_refresh(key):
+                threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+            return cached
+        if not allow_fetch:
+            return None
+        
+        result = fetch()
+        if result:
+            self.cache.set(key, result)
+        return result
+    
+    def _refresh(self, key: str, fetch: Callable[[], Any]):
+        """Revalidate a stale cache entry"""
+        result = fetch()
+        if result:
+            self.cache.set(key, result)
+    
+    def get_road_route(self, start_lat: float, start_lng: float, 
+                      end_lat: float, end_lng: float) -> Optional[List[Dict]]:
+        """
+        Get road-based route between two points
+        """
+        coordinates = [(start_lat, start_lng), (end_lat, end_lng)]
+        return self._cached_route('road', coordinates, lambda: self._route_via_backends(coordinates))
+    
+    def get_multi_waypoint_route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """
+        Get road-based route through multiple waypoints
+        """
+        if len(coordinates) < 2:
+            return None
+        
+        return self._cached_route('road', coordinates, lambda: self._route_via_backends(coordinates))
+    
+    @staticmethod
+    def _osrm_route_request(backend: OSRMBackend, coordinates: List[Tuple[float, float]]) -> Tuple[str, Dict, float]:
+        """URL, query parameters and timeout of an OSRM route request"""
+        # Format coordinates for OSRM (longitude, latitude)
+        coord_string = ";".join([f"{lng},{lat}" for lat, lng in coordinates])
+        
+        url = f"{backend.route_url}/{coord_string}"
+        params = {
+            'overview': 'full',
+            'geometries': 'geojson',
+            'steps': 'false',  # We don't need turn-by-turn instructions
+            'annotations': 'false'
+        }
+        if len(coordinates) > 2:
+            params['continue_straight'] = 'false'  # Allow route optimization
+        
+        return url, params, 10 if len(coordinates) == 2 else 15
+    
+    @staticmethod
+    def _parse_osrm_route(backend: OSRMBackend, data: Dict) -> Optional[List[Dict]]:
+        if data.get('code') == 'Ok' and data.get('routes'):
+            route = data['routes'][0]
+            geometry = route['geometry']
             
-            data = response.json()
+            # Convert GeoJSON coordinates to our format
+            coordinates = []
+            for coord in geometry['coordinates']:
+                coordinates.append({
+                    'lng': coord[0],
+                    'lat': coord[1],
+                    'name': f"Road waypoint"
+                })
             
-            if data.get('code') == 'Ok' and data.get('routes'):
-                route = data['routes'][0]
-                geometry = route['geometry']
-                
-                # Convert GeoJSON coordinates to our format
-                coordinates = []
-                for coord in geometry['coordinates']:
-                    coordinates.append({
-                        'lng': coord[0],
-                        'lat': coord[1],
-                        'name': f"Road waypoint"
-                    })
-                
-                return coordinates
-            else:
-                print(f"OSRM routing failed: {data.get('message', 'Unknown error')}")
-                return None
-                
+            return coordinates
+        else:
+            print(f"OSRM ({backend.name}) routing failed: {data.get('message', 'Unknown error')}")
+            return None
+    
+    def _fetch_osrm_route(self, backend: OSRMBackend, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """Request a route through two or more waypoints from an OSRM server"""
+        try:
+            url, params, timeout = self._osrm_route_request(backend, coordinates)
+            return self._parse_osrm_route(backend, self._request_json(backend.name, url, params, timeout))
+        except CircuitOpenError:
+            return None
         except requests.exceptions.RequestException as e:
-            print(f"OSRM request failed: {e}")
+            print(f"OSRM ({backend.name}) request failed: {e}")
             return None
         except Exception as e:
             print(f"Error getting road route: {e}")
             return None
     
-    def get_multi_waypoint_route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+    def get_distance_matrix(self, coordinates: List[Tuple[float, float]],
+                            allow_fetch: bool = True) -> Optional[List[List[Optional[float]]]]:
         """
-        Get road-based route through multiple waypoints
+        Road distances in km between all (lat, lng) points, from one batched
+        OSRM table request; None entries are unreachable pairs. Results are
+        kept in the route cache. With allow_fetch=False only the cache is read.
         """
         if len(coordinates) < 2:
             return None
-            
+        
+        return self._cached(self.cache.make_key('osrm-table', coordinates),
+                            lambda: self._fetch_distance_matrix(coordinates),
+                            allow_fetch)
+    
+    def _fetch_distance_matrix(self, coordinates: List[Tuple[float, float]]) -> Optional[List[List[Optional[float]]]]:
+        """Ask the OSRM backends, fastest first, for the all-pairs distance table"""
+        for backend in self._ranked_backends():
+            if isinstance(backend, OSRMBackend):
+                matrix = backend.table(coordinates)
+                if matrix:
+                    return matrix
+        return None
+    
+    def _fetch_osrm_table(self, backend: OSRMBackend,
+                          coordinates: List[Tuple[float, float]]) -> Optional[List[List[Optional[float]]]]:
+        """Request the all-pairs distance table from an OSRM server"""
         try:
-            # Format coordinates for OSRM
             coord_string = ";".join([f"{lng},{lat}" for lat, lng in coordinates])
             
-            url = f"{self.osrm_url}/{coord_string}"
-            params = {
-                'overview': 'full',
-                'geometries': 'geojson',
-                'steps': 'false',
-                'annotations': 'false',
-                'continue_straight': 'false'  # Allow route optimization
-            }
-            
-            response = requests.get(url, params=params, timeout=15)
-            response.raise_for_status()
+            url = f"{backend.table_url}/{coord_string}"
+            params = {'annotations': 'distance'}
             
-            data = response.json()
+            data = self._request_json(backend.name, url, params, timeout=15)
             
-            if data.get('code') == 'Ok' and data.get('routes'):
-                route = data['routes'][0]
-                geometry = route['geometry']
-                
-                # Convert GeoJSON coordinates to our format
-                coordinates = []
-                for coord in geometry['coordinates']:
-                    coordinates.append({
-                        'lng': coord[0],
-                        'lat': coord[1],
-                        'name': f"Road waypoint"
-                    })
-                
-                return coordinates
+            if data.get('code') == 'Ok' and data.get('distances'):
+                # OSRM reports metres, null for unreachable pairs
+                return [
+                    [None if d is None else d / 1000.0 for d in row]
+                    for row in data['distances']
+                ]
             else:
-                print(f"OSRM multi-waypoint routing failed: {data.get('message', 'Unknown error')}")
+                print(f"OSRM table request failed: {data.get('message', 'Unknown error')}")
                 return None
                 
+        except CircuitOpenError:
+            return None
         except requests.exceptions.RequestException as e:
-            print(f"OSRM multi-waypoint request failed: {e}")
+            print(f"OSRM table request failed: {e}")
             return None
         except Exception as e:
-            print(f"Error getting multi-waypoint route: {e}")
+            print(f"Error getting distance matrix: {e}")
             return None
     
     def get_graphhopper_route(self, start_lat: float, start_lng: float, 
@@ -121,39 +666,46 @@ class RoadRouter:
         """
         Get road-based route using GraphHopper (requires API key)
         """
+        return self._fetch_graphhopper_route([(start_lat, start_lng), (end_lat, end_lng)])
+    
+    def _graphhopper_params(self, coordinates: List[Tuple[float, float]]) -> Dict:
+        return {
+            'key': self.graphhopper_api_key,
+            'point': [f"{lat},{lng}" for lat, lng in coordinates],
+            'vehicle': 'car',
+            'points_encoded': 'false',
+            'instructions': 'false'
+        }
+    
+    @staticmethod
+    def _parse_graphhopper_route(data: Dict) -> Optional[List[Dict]]:
+        if data.get('paths'):
+            path = data['paths'][0]
+            coordinates = []
+            
+            for point in path.get('points', {}).get('coordinates', []):
+                coordinates.append({
+                    'lng': point[0],
+                    'lat': point[1],
+                    'name': f"Road waypoint"
+                })
+            
+            return coordinates
+        else:
+            print(f"GraphHopper routing failed: {data.get('message', 'Unknown error')}")
+            return None
+    
+    def _fetch_graphhopper_route(self, coordinates: List[Tuple[float, float]]) -> Optional[List[Dict]]:
+        """Request a route through two or more waypoints from GraphHopper"""
         if not self.graphhopper_api_key:
             return None
             
         try:
-            params = {
-                'key': self.graphhopper_api_key,
-                'point': [f"{start_lat},{start_lng}", f"{end_lat},{end_lng}"],
-                'vehicle': 'car',
-                'points_encoded': 'false',
-                'instructions': 'false'
-            }
-            
-            response = requests.get(self.graphhopper_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if data.get('paths'):
-                path = data['paths'][0]
-                coordinates = []
-                
-                for point in path.get('points', {}).get('coordinates', []):
-                    coordinates.append({
-                        'lng': point[0],
-                        'lat': point[1],
-                        'name': f"Road waypoint"
-                    })
-                
-                return coordinates
-            else:
-                print(f"GraphHopper routing failed: {data.get('message', 'Unknown error')}")
-                return None
-                
+            data = self._request_json('graphhopper', self.graphhopper_url,
+                                      self._graphhopper_params(coordinates), timeout=10)
+            return self._parse_graphhopper_route(data)
+        except CircuitOpenError:
+            return None
         except requests.exceptions.RequestException as e:
             print(f"GraphHopper request failed: {e}")
             return None
@@ -165,74 +717,107 @@ class RoadRouter:
         """
         Create a realistic road-based path through multiple pagodas
         """
+        return self.create_road_path(pagoda_coordinates)[0]
+    
+    def create_road_path(self, pagoda_coordinates: List[Dict]) -> Tuple[List[Dict], bool]:
+        """
+        The realistic road path through the pagodas, and whether all of it
+        follows roads (False when some leg had to be interpolated)
+        """
         if len(pagoda_coordinates) < 2:
-            return pagoda_coordinates
+            return pagoda_coordinates, True
         
         # Try to get a multi-waypoint route from OSRM
         coordinates = [(coord['lat'], coord['lng']) for coord in pagoda_coordinates]
         road_coordinates = self.get_multi_waypoint_route(coordinates)
         
         if road_coordinates:
-            # Add pagoda names to the coordinates
-            result = []
-            pagoda_index = 0
-            
-            for coord in road_coordinates:
-                # Check if this coordinate is close to a pagoda
-                if pagoda_index < len(pagoda_coordinates):
-                    pagoda = pagoda_coordinates[pagoda_index]
-                    distance = self._calculate_distance(
-                        coord['lat'], coord['lng'],
-                        pagoda['lat'], pagoda['lng']
-                    )
-                    
-                    # If close to a pagoda, use the pagoda's exact coordinates and name
-                    if distance < 0.05:  # Within 50 meters
-                        result.append({
-                            'lat': pagoda['lat'],
-                            'lng': pagoda['lng'],
-                            'name': pagoda['name']
-                        })
-                        pagoda_index += 1
-                    else:
-                        result.append(coord)
+            return self._label_pagodas(road_coordinates, pagoda_coordinates), True
+        
+        # Fallback to individual segments
+        segments = self._fetch_segments(pagoda_coordinates)
+        return self._join_segments(pagoda_coordinates, segments), all(segments)
+    
+    def _label_pagodas(self, road_coordinates: List[Dict], pagoda_coordinates: List[Dict]) -> List[Dict]:
+        """Add pagoda names to the road coordinates passing close to them"""
+        result = []
+        pagoda_index = 0
+        
+        for coord in road_coordinates:
+            # Check if this coordinate is close to a pagoda
+            if pagoda_index < len(pagoda_coordinates):
+                pagoda = pagoda_coordinates[pagoda_index]
+                distance = self._calculate_distance(
+                    coord['lat'], coord['lng'],
+                    pagoda['lat'], pagoda['lng']
+                )
+                
+                # If close to a pagoda, use the pagoda's exact coordinates and name
+                if distance < 0.05:  # Within 50 meters
+                    result.append({
+                        'lat': pagoda['lat'],
+                        'lng': pagoda['lng'],
+                        'name': pagoda['name']
+                    })
+                    pagoda_index += 1
                 else:
                     result.append(coord)
-            
-            return result
-        else:
-            # Fallback to individual segments
-            return self._create_segmented_road_path(pagoda_coordinates)
+            else:
+                result.append(coord)
+        
+        return result
     
-    def _create_segmented_road_path(self, pagoda_coordinates: List[Dict]) -> List[Dict]:
+    def _fetch_segments(self, pagoda_coordinates: List[Dict],
+                        deadline: float = SEGMENT_FETCH_DEADLINE) -> List[Optional[List[Dict]]]:
         """
-        Create road path by connecting segments between pagodas
+        Road segments between consecutive pagodas, fetched concurrently;
+        any segment not back before the deadline is None
         """
+        futures = [
+            self.segment_executor.submit(
+                self.get_road_route,
+                pagoda_coordinates[i]['lat'], pagoda_coordinates[i]['lng'],
+                pagoda_coordinates[i + 1]['lat'], pagoda_coordinates[i + 1]['lng']
+            )
+            for i in range(len(pagoda_coordinates) - 1)
+        ]
+        # Late segments keep running and still land in the geometry cache
+        done, _pending = wait(futures, timeout=deadline)
+        
+        segments = []
+        for i, future in enumerate(futures):
+            road_segment = None
+            if future in done:
+                try:
+                    road_segment = future.result()
+                except Exception as e:
+                    print(f"Road segment {i + 1} failed: {e}")
+            segments.append(road_segment)
+        
+        return segments
+    
+    def _join_segments(self, pagoda_coordinates: List[Dict],
+                       segments: List[Optional[List[Dict]]]) -> List[Dict]:
+        """Chain per-leg road segments, interpolating the legs that have none"""
         result = []
         
-        for i in range(len(pagoda_coordinates) - 1):
+        for i, road_segment in enumerate(segments):
             current = pagoda_coordinates[i]
             next_pagoda = pagoda_coordinates[i + 1]
             
             # Add the current pagoda
             result.append(current)
             
-            # Get road route between current and next pagoda
-            road_segment = self.get_road_route(
-                current['lat'], current['lng'],
-                next_pagoda['lat'], next_pagoda['lng']
-            )
+            if not road_segment:
+                # Fallback: interpolate a simple intermediate point
+                road_segment = self._call_backend(
+                    self.fallback_backend,
+                    [(current['lat'], current['lng']), (next_pagoda['lat'], next_pagoda['lng'])]
+                )[:-1]
+                road_segment[-1]['name'] = f"Waypoint {i + 1}"
             
-            if road_segment:
-                # Add intermediate road points (skip first to avoid duplication)
-                result.extend(road_segment[1:])
-            else:
-                # Fallback: add a simple intermediate point
-                result.append({
-                    'lat': (current['lat'] + next_pagoda['lat']) / 2,
-                    'lng': (current['lng'] + next_pagoda['lng']) / 2,
-                    'name': f"Waypoint {i + 1}"
-                })
+            # Add intermediate road points (skip first to avoid duplication)
+            result.extend(road_segment[1:])
         
         # Add the final pagoda
         result.append(pagoda_coordinates[-1])
@@ -0,0 +1,465 @@
+"""
+Per-user conversation state for the chatbot.
+
+The chatbot and its learning components used to keep every user's history,
+context, learned preferences and interactions in process-wide dicts that
+were never evicted. SessionStore keeps one record per user instead, a dict
+of named sections (conversation memory, context, topic transitions, ...),
+in a pluggable backend:
+
+    memory  an in-process LRU (the default)
+    sqlite  a SQLite file in WAL mode, shared by the workers of one host
+    redis   any server speaking the Redis protocol (Redis, Valkey, KeyDB)
+
+Every backend evicts users idle for longer than the TTL and, least recently
+used first, users beyond the user and byte limits. Sizes are the records'
+pickled length, so memory use is accounted the same way everywhere.
+
+Writes go through sessions: `with store.session(user_id) as record:` loads
+the record once, nested sessions of the same thread share it, and the
+outermost one writes it back.
+"""
+
+import os
+import time
+import pickle
+import socket
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable
+from urllib.parse import urlparse
+
+SESSION_BACKEND = os.getenv("CHATBOT_SESSION_BACKEND", "memory")
+SESSION_MAX_USERS = int(os.getenv("CHATBOT_SESSION_MAX_USERS", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("CHATBOT_SESSION_MAX_MB", "64")) * 1024 * 1024
+SESSION_TTL = int(os.getenv("CHATBOT_SESSION_TTL_S", str(6 * 3600)))  # idle time before a session expires
+SESSION_DB_PATH = os.getenv("CHATBOT_SESSION_PATH", "assets/data/chat_sessions.sqlite3")
+SESSION_REDIS_URL = os.getenv("CHATBOT_SESSION_REDIS_URL", "redis://localhost:6379/0")
+
+# Shared backends check the user and byte limits every this many writes
+SWEEP_INTERVAL = 64
+
+
+class MemorySessionBackend:
+    """Records in an OrderedDict kept in least recently used order"""
+
+    name = 'memory'
+
+    def __init__(self, max_users: int = SESSION_MAX_USERS, max_bytes: int = SESSION_MAX_BYTES,
+                 ttl: int = SESSION_TTL):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.records: 'OrderedDict[str, List]' = OrderedDict()  # user_id -> [record, size, accessed_at]
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self.records.get(user_id)
+            if entry is None:
+                return None
+            if now - entry[2] > self.ttl:
+                self._drop(user_id)
+                self.expirations += 1
+                return None
+            entry[2] = now
+            self.records.move_to_end(user_id)
+            return entry[0]
+
+    def store(self, user_id: str, record: Dict[str, Any], blob: bytes):
+        now = time.time()
+        with self._lock:
+            if user_id in self.records:
+                self._drop(user_id)
+            self.records[user_id] = [record, len(blob), now]
+            self.bytes += len(blob)
+
+            # Least recently used first: expired sessions are at the front
+            while self.records:
+                oldest_id, oldest = next(iter(self.records.items()))
+                if now - oldest[2] > self.ttl:
+                    self.expirations += 1
+                elif len(self.records) > self.max_users or self.bytes > self.max_bytes:
+                    if oldest_id == user_id:
+                        break
+                    self.evictions += 1
+                else:
+                    break
+                self._drop(oldest_id)
+
+    def delete(self, user_id: str):
+        with self._lock:
+            if user_id in self.records:
+                self._drop(user_id)
+
+    def _drop(self, user_id: str):
+        self.bytes -= self.records.pop(user_id)[1]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'users': len(self.records), 'bytes': self.bytes,
+                    'evictions': self.evictions, 'expirations': self.expirations}
+
+
+class SQLiteSessionBackend:
+    """Pickled records in a SQLite table, one row per user"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = SESSION_DB_PATH, max_users: int = SESSION_MAX_USERS,
+                 max_bytes: int = SESSION_MAX_BYTES, ttl: int = SESSION_TTL):
+        self.path = path
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._writes = 0
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite handles cross-process locking"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                " user_id TEXT PRIMARY KEY,"
+                " data BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chat_sessions_accessed ON chat_sessions (accessed_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            row = self._connect().execute(
+                "SELECT data FROM chat_sessions WHERE user_id = ? AND accessed_at >= ?",
+                (user_id, time.time() - self.ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Session store read failed: {e}")
+            return None
+        return pickle.loads(row[0]) if row else None
+
+    def store(self, user_id: str, record: Dict[str, Any], blob: bytes):
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (user_id, data, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (user_id, sqlite3.Binary(blob), len(blob), now)
+            )
+            self.expirations += conn.execute(
+                "DELETE FROM chat_sessions WHERE accessed_at < ?", (now - self.ttl,)
+            ).rowcount
+            self._writes += 1
+            if self._writes % SWEEP_INTERVAL == 0:
+                self._enforce_limits(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Session store write failed: {e}")
+
+    def _enforce_limits(self, conn: sqlite3.Connection):
+        """Delete least recently used sessions beyond the user and byte limits"""
+        users, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chat_sessions").fetchone()
+        if users <= self.max_users and total <= self.max_bytes:
+            return
+        stale = []
+        for user_id, size in conn.execute("SELECT user_id, size FROM chat_sessions ORDER BY accessed_at"):
+            if users <= self.max_users and total <= self.max_bytes:
+                break
+            stale.append((user_id,))
+            users -= 1
+            total -= size
+        conn.executemany("DELETE FROM chat_sessions WHERE user_id = ?", stale)
+        self.evictions += len(stale)
+
+    def delete(self, user_id: str):
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM chat_sessions WHERE user_id = ?", (user_id,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Session store delete failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            users, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chat_sessions WHERE accessed_at >= ?",
+                (time.time() - self.ttl,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Session store stats failed: {e}")
+            users, total = 0, 0
+        return {'users': users, 'bytes': total, 'evictions': self.evictions, 'expirations': self.expirations}
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RespClient:
+    """Minimal blocking Redis-protocol (RESP2) client, one connection per thread"""
+
+    def __init__(self, url: str = SESSION_REDIS_URL, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn = conn
+            if self.password:
+                self.execute('AUTH', self.password)
+            if self.db:
+                self.execute('SELECT', self.db)
+        return conn
+
+    def execute(self, *args) -> Any:
+        sock, reader = self._connection()
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        try:
+            sock.sendall(b''.join(parts))
+            return self._read_reply(reader)
+        except (OSError, EOFError):
+            self.close()
+            raise
+
+    def _read_reply(self, reader) -> Any:
+        line = reader.readline()
+        if not line:
+            raise EOFError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            raise RespError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn[0].close()
+            self._local.conn = None
+
+
+class RedisSessionBackend:
+    """
+    Records as Redis strings that expire after the idle TTL, plus a sorted
+    set of access times and a hash of sizes for the LRU and byte limits
+    """
+
+    name = 'redis'
+
+    def __init__(self, url: str = SESSION_REDIS_URL, max_users: int = SESSION_MAX_USERS,
+                 max_bytes: int = SESSION_MAX_BYTES, ttl: int = SESSION_TTL, prefix: str = 'baganetic:session:'):
+        self.client = RespClient(url)
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lru_key = prefix + '_lru'
+        self.sizes_key = prefix + '_sizes'
+        self.evictions = 0
+        self.expirations = 0
+        self._writes = 0
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            blob = self.client.execute('GET', self.prefix + user_id)
+        except (OSError, EOFError, RespError) as e:
+            print(f"Session store read failed: {e}")
+            return None
+        return pickle.loads(blob) if blob is not None else None
+
+    def store(self, user_id: str, record: Dict[str, Any], blob: bytes):
+        now = time.time()
+        try:
+            self.client.execute('SET', self.prefix + user_id, blob, 'EX', self.ttl)
+            self.client.execute('ZADD', self.lru_key, now, user_id)
+            self.client.execute('HSET', self.sizes_key, user_id, len(blob))
+            self._writes += 1
+            if self._writes % SWEEP_INTERVAL == 0:
+                self._enforce_limits(now)
+        except (OSError, EOFError, RespError) as e:
+            print(f"Session store write failed: {e}")
+
+    def _enforce_limits(self, now: float):
+        """Forget expired sessions, then evict least recently used ones beyond the limits"""
+        expired = self.client.execute('ZRANGEBYSCORE', self.lru_key, '-inf', now - self.ttl)
+        if expired:
+            self.client.execute('ZREM', self.lru_key, *expired)
+            self.client.execute('HDEL', self.sizes_key, *expired)
+            self.expirations += len(expired)
+
+        users = self.client.execute('ZCARD', self.lru_key)
+        total = sum(int(size) for size in self.client.execute('HVALS', self.sizes_key))
+        if users <= self.max_users and total <= self.max_bytes:
+            return
+        stale = []
+        for user_id in self.client.execute('ZRANGE', self.lru_key, 0, -1):
+            if users <= self.max_users and total <= self.max_bytes:
+                break
+            stale.append(user_id)
+            users -= 1
+            total -= int(self.client.execute('HGET', self.sizes_key, user_id) or 0)
+        if stale:
+            self.client.execute('DEL', *[self.prefix.encode('utf-8') + user_id for user_id in stale])
+            self.client.execute('ZREM', self.lru_key, *stale)
+            self.client.execute('HDEL', self.sizes_key, *stale)
+            self.evictions += len(stale)
+
+    def delete(self, user_id: str):
+        try:
+            self.client.execute('DEL', self.prefix + user_id)
+            self.client.execute('ZREM', self.lru_key, user_id)
+            self.client.execute('HDEL', self.sizes_key, user_id)
+        except (OSError, EOFError, RespError) as e:
+            print(f"Session store delete failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            users = self.client.execute('ZCOUNT', self.lru_key, time.time() - self.ttl, '+inf')
+            total = sum(int(size) for size in self.client.execute('HVALS', self.sizes_key))
+        except (OSError, EOFError, RespError) as e:
+            print(f"Session store stats failed: {e}")
+            users, total = 0, 0
+        return {'users': users, 'bytes': total, 'evictions': self.evictions, 'expirations': self.expirations}
+
+
+class SessionSection:
+    """
+    Dict-like view of one section of every user's record, indexed by user
+    id. A missing section is created from the factory, as a defaultdict
+    would; without a factory missing users raise KeyError.
+    """
+
+    def __init__(self, store: 'SessionStore', name: str, factory: Optional[Callable[[], Any]] = None):
+        self.store = store
+        self.name = name
+        self.factory = factory
+
+    def __contains__(self, user_id: str) -> bool:
+        record = self.store.peek(user_id)
+        return record is not None and self.name in record
+
+    def __getitem__(self, user_id: str) -> Any:
+        record = self.store.get(user_id)
+        if self.name not in record:
+            if self.factory is None:
+                raise KeyError(user_id)
+            record[self.name] = self.factory()
+        return record[self.name]
+
+    def __setitem__(self, user_id: str, value: Any):
+        self.store.get(user_id)[self.name] = value
+
+    def get(self, user_id: str, default: Any = None) -> Any:
+        record = self.store.peek(user_id)
+        return record.get(self.name, default) if record is not None else default
+
+
+class SessionStore:
+    """Per-user records over a session backend"""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemorySessionBackend()
+        self._local = threading.local()
+
+    def _open(self) -> Dict[str, List]:
+        """This thread's open sessions: user_id -> [record, depth]"""
+        opened = getattr(self._local, 'opened', None)
+        if opened is None:
+            opened = self._local.opened = {}
+        return opened
+
+    @contextmanager
+    def session(self, user_id: str):
+        """The user's record; the outermost session of a thread writes it back"""
+        opened = self._open()
+        entry = opened.get(user_id)
+        if entry is None:
+            entry = opened[user_id] = [self.backend.load(user_id) or {}, 0]
+        entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del opened[user_id]
+                self.save(user_id, entry[0])
+
+    def save(self, user_id: str, record: Dict[str, Any]):
+        self.backend.store(user_id, record, pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def peek(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """The user's record, or None if there is none; outside a session changes are not saved"""
+        entry = self._open().get(user_id)
+        return entry[0] if entry is not None else self.backend.load(user_id)
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        record = self.peek(user_id)
+        return record if record is not None else {}
+
+    def delete(self, user_id: str):
+        self._open().pop(user_id, None)
+        self.backend.delete(user_id)
+
+    def section(self, name: str, factory: Optional[Callable[[], Any]] = None) -> SessionSection:
+        return SessionSection(self, name, factory)
+
+    def __len__(self) -> int:
+        return self.backend.stats()['users']
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.backend.stats()
+        stats.update(backend=self.backend.name, max_users=self.backend.max_users,
+                     max_bytes=self.backend.max_bytes, ttl_s=self.backend.ttl)
+        return stats
+
+
+def create_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    """Session store for the configured backend; falls back to memory if it is unknown"""
+    if backend == 'sqlite':
+        return SessionStore(SQLiteSessionBackend())
+    if backend == 'redis':
+        return SessionStore(RedisSessionBackend())
+    if backend != 'memory':
+        print(f"Unknown session backend '{backend}', keeping sessions in memory")
+    return SessionStore(MemorySessionBackend())
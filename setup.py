@@ -226,7 +226,7 @@ class BaganeticInstaller:
             # Phase 3: Optional packages (install if possible)
             self.log("Phase 3: Installing optional packages...")
             optional_packages = [
-                "spacy>=3.7.0"
+                "aiohttp>=3.8.0"  # AsyncRoadRouter (async_road_routing.py)
             ]
             
             for package in optional_packages:
@@ -467,6 +467,17 @@ RATE_LIMIT_WINDOW_MS=900000
             self.log(f"Failed to download NLTK data: {e}", "WARNING")
             return True  # Not critical for basic functionality
     
+    def build_chatbot_model(self) -> bool:
+        """Train the chatbot intent models once and save them for fast startup"""
+        try:
+            self.log("Building chatbot intent models...")
+            self.run_command([sys.executable, "chatbot_backend.py", "--build-model"])
+            self.log("Chatbot intent models built", "SUCCESS")
+            return True
+        except Exception as e:
+            self.log(f"Failed to build chatbot intent models: {e}", "WARNING")
+            return True  # The chatbot trains them on first start instead
+    
     def create_launch_scripts(self) -> bool:
         """Create convenient launch scripts"""
         try:
@@ -544,6 +555,9 @@ pause
         # Download NLTK data
         self.download_nltk_data()
         
+        # Train and persist the chatbot intent models
+        self.build_chatbot_model()
+        
         # Create launch scripts
         if not self.create_launch_scripts():
             return False
@@ -0,0 +1,234 @@
+"""
+Constant-memory telemetry for the chatbot.
+
+Response times and sentiment used to be appended to lists for every message
+for the life of the process. MessageStats keeps, per intent, a quantile
+sketch of response times (a log-bucketed histogram in the style of DDSketch,
+accurate to 1% of the value), ring buffers of the most recent response
+times and sentiment polarities, and a sliding-window throughput meter.
+prometheus_lines() renders them in the Prometheus text exposition format.
+"""
+
+import math
+import time
+import threading
+from collections import defaultdict, deque
+from typing import List, Dict, Optional, Any
+
+# Recent values kept per intent in the ring buffers
+RECENT_WINDOW = 1000
+
+# Quantiles exported for every summary
+EXPORTED_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram: value v > 0 is counted in bucket
+    ceil(log(v) / log(gamma)), so any quantile is returned within
+    relative_accuracy of a value seen at that rank. Memory grows with the
+    logarithm of the value range and is capped at max_buckets, beyond which
+    the lowest buckets are merged.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value <= 0.0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def merge(self, other: 'QuantileSketch'):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        while len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+
+class ThroughputMeter:
+    """Events per second over a sliding window of one-second slots"""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self.counts = [0] * window
+        self.seconds = [-1] * window
+
+    def mark(self, now: Optional[float] = None):
+        second = int(time.time() if now is None else now)
+        slot = second % self.window
+        if self.seconds[slot] != second:
+            self.seconds[slot] = second
+            self.counts[slot] = 0
+        self.counts[slot] += 1
+
+    def rate(self, now: Optional[float] = None) -> float:
+        second = int(time.time() if now is None else now)
+        recent = sum(count for count, s in zip(self.counts, self.seconds) if second - self.window < s <= second)
+        return recent / self.window
+
+
+class IntentStats:
+    """Response time sketch and recent values of one intent"""
+
+    def __init__(self, window: int = RECENT_WINDOW):
+        self.latency = QuantileSketch()
+        self.recent_latencies = deque(maxlen=window)
+        self.recent_sentiments = deque(maxlen=window)
+        self.sentiment_counts: Dict[str, int] = defaultdict(int)
+
+
+class MessageStats:
+    """Per-intent response times, sentiment and throughput of processed messages"""
+
+    def __init__(self, window: int = RECENT_WINDOW):
+        self.window = window
+        self.intents: Dict[str, IntentStats] = {}
+        self.overall = IntentStats(window)
+        self.throughput = ThroughputMeter()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, intent: str, seconds: float, sentiment: Optional[Dict[str, Any]] = None):
+        """Record one answered message; sentiment is SentimentAnalyzer's result"""
+        with self._lock:
+            stats = self.intents.get(intent)
+            if stats is None:
+                stats = self.intents[intent] = IntentStats(self.window)
+            for target in (stats, self.overall):
+                target.latency.add(seconds)
+                target.recent_latencies.append(seconds)
+                if sentiment:
+                    target.sentiment_counts[sentiment['sentiment']] += 1
+                    target.recent_sentiments.append(sentiment['positive_score'] - sentiment['negative_score'])
+            self.throughput.mark()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly summary: quantiles in seconds, counts and recent means per intent"""
+        with self._lock:
+            def describe(stats: IntentStats) -> Dict[str, Any]:
+                recent = stats.recent_latencies
+                return {
+                    'count': stats.latency.count,
+                    'mean_seconds': stats.latency.sum / stats.latency.count if stats.latency.count else 0.0,
+                    'recent_mean_seconds': sum(recent) / len(recent) if recent else 0.0,
+                    'quantiles_seconds': {str(q): stats.latency.quantile(q) for q in EXPORTED_QUANTILES},
+                    'sentiment_counts': dict(stats.sentiment_counts),
+                    'recent_sentiment': (sum(stats.recent_sentiments) / len(stats.recent_sentiments)
+                                         if stats.recent_sentiments else 0.0)
+                }
+            return {
+                'overall': describe(self.overall),
+                'intents': {intent: describe(stats) for intent, stats in sorted(self.intents.items())},
+                'throughput_per_second': self.throughput.rate(),
+                'uptime_seconds': time.time() - self.started_at
+            }
+
+    def prometheus_lines(self, prefix: str = 'chatbot') -> List[str]:
+        with self._lock:
+            groups = [('all', self.overall)] + sorted(self.intents.items())
+            lines = [
+                f"# HELP {prefix}_response_seconds Time to answer a chat message",
+                f"# TYPE {prefix}_response_seconds summary"
+            ]
+            for intent, stats in groups:
+                for q in EXPORTED_QUANTILES:
+                    value = stats.latency.quantile(q)
+                    lines.append(metric_line(f"{prefix}_response_seconds", {'intent': intent, 'quantile': q},
+                                             float('nan') if value is None else value))
+                lines.append(metric_line(f"{prefix}_response_seconds_sum", {'intent': intent}, stats.latency.sum))
+                lines.append(metric_line(f"{prefix}_response_seconds_count", {'intent': intent}, stats.latency.count))
+
+            lines += [
+                f"# HELP {prefix}_messages_by_sentiment_total Messages by intent and detected sentiment",
+                f"# TYPE {prefix}_messages_by_sentiment_total counter"
+            ]
+            for intent, stats in groups:
+                for label, count in sorted(stats.sentiment_counts.items()):
+                    lines.append(metric_line(f"{prefix}_messages_by_sentiment_total",
+                                             {'intent': intent, 'sentiment': label}, count))
+
+            lines += [
+                f"# HELP {prefix}_recent_sentiment Mean sentiment polarity of the last {self.window} messages",
+                f"# TYPE {prefix}_recent_sentiment gauge"
+            ]
+            for intent, stats in groups:
+                if stats.recent_sentiments:
+                    lines.append(metric_line(f"{prefix}_recent_sentiment", {'intent': intent},
+                                             sum(stats.recent_sentiments) / len(stats.recent_sentiments)))
+
+            lines += [
+                f"# HELP {prefix}_throughput_messages_per_second Messages answered per second over the last "
+                f"{self.throughput.window} seconds",
+                f"# TYPE {prefix}_throughput_messages_per_second gauge",
+                metric_line(f"{prefix}_throughput_messages_per_second", {}, self.throughput.rate()),
+                f"# HELP {prefix}_uptime_seconds Seconds since the chatbot started",
+                f"# TYPE {prefix}_uptime_seconds gauge",
+                metric_line(f"{prefix}_uptime_seconds", {}, time.time() - self.started_at)
+            ]
+            return lines
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def metric_line(name: str, labels: Dict[str, Any], value: float) -> str:
+    """One sample in the Prometheus text exposition format"""
+    if labels:
+        rendered = ','.join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+        return f"{name}{{{rendered}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+def counter_lines(name: str, help_text: str, label: str, counts: Dict[str, int]) -> List[str]:
+    """A counter family with one sample per label value"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for value, count in sorted(counts.items()):
+        lines.append(metric_line(name, {label: value}, count))
+    return lines
+
+
+def gauge_lines(name: str, help_text: str, value: float) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", metric_line(name, {}, value)]